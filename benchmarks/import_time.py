@@ -0,0 +1,50 @@
+'''Measures the time needed to import js2py and to set up the JS global environment.
+
+Usage: python benchmarks/import_time.py [repeats]
+
+Every measurement runs in a fresh interpreter, so modules are really imported
+(only the .pyc files are reused). On python 3.7+ you can also use
+python -X importtime -c "import js2py" to see the time spent in every module.'''
+from __future__ import print_function
+import subprocess
+import sys
+import json
+import os
+
+SCRIPT = '''
+import time, json
+start = time.time()
+import js2py
+imported = time.time()
+js2py.EvalJs()
+ready = time.time()
+js2py.eval_js('new Date(0).getTime() + JSON.stringify([/a/g.source])')
+first_use = time.time()
+print(json.dumps({'import js2py': imported - start, 'EvalJs()': ready - imported,
+                  'Date, JSON, RegExp': first_use - ready}))
+'''
+
+
+def measure(repeats=5):
+    '''Returns dict mapping stage name to the list of its times (in seconds)'''
+    # make sure that the child imports the same js2py
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    results = {}
+    for _ in range(repeats):
+        out = subprocess.check_output([sys.executable, '-c', SCRIPT], env=env)
+        for stage, seconds in json.loads(out.decode('utf-8').splitlines()[-1]).items():
+            results.setdefault(stage, []).append(seconds)
+    return results
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for stage, times in sorted(measure(repeats).items()):
+        times.sort()
+        print('%-20s min %.1f ms, median %.1f ms' % (stage, 1000 * times[0], 1000 * times[len(times) // 2]))
+
+
+if __name__ == '__main__':
+    main()
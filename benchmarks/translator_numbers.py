@@ -0,0 +1,137 @@
+'''Benchmark of the numeric code of the translator.
+
+Usage: python benchmarks/translator_numbers.py [repeats]
+
+Prints the best run time of every kernel with the unboxed number fast paths disabled and enabled
+(see NUMBER_FAST_PATHS in js2py/translators/translating_nodes.py). The code is translated directly,
+without the caches.'''
+from __future__ import print_function
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pyjsparser
+from js2py.translators import translating_nodes
+from js2py.evaljs import EvalJs
+
+KERNELS = [
+    ('loops', '''
+        function main() {
+            var s = 0;
+            for (var i = 0; i < 20000; i++) { if (i % 3 == 0) { s += i } else { s -= 1 } }
+            return s
+        }
+    '''),
+    ('sum', '''
+        function main() {
+            var s = 0;
+            for (var i = 1; i <= 30000; i++) { s += 1 / (i * i) }
+            return s
+        }
+    '''),
+    ('mandelbrot', '''
+        function main() {
+            var count = 0;
+            for (var py = 0; py < 30; py++) {
+                for (var px = 0; px < 30; px++) {
+                    var x0 = px / 15 - 1.5, y0 = py / 15 - 1, x = 0, y = 0, k = 0;
+                    while (k < 30 && x * x + y * y < 4) {
+                        var t = x * x - y * y + x0;
+                        y = 2 * x * y + y0;
+                        x = t;
+                        k++;
+                    }
+                    count += k;
+                }
+            }
+            return count
+        }
+    '''),
+    ('sieve', '''
+        function main() {
+            var n = 10000, flags = [], count = 0;
+            for (var i = 2; i <= n; i++) { flags[i] = true }
+            for (var j = 2; j <= n; j++) {
+                if (flags[j]) {
+                    count++;
+                    for (var k = j * 2; k <= n; k += j) { flags[k] = false }
+                }
+            }
+            return count
+        }
+    '''),
+    ('fib', '''
+        function fib(n) { return n < 2 ? n : fib(n - 1) + fib(n - 2) }
+        function main() { return fib(16) }
+    '''),
+    ('collatz', '''
+        function main() {
+            var longest = 0;
+            for (var i = 1; i < 1500; i++) {
+                var n = i, steps = 0;
+                while (n != 1) {
+                    n = n % 2 == 0 ? n / 2 : 3 * n + 1;
+                    steps++;
+                }
+                if (steps > longest) longest = steps;
+            }
+            return longest
+        }
+    '''),
+    ('matrix', '''
+        function main() {
+            var size = 20, a = [], b = [], c = [];
+            for (var i = 0; i < size * size; i++) { a[i] = i % 7; b[i] = i % 5; c[i] = 0 }
+            for (var r = 0; r < size; r++) {
+                for (var col = 0; col < size; col++) {
+                    var s = 0;
+                    for (var k = 0; k < size; k++) { s += a[r * size + k] * b[k * size + col] }
+                    c[r * size + col] = s;
+                }
+            }
+            return c[size * size - 1]
+        }
+    '''),
+]
+
+
+def prepare(js, fast_paths):
+    '''Returns main function of the kernel translated with or without the fast paths'''
+    previous = translating_nodes.NUMBER_FAST_PATHS
+    translating_nodes.NUMBER_FAST_PATHS = fast_paths
+    try:
+        code = translating_nodes.Translator().translate(pyjsparser.parse(js))
+    finally:
+        translating_nodes.NUMBER_FAST_PATHS = previous
+    context = EvalJs()
+    exec(code, context._context)
+    return context._context['var'].get(u'main')
+
+
+def timed_run(main):
+    start = time.time()
+    result = main()
+    return time.time() - start, result
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print('%-12s %10s %10s %8s' % ('kernel', 'boxed', 'unboxed', 'speedup'))
+    totals = [0, 0]
+    for name, js in KERNELS:
+        times = []
+        results = []
+        for fast_paths in (False, True):
+            func = prepare(js, fast_paths)
+            runs = [timed_run(func) for _ in range(repeats)]
+            times.append(min(t for t, _ in runs))
+            results.append(runs[0][1].to_python())
+        assert results[0] == results[1], (name, results)
+        totals[0] += times[0]
+        totals[1] += times[1]
+        print('%-12s %9.3fs %9.3fs %7.2fx' % (name, times[0], times[1], times[0] / times[1]))
+    print('%-12s %9.3fs %9.3fs %7.2fx' % ('total', totals[0], totals[1], totals[0] / totals[1]))
+
+
+if __name__ == '__main__':
+    main()
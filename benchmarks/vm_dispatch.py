@@ -0,0 +1,123 @@
+'''Benchmark of the bytecode interpreter.
+
+Usage: python benchmarks/vm_dispatch.py [repeats]
+
+For every program prints the best run time and the number of executed ops per second,
+both for the plain interpreter and with the JIT enabled.
+Ops are counted as emitted by ByteCodeGenerator (before any fusion done by Code.compile)
+so the numbers are comparable between different versions of the interpreter.'''
+from __future__ import print_function
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pyjsparser
+from js2py.internals.space import Space
+from js2py.internals import fill_space
+from js2py.internals.byte_trans import ByteCodeGenerator
+from js2py.internals.code import Code
+from js2py.internals.opcodes import LABEL
+from js2py.internals.jit import JIT
+
+# the code is in functions so that the JIT (see jit.py) can compile it
+PROGRAMS = [
+    ('fib', '''
+        function fib(n) { return n < 2 ? n : fib(n - 1) + fib(n - 2) }
+        fib(18)
+    '''),
+    ('loops', '''
+        function main() {
+            var s = 0;
+            for (var i = 0; i < 20000; i++) { if (i % 3 == 0) { s += i } else { s -= 1 } }
+            return s
+        }
+        main()
+    '''),
+    ('members', '''
+        function main() {
+            var obj = {count: 0, items: []};
+            for (var i = 0; i < 5000; i++) { obj.items.push(i * 2); obj.count += 1 }
+            var s = 0;
+            for (var j = 0; j < obj.items.length; j++) { s += obj.items[j] }
+            return s + obj.count
+        }
+        main()
+    '''),
+    ('objects', '''
+        function Point(x, y) { this.x = x; this.y = y }
+        Point.prototype.add = function (p) { return new Point(this.x + p.x, this.y + p.y) };
+        function main() {
+            var p = new Point(0, 0);
+            for (var i = 0; i < 3000; i++) { p = p.add(new Point(1, 2)) }
+            return p.x + p.y
+        }
+        main()
+    '''),
+    ('strings', '''
+        function main() {
+            var parts = [];
+            for (var i = 0; i < 3000; i++) { parts.push('item' + i) }
+            return parts.join(',').length
+        }
+        main()
+    '''),
+]
+
+
+def prepare(js, jit_threshold=None):
+    gen = ByteCodeGenerator(Code())
+    space = Space()
+    gen.exe.space = space
+    space.exe = gen.exe
+    if jit_threshold is not None:
+        gen.exe.jit = JIT(gen.exe, jit_threshold)
+    gen.emit(pyjsparser.parse(js))
+    fill_space.fill_space(space, gen)
+    return gen.exe
+
+
+def count_ops(js):
+    '''Returns the number of ops executed by the program'''
+    exe = prepare(js)
+    counter = [0]
+    counting_classes = {}
+    for op in exe.tape:
+        cls = type(op)
+        if cls is LABEL:
+            continue
+        if cls not in counting_classes:
+            def counting_eval(self, ctx, _eval=cls.eval):
+                counter[0] += 1
+                return _eval(self, ctx)
+            # subclass keeps isinstance checks working but prevents op fusion
+            counting_classes[cls] = type(cls.__name__, (cls,), {'eval': counting_eval})
+        op.__class__ = counting_classes[cls]
+    exe.compile()
+    exe.run(exe.space.GlobalObj)
+    return counter[0]
+
+
+def timed_run(js, jit_threshold=None):
+    exe = prepare(js, jit_threshold)
+    exe.compile()
+    start = time.time()
+    result = exe.run(exe.space.GlobalObj)
+    return time.time() - start, result
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for title, jit_threshold in (('interpreter', None), ('jit', 1)):
+        print(title)
+        total_ops, total_time = 0, 0
+        for name, js in PROGRAMS:
+            ops = count_ops(js)
+            best = min(timed_run(js, jit_threshold)[0] for _ in range(repeats))
+            total_ops += ops
+            total_time += best
+            print('    %-10s %8d ops %8.3f s %10.0f ops/s' % (name, ops, best, ops / best))
+        print('    %-10s %8d ops %8.3f s %10.0f ops/s' % ('total', total_ops, total_time, total_ops / total_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -63,11 +63,15 @@
 """
 
 __author__ = 'Piotr Dabkowski'
-__all__  = ['EvalJs', 'translate_js', 'import_js', 'eval_js', 'parse_js', 'translate_file',
-            'run_file', 'disable_pyimport', 'eval_js6', 'translate_js6', 'PyJsException', 'get_file_contents', 'write_file_contents', 'require']
+__version__ = '0.58'
+__all__  = ['EvalJs', 'translate_js', 'import_js', 'eval_js', 'parse_js', 'translate_file', 'translate_package',
+            'run_file', 'disable_pyimport', 'eval_js6', 'translate_js6', 'PyJsException', 'get_file_contents', 'write_file_contents', 'require',
+            'enable_disk_cache', 'disable_disk_cache', 'SnippetCache', 'JsLimitExceeded',
+            'JsPool']
 
 from .base import PyJsException
 from .evaljs import *
 from .translators import parse as parse_js
 from .node_import import require
+from .pool import JsPool
 
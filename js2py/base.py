@@ -1,9 +1,16 @@
 '''Most important file in Js2Py implementation: PyJs class - father of all PyJs objects'''
 from copy import copy
+import array
+import math
 import re
+import struct
 
 from .translators.friendly_nodes import REGEXP_CONVERTER
 from .utils.injector import fix_js_args
+from .utils.shapes import ROOT_SHAPE, DICT_SHAPE, is_plain_property
+from .utils.regexp_cache import compile_regexp
+from .utils.typedarrays import byte_length, copy_bytes, make_view, element_format, \
+    integer_converter, to_uint8_clamped, to_float32
 from types import FunctionType, ModuleType, GeneratorType, BuiltinFunctionType, MethodType, BuiltinMethodType
 import traceback
 try:
@@ -54,50 +61,160 @@ def to_python(val):
         return val.__dict__['obj']
     return JsObjectWrapper(val)
 
-def to_dict(js_obj, known=None): # fixed recursion error in self referencing objects
-    res = {}
-    if known is None:
-        known = {}
-    if js_obj in known:
-        return known[js_obj]
-    known[js_obj] = res
-    for k in js_obj:
-        name = k.value
-        input = js_obj.get(name)
-        output = to_python(input)
-        if isinstance(output, JsObjectWrapper):
-            if output._obj.Class=='Object':
-                output = to_dict(output._obj, known)
-                known[input] = output
-            elif output._obj.Class in ['Array','Int8Array','Uint8Array','Uint8ClampedArray','Int16Array','Uint16Array','Int32Array','Uint32Array','Float32Array','Float64Array']:
-                output = to_list(output._obj)
-                known[input] = output
-        res[name] = output
+# classes of the objects converted to python lists, other objects (except of Object) stay wrapped
+ARRAY_CLASSES = ('Array', 'Arguments', 'Int8Array', 'Uint8Array', 'Uint8ClampedArray', 'Int16Array', 'Uint16Array',
+                 'Int32Array', 'Uint32Array', 'Float32Array', 'Float64Array')
+# boxed primitive values, JSON uses their value
+VALUE_CLASSES = ('Boolean', 'Number', 'String')
+
+
+def to_dict(js_obj, known=None, max_depth=None, max_size=None, json=False):
+    """Converts JS object to python dict, nested objects are converted to dicts and arrays to lists.
+    Other objects (functions, dates...) are returned as JsObjectWrapper.
+
+    known - dict mapping ids of already converted objects to the results, objects that occur more than once
+        (also cycles) are converted once so the result has the same structure
+    max_depth, max_size - ValueError is raised if the objects are nested deeper than max_depth or if the number
+        of converted values exceeds max_size
+    json - converts to plain JSON data, like JSON.stringify: only dicts, lists, strings, numbers, bools and None.
+        Functions and undefined are skipped in objects and are None in arrays, so are NaN and Infinity.
+        Dates are ISO strings, other objects are dicts of their enumerable properties.
+    """
+    return _to_builtin(js_obj, known, max_depth, max_size, json)
+
+
+def to_list(js_obj, known=None, max_depth=None, max_size=None, json=False):
+    """Converts JS array (or array like object) to python list, see to_dict"""
+    return _to_builtin(js_obj, known, max_depth, max_size, json, True)
+
+
+def _number(v, json=False):
+    """Whole numbers are returned as ints, JSON has no NaN and Infinity so they are None in json mode"""
+    if v % 1 == 0:
+        return int(v)
+    if json and (v != v or v in (Infinity.value, -Infinity.value)):
+        return None
+    return v
+
+
+def _properties(obj):
+    """Returns list of (name, value) of own enumerable properties of obj in the order of for in"""
+    if isinstance(obj, PyJsObject) and not obj.own:  # only plain properties
+        return sorted(zip(obj.shape.keys, obj.slots))
+    names = sorted(name for name in obj.own_keys() if obj.get_own_property(name)['enumerable'])
+    return [(name, obj.get(name)) for name in names]
+
+
+def _elements(obj):
+    """Returns list of (index, value) of the elements of array like obj"""
+    if isinstance(obj, PyJsArray):  # other elements are in own, with length
+        res = [(i, e) for i, e in enumerate(obj.dense) if e is not None]
+        names = list(obj.own) if len(obj.own) > 1 else ()
+    else:
+        res = []
+        names = obj.own_keys()
+    for name in names:
+        if name.isdigit() and obj.get_own_property(name)['enumerable']:
+            res.append((int(name), obj.get(name)))
     return res
 
 
-def to_list(js_obj, known=None):
-    res = len(js_obj)*[None]
+def _to_builtin(root, known, max_depth, max_size, json, as_list=False):
+    """Iterative conversion of root and the objects nested in it. Containers are created first and
+    filled when they are taken from the stack, so shared objects and cycles are converted once."""
     if known is None:
         known = {}
-    if js_obj in known:
-        return known[js_obj]
-    known[js_obj] = res
-    for k in js_obj:
-        try:
-            name = int(k.value)
-        except:
-            continue
-        input = js_obj.get(str(name))
-        output = to_python(input)
-        if isinstance(output, JsObjectWrapper):
-            if output._obj.Class in ['Array', 'Int8Array','Uint8Array','Uint8ClampedArray','Int16Array','Uint16Array','Int32Array','Uint32Array','Float32Array','Float64Array', 'Arguments']:
-                output = to_list(output._obj, known)
-                known[input] = output
-            elif output._obj.Class in ['Object']:
-                output = to_dict(output._obj)
-                known[input] = output
-        res[name] = output
+    if id(root) in known:
+        return known[id(root)]
+    # lists are counted with their length (holes included) before they are allocated, objects with their properties
+    size = len(root) if as_list or isinstance(root, PyJsTypedArray) else 0
+    if max_size is not None and size > max_size:
+        raise ValueError('Result has more than %d values' % max_size)
+    if isinstance(root, PyJsTypedArray):  # only numbers
+        return [_number(e.value, json) for e in root.to_list()]
+    res = known[id(root)] = [None] * size if as_list else {}
+    stack = [(root, res, 0)]
+    converted = [root]  # keeps the objects (getters can return new ones) alive so that their ids are not reused
+    while stack:
+        obj, container, depth = stack.pop()
+        if isinstance(container, list):
+            items = _elements(obj)
+        else:
+            items = _properties(obj)
+            size += len(items)
+            if max_size is not None and size > max_size:
+                raise ValueError('Result has more than %d values' % max_size)
+        for key, value in items:
+            typ = type(value)
+            if typ is PyJsString or typ is PyJsBoolean:
+                out = value.value
+            elif typ is PyJsNumber:
+                out = _number(value.value, json)
+            elif typ is PyJsUndefined or typ is PyJsNull:
+                if json and typ is PyJsUndefined and not isinstance(container, list):
+                    continue
+                out = None
+            elif typ is PyObjectWrapper:
+                out = value.obj
+            else:
+                cls = value.Class
+                if json and cls != 'Object' and cls not in ARRAY_CLASSES:
+                    if value.is_callable():
+                        if not isinstance(container, list):
+                            continue
+                        out = None
+                    elif cls in VALUE_CLASSES:
+                        out = _number(value.value, json) if cls == 'Number' else value.value
+                    elif cls == 'Date':
+                        out = to_python(value.callprop('toJSON'))
+                    else:
+                        cls = 'Object'
+                if cls == 'Object' or cls in ARRAY_CLASSES:
+                    out = known.get(id(value))
+                    if out is None:
+                        if max_depth is not None and depth >= max_depth:
+                            raise ValueError('Result is nested deeper than %d' % max_depth)
+                        if cls in ARRAY_CLASSES:
+                            length = len(value)
+                            size += length
+                            if max_size is not None and size > max_size:
+                                raise ValueError('Result has more than %d values' % max_size)
+                        if isinstance(value, PyJsTypedArray):
+                            out = [_number(e.value, json) for e in value.to_list()]
+                        else:
+                            out = [None] * length if cls in ARRAY_CLASSES else {}
+                            stack.append((value, out, depth + 1))
+                        known[id(value)] = out
+                        converted.append(value)
+                elif not json:
+                    out = JsObjectWrapper(value)
+            container[key] = out
+    return res
+
+
+def from_builtin(root):
+    """Converts python dict, list or tuple and the containers nested in it to JS objects and arrays.
+    Iterative, containers that occur more than once (also cycles) are converted once."""
+    known = {}
+    def convert(val):
+        if not isinstance(val, (dict, list, tuple)):
+            return Js(val)
+        res = known.get(id(val))
+        if res is None:
+            res = known[id(val)] = PyJsObject({}, ObjectPrototype) if isinstance(val, dict) else \
+                PyJsArray((), ArrayPrototype)
+            stack.append((val, res))
+        return res
+    stack = []
+    res = convert(root)
+    while stack:
+        val, obj = stack.pop()
+        if isinstance(obj, PyJsArray):
+            obj.dense = [convert(e) for e in val]
+            obj.own['length']['value'] = Js(len(val))
+        else:
+            for k, v in six.iteritems(val):
+                obj.put(k if isinstance(k, basestring) else Js(k).to_string().value, convert(v))
     return res
 
 
@@ -142,8 +259,14 @@ def Js(val, Clamped=False):
                                                                                                                           numpy.int32,numpy.uint32,
                                                                                                                           numpy.float32,numpy.float64))):
         # This is supposed to speed things up. may not be the case
+        if not val and math.copysign(1, val) < 0:  # -0 equals 0, so it can't come from the bank
+            return PyJsNumber(-0.0, NumberPrototype)
         if val in NUM_BANK:
             return NUM_BANK[val]
+        if -2**10 <= val < 2**14 and not val % 1:
+            # small integers are filled in lazily
+            num = NUM_BANK[val] = PyJsNumber(float(int(val)), NumberPrototype)
+            return num
         return PyJsNumber(float(val), NumberPrototype)
     elif isinstance(val, FunctionType):
         return PyJsFunction(val, FunctionPrototype)
@@ -162,37 +285,25 @@ def Js(val, Clamped=False):
     #    return Js(mod)
     #elif isintance(val, ClassType):
 
-    elif isinstance(val, dict): # convert to object
-         temp = PyJsObject({}, ObjectPrototype)
-         for k, v in six.iteritems(val):
-             temp.put(Js(k), Js(v))
-         return temp
-    elif isinstance(val, (list, tuple)): #Convert to array
-        return PyJsArray(val, ArrayPrototype)
+    elif isinstance(val, (dict, list, tuple)): # convert to object or array
+        return from_builtin(val)
     # convert to typedarray
     elif isinstance(val, JsObjectWrapper):
         return val.__dict__['_obj']
-    elif NUMPY_AVAILABLE and isinstance(val, numpy.ndarray):
-        if val.dtype == numpy.int8:
-            return PyJsInt8Array(val, Int8ArrayPrototype)
-        elif val.dtype == numpy.uint8 and not Clamped:
-            return PyJsUint8Array(val, Uint8ArrayPrototype)
-        elif val.dtype == numpy.uint8 and Clamped:
-            return PyJsUint8ClampedArray(val, Uint8ClampedArrayPrototype)
-        elif val.dtype == numpy.int16:
-            return PyJsInt16Array(val, Int16ArrayPrototype)
-        elif val.dtype == numpy.uint16:
-            return PyJsUint16Array(val, Uint16ArrayPrototype)
-
-        elif val.dtype == numpy.int32:
-            return PyJsInt32Array(val, Int32ArrayPrototype)
-        elif val.dtype == numpy.uint32:
-            return PyJsUint16Array(val, Uint32ArrayPrototype)
-
-        elif val.dtype == numpy.float32:
-            return PyJsFloat32Array(val, Float32ArrayPrototype)
-        elif val.dtype == numpy.float64:
-            return PyJsFloat64Array(val, Float64ArrayPrototype)
+    elif NUMPY_AVAILABLE and isinstance(val, numpy.ndarray) or isinstance(val, (array.array, memoryview)):
+        # typed arrays view the memory of the python object, nothing is copied
+        if isinstance(val, array.array):
+            fmt = element_format(val.typecode, val.itemsize)
+        elif isinstance(val, memoryview):
+            fmt = element_format(val.format, val.itemsize) if six.PY3 and val.ndim == 1 else None
+        else:
+            fmt = element_format(val.dtype.char, val.itemsize) if val.ndim == 1 else None
+        if fmt is not None:
+            if fmt == 'B' and Clamped:
+                return PyJsUint8ClampedArray(val, Uint8ClampedArrayPrototype)
+            cls, prototype = TYPED_ARRAYS[fmt]
+            return cls(val, prototype)
+        return py_wrap(val)
     else: # try to convert to js object
         return py_wrap(val)
         #raise RuntimeError('Cant convert python type to js (%s)' % repr(val))
@@ -241,6 +352,8 @@ class PyJs(object):
     IS_CHILD_SCOPE = False
     value = None
     buff = None
+    # set once an inline cache depends on the properties of this object (see PropertyCache)
+    cache_dependency = False
     
     def __init__(self, value=None, prototype=None, extensible=False):
         '''Constructor for Number String and Boolean'''
@@ -258,7 +371,6 @@ class PyJs(object):
         self.extensible = extensible
         self.prototype = prototype
         self.own = {}
-        self.buff = None
         
     def is_undefined(self):
         return self.Class=='Undefined'
@@ -281,16 +393,17 @@ class PyJs(object):
     def get_own_property(self, prop):
         return self.own.get(prop)
 
-    def get_property(self, prop):
-        cand = self.get_own_property(prop)
-        if cand:
-            return cand
-        if self.prototype is not None:
-            return self.prototype.get_property(prop)
+    def own_keys(self):
+        '''Returns names of all own properties'''
+        return list(self.own)
 
-    def update_array(self):
-        for i in range(self.get('length').to_uint32()):
-            self.put(str(i),Js(self.buff[i]))
+    def get_property(self, prop):
+        obj = self
+        while obj is not None:  # walks the chain in a loop, the builtins call it for every index
+            cand = obj.get_own_property(prop)
+            if cand:
+                return cand
+            obj = obj.prototype
 
     def get(self, prop): #external use!
          #prop = prop.value
@@ -299,9 +412,6 @@ class PyJs(object):
          if not isinstance(prop, basestring):
              prop = prop.to_string().value
          if not isinstance(prop, basestring): raise RuntimeError('Bug')
-         if NUMPY_AVAILABLE and prop.isdigit():
-             if isinstance(self.buff,numpy.ndarray):
-                 self.update_array()
          cand = self.get_property(prop)
          if cand is None:
              return Js(None)
@@ -339,32 +449,6 @@ class PyJs(object):
              raise MakeError('TypeError', 'Undefined and null dont have properties!')
         if not isinstance(prop, basestring):
              prop = prop.to_string().value
-        if NUMPY_AVAILABLE and prop.isdigit():
-            if self.Class == 'Int8Array':
-                val = Js(numpy.int8(val.to_number().value))
-            elif self.Class == 'Uint8Array':
-                val = Js(numpy.uint8(val.to_number().value))
-            elif self.Class == 'Uint8ClampedArray':
-                if val < Js(numpy.uint8(0)):
-                    val = Js(numpy.uint8(0))
-                elif val > Js(numpy.uint8(255)):
-                    val = Js(numpy.uint8(255))
-                else:
-                    val = Js(numpy.uint8(val.to_number().value))
-            elif self.Class == 'Int16Array':
-                val = Js(numpy.int16(val.to_number().value))
-            elif self.Class == 'Uint16Array':
-                val = Js(numpy.uint16(val.to_number().value))
-            elif self.Class == 'Int32Array':
-                val = Js(numpy.int32(val.to_number().value))
-            elif self.Class == 'Uint32Array':
-                val = Js(numpy.uint32(val.to_number().value))
-            elif self.Class == 'Float32Array':
-                val = Js(numpy.float32(val.to_number().value))
-            elif self.Class == 'Float64Array':
-                val = Js(numpy.float64(val.to_number().value))
-            if isinstance(self.buff,numpy.ndarray):
-                self.buff[int(prop)] = int(val.to_number().value)
         #we need to set the value to the incremented one
         if op is not None:
             val = getattr(self.get(prop), OP_METHODS[op])(val)
@@ -381,6 +465,8 @@ class PyJs(object):
         if is_accessor_descriptor(desc):
             desc['set'].call(self, (val,))
         else:
+            if self.cache_dependency:
+                invalidate_inline_caches()
             new = {'value' : val,
                    'writable' : True,
                    'configurable' : True,
@@ -401,6 +487,8 @@ class PyJs(object):
         if desc is None:
             return Js(True)
         if desc['configurable']:
+            if self.cache_dependency:
+                invalidate_inline_caches()
             del self.own[prop]
             return Js(True)
         return Js(False)
@@ -421,6 +509,8 @@ class PyJs(object):
     def define_own_property(self, prop, desc): #Internal use only. External through Object
         # prop must be a Py string. Desc is either a descriptor or accessor.
         #Messy method -  raw translation from Ecma spec to prevent any bugs. # todo check this
+        if self.cache_dependency:
+            invalidate_inline_caches()
         current = self.get_own_property(prop)
 
         extensible = self.extensible
@@ -747,30 +837,11 @@ class PyJs(object):
 
     # /
     def __div__(self, other):
-        a = self.to_number().value
-        b = other.to_number().value
-        if b:
-            return Js(a/b)
-        if not a or a!=a:
-            return NaN
-        return Infinity if a>0 else -Infinity
+        return PyJsFloat(PyJsDiv(self.to_number().value, other.to_number().value))
 
     # %
     def __mod__(self, other):
-        a = self.to_number().value
-        b = other.to_number().value
-        if abs(a)==float('inf') or not b:
-            return NaN
-        if abs(b)==float('inf'):
-            return Js(a)
-        pyres = Js(a%b) #different signs in python and javascript
-                        #python has the same sign as b and js has the same
-                        #sign as a.
-        if a<0 and pyres.value>0:
-            pyres.value -= abs(b)
-        elif a>0 and pyres.value<0:
-            pyres.value += abs(b)
-        return Js(pyres)
+        return PyJsFloat(PyJsMod(self.to_number().value, other.to_number().value))
 
     #Comparisons (I dont implement === and !== here, these
     # will be implemented as external functions later)
@@ -874,11 +945,11 @@ class PyJs(object):
         # SLOW! New items will NOT show up.
         returned = {}
         if not self.IS_CHILD_SCOPE:
-            cands = sorted(name for name in self.own if self.own[name]['enumerable'])
+            cands = sorted(name for name in self.own_keys() if self.get_own_property(name)['enumerable'])
         else:
             cands = sorted(name for name in self.own)
         for cand in cands:
-            check = self.own.get(cand)
+            check = self.get_own_property(cand)
             if check and check['enumerable']:
                 yield Js(cand)
 
@@ -981,7 +1052,35 @@ def PyJsComma(a, b):
     return b
 
 
-from .internals.simplex import JsException as PyJsException
+# Arithmetic of unboxed numbers (python floats) in the translated code, see number_code in translating_nodes.py
+
+def PyJsFloat(value):
+    '''Js for python floats, boxes the result of unboxed arithmetic'''
+    return PyJsNumber(value, NumberPrototype)
+
+
+def PyJsDiv(a, b):
+    '''a/b'''
+    if b:
+        return float(a)/b
+    if not a or a!=a:
+        return NaN.value
+    # the sign of the infinity depends also on the sign of the zero
+    return math.copysign(Infinity.value, a) * math.copysign(1.0, b)
+
+
+def PyJsMod(a, b):
+    '''a%b, the result has the sign of a like in C (python % has the sign of b)'''
+    if a!=a or b!=b or abs(a)==Infinity.value or not b:
+        return NaN.value
+    if abs(b)==Infinity.value:
+        return a
+    return math.fmod(a, b)
+
+
+from .internals.simplex import JsException as PyJsException, JsLimitExceeded as PyJsLimitExceeded
+from .utils import limits as PyJsLimits
+from .utils.limits import check_limits as PyJsCheckLimits
 import pyjsparser
 pyjsparser.parser.ENABLE_JS2PY_ERRORS = lambda msg: MakeError('SyntaxError', msg)
 
@@ -1170,11 +1269,11 @@ class JsObjectWrapper(object):
     def __bool__(self):
         return bool(self._obj)
 
-    def to_dict(self):
-        return to_dict(self.__dict__['_obj'])
+    def to_dict(self, max_depth=None, max_size=None, json=False):
+        return to_dict(self.__dict__['_obj'], max_depth=max_depth, max_size=max_size, json=json)
 
-    def to_list(self):
-        return to_list(self.__dict__['_obj'])
+    def to_list(self, max_depth=None, max_size=None, json=False):
+        return to_list(self.__dict__['_obj'], max_depth=max_depth, max_size=max_size, json=json)
 
 class PyObjectWrapper(PyJs):
     Class = 'PyObjectWrapper'
@@ -1261,9 +1360,94 @@ class PyJsObject(PyJs):
         self.prototype = prototype
         self.extensible = extensible
         self.own = {}
+        # values of plain properties, self.shape maps their names to indices (see utils/shapes.py)
+        self.shape = ROOT_SHAPE
+        self.slots = []
         for prop, desc in six.iteritems(prop_descs):
             self.define_own_property(prop, desc)
 
+    def _to_dict_mode(self):
+        if self.cache_dependency:
+            invalidate_inline_caches()
+        for name, value in zip(self.shape.keys, self.slots):
+            self.own[name] = {'value': value, 'writable': True, 'enumerable': True, 'configurable': True}
+        self.shape = DICT_SHAPE
+        self.slots = []
+
+    def get(self, prop):
+        if not isinstance(prop, basestring):
+            prop = prop.to_string().value
+        shape = self.shape
+        index = shape.index.get(prop)
+        if index is not None and index < shape.size:
+            return self.slots[index]
+        return PyJs.get(self, prop)
+
+    def put(self, prop, val, op=None):
+        if not isinstance(prop, basestring):
+            prop = prop.to_string().value
+        shape = self.shape
+        index = shape.index.get(prop)
+        if index is not None and index < shape.size:
+            if op is not None:
+                val = getattr(self.slots[index], OP_METHODS[op])(val)
+            self.slots[index] = val
+            return val
+        if op is None and self.extensible and prop not in self.own:
+            # new property, unless the prototype chain has a setter or a read-only property
+            if self.prototype is None or self.prototype.get_property(prop) is None:
+                new_shape = shape.add(prop)
+                if new_shape is not None:
+                    if self.cache_dependency:
+                        invalidate_inline_caches()
+                    self.shape = new_shape
+                    self.slots.append(val)
+                    return val
+        return PyJs.put(self, prop, val, op)
+
+    def get_own_property(self, prop):
+        shape = self.shape
+        index = shape.index.get(prop)
+        if index is not None and index < shape.size:
+            return {'value': self.slots[index], 'writable': True, 'enumerable': True, 'configurable': True}
+        return self.own.get(prop)
+
+    def own_keys(self):
+        return list(self.shape.keys) + list(self.own)
+
+    def delete(self, prop):
+        if not isinstance(prop, basestring):
+            prop = prop.to_string().value
+        shape = self.shape
+        if shape.lookup(prop) is not None:
+            if prop == shape.name:  # the last one added, just go back to the previous shape
+                if self.cache_dependency:
+                    invalidate_inline_caches()
+                self.shape = shape.parent
+                self.slots.pop()
+                return Js(True)
+            self._to_dict_mode()
+        return PyJs.delete(self, prop)
+
+    def define_own_property(self, prop, desc):
+        shape = self.shape
+        index = shape.index.get(prop)
+        if index is not None and index < shape.size:
+            if is_plain_property(desc, False):
+                if 'value' in desc:
+                    self.slots[index] = desc['value']
+                return True
+            self._to_dict_mode()
+        elif prop not in self.own and self.extensible and is_plain_property(desc, True):
+            new_shape = self.shape.add(prop)
+            if new_shape is not None:
+                if self.cache_dependency:
+                    invalidate_inline_caches()
+                self.shape = new_shape
+                self.slots.append(desc.get('value', undefined))
+                return True
+        return PyJs.define_own_property(self, prop, desc)
+
     def __repr__(self):
         return repr(self.to_python().to_dict())
 
@@ -1272,39 +1456,85 @@ class PyJsObject(PyJs):
 ObjectPrototype = PyJsObject()
 
 
+class LazyJsArgs(object):
+    '''Injecting this and arguments into the function (see fix_js_args) is expensive and most of the
+    builtin methods are never called, so it is done on the first access to PyJsFunction.code.'''
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        code = obj.__dict__['code'] = fix_js_args(obj.raw_code)
+        return code
+
+
+class LazyFunctionProperties(object):
+    '''Own properties of a function (length, name and prototype with its constructor) are created on
+    the first access to PyJsFunction.own. Most of the functions, for example callbacks, are only called.'''
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        own = obj.__dict__['own'] = {}
+        own['length'] = {'value': Js(obj.argcount), 'writable': False, 'enumerable': False, 'configurable': False}
+        if obj.func_name:
+            own['name'] = {'value': Js(obj.func_name), 'writable': False, 'enumerable': False, 'configurable': True}
+        proto = PyJsObject(prototype=ObjectPrototype)
+        # constructor points to this function
+        proto.define_own_property('constructor', {'value': obj, 'writable': True,
+                                                  'enumerable': False, 'configurable': True})
+        own['prototype'] = {'value': proto, 'writable': True, 'enumerable': False, 'configurable': False}
+        return own
+
+
+LAZY_FUNCTION_PROPERTIES = frozenset(['length', 'name', 'prototype'])
+
+
+# name of the arguments parameter of translated functions that never use the arguments object,
+# they get None instead of it
+UNUSED_ARGUMENTS = 'PyJsUnusedArguments'
+
+
 #Function
 class PyJsFunction(PyJs):
     Class = 'Function'
+    code = LazyJsArgs()  # shadowed by the instance attribute once set
+    own = LazyFunctionProperties()  # same here
+    needs_arguments = True
+
     def __init__(self, func, prototype=None, extensible=True, source=None):
-        cand = fix_js_args(func)
-        has_scope = cand is func
-        func = cand
-        self.argcount = six.get_function_code(func).co_argcount - 2 - has_scope
-        self.code = func
+        fcode = six.get_function_code(func)
+        fargs = fcode.co_varnames[fcode.co_argcount-2:fcode.co_argcount]
+        if fargs==('this', 'arguments') or fargs==('arguments', 'var'):
+            self.argcount = fcode.co_argcount - 3
+            self.code = func
+        elif fargs==(UNUSED_ARGUMENTS, 'var'):
+            self.argcount = fcode.co_argcount - 3
+            self.code = func
+            self.needs_arguments = False
+        else:
+            # fix_js_args will append this and arguments
+            self.argcount = fcode.co_argcount
+            self.raw_code = func
         self.source = source if source else '{ [python code] }'
         self.func_name = func.__name__ if not func.__name__.startswith('PyJs_anonymous') else ''
         self.extensible = extensible
         self.prototype = prototype
-        self.own = {}
-        #set own property length to the number of arguments
-        self.define_own_property('length', {'value': Js(self.argcount), 'writable': False,
-                                            'enumerable': False, 'configurable': False})
+        # own properties are created on demand by LazyFunctionProperties
 
-        if self.func_name:
-            self.define_own_property('name', {'value': Js(self.func_name), 'writable': False,
-                                            'enumerable': False, 'configurable': True})
+    def get_own_property(self, prop):
+        if 'own' not in self.__dict__ and prop not in LAZY_FUNCTION_PROPERTIES:
+            return None  # only the lazy properties can exist, no need to create them
+        return self.own.get(prop)
 
-        # set own prototype
-        proto = Js({})
-        # constructor points to this function
-        proto.define_own_property('constructor',{'value': self, 'writable': True,
-                                                 'enumerable': False, 'configurable': True})
-        self.define_own_property('prototype', {'value': proto, 'writable': True,
-                                                 'enumerable': False, 'configurable': False})
+    def own_keys(self):
+        if 'own' not in self.__dict__:
+            return ['length', 'name', 'prototype'] if self.func_name else ['length', 'prototype']
+        return list(self.own)
 
     def _set_name(self, name):
         '''name is py type'''
-        if self.own.get('name'):
+        if 'own' not in self.__dict__:  # name is created from func_name
+            if self.func_name:
+                self.func_name = name
+        elif self.own.get('name'):
             self.func_name = name
             self.own['name']['value'] = Js(name)
 
@@ -1329,19 +1559,25 @@ class PyJsFunction(PyJs):
         And if you supply too much then excess will not be passed
         (but they will be present in arguments object).
         '''
-        if not hasattr(args, '__iter__'):  #get rid of it later
-            args = (args,)
-        args = tuple(Js(e) for e in args) # this wont be needed later
-
-        arguments = PyJsArguments(args, self) # tuple will be converted to arguments object.
+        if type(args) is not tuple:
+            args = tuple(args) if hasattr(args, '__iter__') else (args,)
+        for e in args:
+            if not isinstance(e, PyJs):  # python values are still accepted
+                args = tuple(Js(e) for e in args)
+                break
+        # tuple will be converted to arguments object, only if the function uses it
+        arguments = PyJsArguments(args, self) if self.needs_arguments else None
         arglen = self.argcount #function expects this number of args.
-        if len(args)>arglen:
-            args = args[0:arglen]
-        elif len(args)<arglen:
-            args += (undefined,)*(arglen-len(args))
-        args += this, arguments  #append extra params to the arg list
+        if len(args)!=arglen:
+            if len(args)>arglen:
+                args = args[0:arglen]
+            else:
+                args += (undefined,)*(arglen-len(args))
+        if PyJsLimits.enabled:
+            PyJsCheckLimits()
         try:
-            return Js(self.code(*args))
+            res = self.code(*(args + (this, arguments)))
+            return res if isinstance(res, PyJs) else Js(res)
         except NotImplementedError:
             raise
         except RuntimeError as e: # maximum recursion
@@ -1378,6 +1614,7 @@ class PyJsBoundFunction(PyJsFunction):
         self.bound_args = bound_args
         self.argcount = target.argcount
         self.code = target.code
+        self.needs_arguments = target.needs_arguments
         self.source = target.source
         self.func_name = target.func_name
         self.extensible = True
@@ -1428,6 +1665,58 @@ class PyJsNumber(PyJs):  #Note i dont implement +0 and -0. Just 0.
     TYPE = 'Number'
     Class = 'Number'
 
+    # fast paths of the operators for two numbers, PyJs handles the other cases
+    def __add__(self, other):
+        if type(other) is PyJsNumber:
+            return PyJsNumber(self.value+other.value, NumberPrototype)
+        return PyJs.__add__(self, other)
+
+    def __sub__(self, other):
+        if type(other) is PyJsNumber:
+            return PyJsNumber(self.value-other.value, NumberPrototype)
+        return PyJs.__sub__(self, other)
+
+    def __mul__(self, other):
+        if type(other) is PyJsNumber:
+            return PyJsNumber(self.value*other.value, NumberPrototype)
+        return PyJs.__mul__(self, other)
+
+    def __lt__(self, other):
+        if type(other) is PyJsNumber:
+            return true if self.value<other.value else false
+        return PyJs.__lt__(self, other)
+
+    def __le__(self, other):
+        if type(other) is PyJsNumber:
+            return true if self.value<=other.value else false
+        return PyJs.__le__(self, other)
+
+    def __gt__(self, other):
+        if type(other) is PyJsNumber:
+            return true if self.value>other.value else false
+        return PyJs.__gt__(self, other)
+
+    def __ge__(self, other):
+        if type(other) is PyJsNumber:
+            return true if self.value>=other.value else false
+        return PyJs.__ge__(self, other)
+
+    def __eq__(self, other):
+        if type(other) is PyJsNumber:
+            return true if self.value==other.value else false
+        return PyJs.__eq__(self, other)
+
+    def __ne__(self, other):
+        if type(other) is PyJsNumber:
+            return true if self.value!=other.value else false
+        return PyJs.__ne__(self, other)
+
+    def __nonzero__(self):
+        return bool(self.value and self.value==self.value)
+
+    __bool__ = __nonzero__
+    __hash__ = PyJs.__hash__
+
 
 
 NumberPrototype = PyJsObject({}, ObjectPrototype)
@@ -1443,6 +1732,17 @@ PyJs.Infinity = Infinity
 CHAR_BANK = {}
 NUM_BANK = {}
 PyJs.CHAR_BANK = CHAR_BANK
+class LazyStringLength(object):
+    '''The length property of a string is created on the first access to PyJsString.own,
+    most of the strings are only concatenated, compared or converted back to python.'''
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        own = obj.__dict__['own'] = {'length': {'value': Js(len(obj.value)), 'writable': False,
+                                                'enumerable': False, 'configurable': False}}
+        return own
+
+
 #String
 # Different than implementation design in order to improve performance
 #for example I dont create separate property for each character in string, it would take ages.
@@ -1450,21 +1750,29 @@ class PyJsString(PyJs):
     TYPE = 'String'
     Class = 'String'
     extensible = False
+    # Dont create separate properties for every index, length is created on demand
+    own = LazyStringLength()
+
     def __init__(self, value=None, prototype=None):
         '''Constructor for Number String and Boolean'''
         if not isinstance(value, basestring):
             raise TypeError # this will be internal error
         self.value = value
         self.prototype = prototype
-        self.own = {}
-         # this should be optimized because its mych slower than python str creation (about 50 times!)
-        # Dont create separate properties for every index. Just
-        self.own['length'] = {'value': Js(len(value)), 'writable': False,
-                             'enumerable': False, 'configurable': False}
         if len(value)==1:
             CHAR_BANK[value] = self #, 'writable': False,
                                # 'enumerable': True, 'configurable': False}
 
+    def get_own_property(self, prop):
+        if 'own' not in self.__dict__ and prop != 'length':
+            return None  # length is the only property until own is created
+        return self.own.get(prop)
+
+    def own_keys(self):
+        if 'own' not in self.__dict__:
+            return ['length']
+        return list(self.own)
+
     def get(self, prop):
         if not isinstance(prop, basestring):
                 prop = prop.to_string().value
@@ -1483,6 +1791,17 @@ class PyJsString(PyJs):
     def can_put(self, prop):
         return False
 
+    def __add__(self, other):
+        # fast path of the concatenation of two strings
+        if type(other) is PyJsString:
+            return PyJsString(self.value+other.value, StringPrototype)
+        return PyJs.__add__(self, other)
+
+    def __nonzero__(self):
+        return bool(self.value)
+
+    __bool__ = __nonzero__
+
     def __iter__(self):
         for i in xrange(len(self.value)):
             yield Js(i)  # maybe create an int bank?
@@ -1499,6 +1818,11 @@ class PyJsBoolean(PyJs):
     TYPE = 'Boolean'
     Class = 'Boolean'
 
+    def __nonzero__(self):
+        return self.value
+
+    __bool__ = __nonzero__
+
 BooleanPrototype = PyJsObject({}, ObjectPrototype)
 BooleanPrototype.Class = 'Boolean'
 BooleanPrototype.value = False
@@ -1525,16 +1849,111 @@ class PyJsNull(PyJs):
 null = PyJsNull()
 PyJs.null = null
 
+# max number of holes added to the dense storage of an array when an element is put after its end
+DENSE_GAP = 1024
+# smallest array index with the number of digits, indices have at most 10 digits
+SMALLEST_INDEX = (4294967295, 0) + tuple(10 ** (n - 1) for n in range(2, 11))
+
+
+def array_index(prop):
+    """Returns prop (py string or PyJs) as int if it is an array index, else -1"""
+    typ = type(prop)
+    if typ is PyJsNumber:
+        index = prop.value
+        if not 0 <= index < 4294967295 or index % 1:
+            return -1
+        return int(index)
+    if typ is PyJsString:
+        prop = prop.value
+    elif typ is not str and not isinstance(prop, basestring):
+        return -1
+    if not prop.isdigit() or (prop[0] == '0' and prop != '0'):
+        return -1
+    try:
+        index = int(prop)
+    except ValueError:  # other unicode digits
+        return -1
+    return index if index < 4294967295 else -1
+
+
 class PyJsArray(PyJs):
     Class = 'Array'
     def __init__(self, arr=[], prototype=None):
         self.extensible = True
         self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
+        self.own = {'length' : {'value': Js(len(arr)), 'writable': True,
                                             'enumerable': False, 'configurable': False}}
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
+        # Values of plain elements (see is_plain_property) by index. Other elements are normal
+        # properties in self.own and have None (a hole) here.
+        self.dense = [Js(e) for e in arr]
+
+    _index = staticmethod(array_index)
+
+    def _dense_index(self, prop):
+        """Returns the index of prop if it is an element stored in self.dense, else -1"""
+        if type(prop) is str and (len(prop) > 10 or len(self.dense) <= SMALLEST_INDEX[len(prop)]):
+            return -1  # too many digits to be in dense, not parsed
+        index = self._index(prop)
+        if 0 <= index < len(self.dense) and self.dense[index] is not None:
+            return index
+        return -1
+
+    def _remove_dense(self, index):
+        dense = self.dense
+        dense[index] = None
+        while dense and dense[-1] is None:
+            dense.pop()
+
+    def get(self, prop):
+        if isinstance(prop, basestring) and prop == 'length':  # always an own data property
+            return self.own['length']['value']
+        index = self._dense_index(prop)
+        if index >= 0:
+            return self.dense[index]
+        return PyJs.get(self, prop)
+
+    def put(self, prop, val, op=None):
+        index = self._index(prop)
+        dense = self.dense
+        if 0 <= index < len(dense) and dense[index] is not None:
+            if op is not None:
+                val = getattr(dense[index], OP_METHODS[op])(val)
+            dense[index] = val
+            return val
+        if index == len(dense) and op is None and self.extensible:
+            # appending, the usual way of filling arrays
+            name = str(index)
+            length_desc = self.own['length']
+            if (length_desc['writable'] and name not in self.own and
+                    (self.prototype is None or self.prototype.get_property(name) is None)):
+                dense.append(val)
+                if index >= length_desc['value'].value:
+                    length_desc['value'] = Js(index + 1)
+                return val
+        return PyJs.put(self, prop, val, op)
+
+    def get_own_property(self, prop):
+        dense = self.dense
+        # Array.prototype and most other arrays in the chain have no elements. The builtins probe
+        # every index of sparse arrays, most of them are holes after dense and are not parsed.
+        if dense and (type(prop) is not str or len(prop) <= 10 and len(dense) > SMALLEST_INDEX[len(prop)]):
+            index = self._index(prop)
+            if 0 <= index < len(dense) and dense[index] is not None:
+                return {'value': dense[index], 'writable': True, 'enumerable': True, 'configurable': True}
+        return self.own.get(prop)
+
+    def own_keys(self):
+        keys = [unicode(i) for i, e in enumerate(self.dense) if e is not None]
+        keys.extend(self.own)
+        return keys
+
+    def delete(self, prop):
+        index = self._dense_index(prop)
+        if index >= 0:
+            self._remove_dense(index)
+            return Js(True)
+        return PyJs.delete(self, prop)
+
     def define_own_property(self, prop, desc):
         old_len_desc = self.get_own_property('length')
         old_len = old_len_desc['value'].value  #  value is js type so convert to py.
@@ -1558,26 +1977,20 @@ class PyJsArray(PyJs):
             if not PyJs.define_own_property(self, prop, new_desc):
                 return False
             if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
+                # elements in self.dense can always be deleted, so only the elements in self.own
+                # (from the highest one) can stop the truncation.
+                indices = sorted((int(ele) for ele in self.own if ele.isdigit() and int(ele)>=new_len), reverse=True)
+                for index in indices:
+                    if not self.delete(str(index)): # if failed to delete set len to current len and reject.
+                        del self.dense[index+1:]
+                        new_desc['value'] = Js(index+1)
+                        if not new_writable:
+                            new_desc['writable'] = False
+                        PyJs.define_own_property(self, prop, new_desc)
+                        return False
+                del self.dense[new_len:]
+                while self.dense and self.dense[-1] is None:
+                    self.dense.pop()
             if not new_writable:
                 self.own['length']['writable'] = False
             return True
@@ -1585,6 +1998,23 @@ class PyJsArray(PyJs):
             index = int(int(prop) % 2**32)
             if index>=old_len and not old_len_desc['writable']:
                 return False
+            dense = self.dense
+            if index < len(dense) + DENSE_GAP and str(index) == prop:
+                if index < len(dense) and dense[index] is not None:
+                    if is_plain_property(desc, False):
+                        if 'value' in desc:
+                            dense[index] = desc['value']
+                        return True
+                    # from now on the element needs its own descriptor
+                    self.own[prop] = self.get_own_property(prop)
+                    self._remove_dense(index)
+                elif prop not in self.own and self.extensible and is_plain_property(desc, True):
+                    if index >= len(dense):
+                        dense.extend([None] * (index + 1 - len(dense)))
+                    dense[index] = desc.get('value', undefined)
+                    if index>=old_len:
+                        old_len_desc['value'] = Js(index + 1)
+                    return True
             if not PyJs.define_own_property(self, prop, desc):
                 return False
             if index>=old_len:
@@ -1594,759 +2024,185 @@ class PyJsArray(PyJs):
             return PyJs.define_own_property(self, prop, desc)
 
     def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
+        dense = self.dense
+        res = []
+        for i in xrange(self.get('length').to_uint32()):
+            if i < len(dense) and dense[i] is not None:
+                res.append(dense[i])
+            else:
+                res.append(self.get(str(i)))
+        return res
 
     def __repr__(self):
         return repr(self.to_python().to_list())
 
 class PyJsArrayBuffer(PyJs):
+    '''Raw memory viewed by typed arrays. self.buff can be any writable object supporting the
+    buffer protocol (bytearray, array.array, numpy.ndarray...), its memory is never copied.'''
     Class = 'ArrayBuffer'
-    def __init__(self, arr=[], prototype=None):
+    def __init__(self, buff=None, prototype=None):
         self.extensible = True
         self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
+        if buff is None or isinstance(buff, (list, tuple)):  # byte values
+            buff = bytearray(buff or ())
+        self.buff = buff
+        self.own = {'byteLength': {'value': Js(byte_length(buff)), 'writable': False,
+                                   'enumerable': False, 'configurable': False}}
+
+    def byte_length(self):
+        return int(self.own['byteLength']['value'].value)
 
     def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
+        return [Js(e) for e in copy_bytes(self.buff, 0, self.byte_length())]
 
     def __repr__(self):
-        return repr(self.to_python().to_list())
+        return 'ArrayBuffer(%d)' % self.byte_length()
 
-class PyJsInt8Array(PyJs):
-    Class = 'Int8Array'
-    def __init__(self, arr=[], prototype=None):
+
+class PyJsTypedArray(PyJs):
+    '''Base of Int8Array, Uint8Array... Elements are not properties, they are read from and written
+    to self.view - a view of the memory of self.buffer (PyJsArrayBuffer) shared with other views.
+
+    arr can be a list of values (copied to new memory), numpy.ndarray, array.array or memoryview
+    (viewed without copying). Alternatively a PyJsArrayBuffer can be passed as buffer.'''
+    Class = 'TypedArray'
+    FORMAT = 'd'  # struct format of the element
+    convert = staticmethod(float)  # converts number to the value stored in the view
+    def __init__(self, arr=(), prototype=None, buffer=None, byte_offset=0, length=None):
         self.extensible = True
         self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
+        size = struct.calcsize(self.FORMAT)
+        if buffer is None:
+            if NUMPY_AVAILABLE and isinstance(arr, numpy.ndarray):
+                # numpy handles strides and byte order itself
+                buffer = PyJsArrayBuffer(arr, ArrayBufferPrototype)
+                view = arr
+            elif isinstance(arr, (array.array, memoryview)):
+                buffer = PyJsArrayBuffer(arr, ArrayBufferPrototype)
+                view = make_view(arr, self.FORMAT, 0, buffer.byte_length() // size)
+            else:
+                convert = self.convert
+                view = array.array(self.FORMAT, [convert(Js(e).to_number().value) for e in arr])
+                buffer = PyJsArrayBuffer(view, ArrayBufferPrototype)
+        else:
+            if length is None:
+                length = (buffer.byte_length() - byte_offset) // size
+            view = make_view(buffer.buff, self.FORMAT, byte_offset, length)
+        self.view = view
+        self.length = len(view)
+        self.own = {}
+        for name, value in (('length', self.length), ('byteLength', self.length * size),
+                            ('byteOffset', byte_offset), ('buffer', buffer)):
+            self.own[name] = {'value': Js(value), 'writable': False, 'enumerable': False, 'configurable': False}
+
+    def get(self, prop):
+        index = array_index(prop)
+        if index >= 0:
+            if index < self.length:
+                return Js(self.view[index])
+            return undefined
+        return PyJs.get(self, prop)
+
+    def put(self, prop, val, op=None):
+        index = array_index(prop)
+        if index >= 0:
+            if op is not None:
+                val = getattr(self.get(prop), OP_METHODS[op])(val)
+            if index < self.length:
+                self.view[index] = self.convert(val.to_number().value)
+            return val
+        return PyJs.put(self, prop, val, op)
+
+    def get_own_property(self, prop):
+        index = array_index(prop)
+        if index >= 0:
+            if index < self.length:
+                return {'value': Js(self.view[index]), 'writable': True, 'enumerable': True, 'configurable': False}
+            return None
+        return self.own.get(prop)
 
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
     def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
+        index = array_index(prop)
+        if index >= 0:
+            if (index >= self.length or is_accessor_descriptor(desc) or desc.get('configurable') or
+                    desc.get('enumerable') is False or desc.get('writable') is False):
                 return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
+            if 'value' in desc:
+                self.view[index] = self.convert(desc['value'].to_number().value)
             return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
+        return PyJs.define_own_property(self, prop, desc)
+
+    def delete(self, prop):
+        index = array_index(prop)
+        if index >= 0:
+            return Js(index >= self.length)
+        return PyJs.delete(self, prop)
+
+    def own_keys(self):
+        keys = [unicode(i) for i in xrange(self.length)]
+        keys.extend(self.own)
+        return keys
 
     def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
+        view = self.view
+        return [Js(view[i]) for i in xrange(self.length)]
 
     def __repr__(self):
         return repr(self.to_python().to_list())
 
-class PyJsUint8Array(PyJs):
+
+class PyJsInt8Array(PyJsTypedArray):
+    Class = 'Int8Array'
+    FORMAT = 'b'
+    convert = staticmethod(integer_converter(8, True))
+
+
+class PyJsUint8Array(PyJsTypedArray):
     Class = 'Uint8Array'
-    def __init__(self, arr=[], prototype=None):
-        self.extensible = True
-        self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
+    FORMAT = 'B'
+    convert = staticmethod(integer_converter(8, False))
 
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
 
-    def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
-
-    def __repr__(self):
-        return repr(self.to_python().to_list())
-
-class PyJsUint8ClampedArray(PyJs):
+class PyJsUint8ClampedArray(PyJsTypedArray):
     Class = 'Uint8ClampedArray'
-    def __init__(self, arr=[], prototype=None):
-        self.extensible = True
-        self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
+    FORMAT = 'B'
+    convert = staticmethod(to_uint8_clamped)
 
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
-
-    def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
 
-    def __repr__(self):
-        return repr(self.to_python().to_list())
-
-class PyJsInt16Array(PyJs):
+class PyJsInt16Array(PyJsTypedArray):
     Class = 'Int16Array'
-    def __init__(self, arr=[], prototype=None):
-        self.extensible = True
-        self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
-
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
+    FORMAT = 'h'
+    convert = staticmethod(integer_converter(16, True))
 
-    def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
-
-    def __repr__(self):
-        return repr(self.to_python().to_list())
 
-class PyJsUint16Array(PyJs):
+class PyJsUint16Array(PyJsTypedArray):
     Class = 'Uint16Array'
-    def __init__(self, arr=[], prototype=None):
-        self.extensible = True
-        self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
+    FORMAT = 'H'
+    convert = staticmethod(integer_converter(16, False))
 
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
 
-    def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
-
-    def __repr__(self):
-        return repr(self.to_python().to_list())
-
-class PyJsInt32Array(PyJs):
+class PyJsInt32Array(PyJsTypedArray):
     Class = 'Int32Array'
-    def __init__(self, arr=[], prototype=None):
-        self.extensible = True
-        self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
+    FORMAT = 'i'
+    convert = staticmethod(integer_converter(32, True))
 
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
-
-    def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
-
-    def __repr__(self):
-        return repr(self.to_python().to_list())
 
-class PyJsUint32Array(PyJs):
+class PyJsUint32Array(PyJsTypedArray):
     Class = 'Uint32Array'
-    def __init__(self, arr=[], prototype=None):
-        self.extensible = True
-        self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
+    FORMAT = 'I'
+    convert = staticmethod(integer_converter(32, False))
 
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
-
-    def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
-
-    def __repr__(self):
-        return repr(self.to_python().to_list())
 
-class PyJsFloat32Array(PyJs):
+class PyJsFloat32Array(PyJsTypedArray):
     Class = 'Float32Array'
-    def __init__(self, arr=[], prototype=None):
-        self.extensible = True
-        self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
+    FORMAT = 'f'
+    convert = staticmethod(to_float32)
 
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
-
-    def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
 
-    def __repr__(self):
-        return repr(self.to_python().to_list())
-
-class PyJsFloat64Array(PyJs):
+class PyJsFloat64Array(PyJsTypedArray):
     Class = 'Float64Array'
-    def __init__(self, arr=[], prototype=None):
-        self.extensible = True
-        self.prototype = prototype
-        self.own = {'length' : {'value': Js(0), 'writable': True,
-                                            'enumerable': False, 'configurable': False}}
-
-        for i, e in enumerate(arr):
-            self.define_own_property(str(i), {'value': Js(e), 'writable': True,
-                                              'enumerable': True, 'configurable': True})
-    def define_own_property(self, prop, desc):
-        old_len_desc = self.get_own_property('length')
-        old_len = old_len_desc['value'].value  #  value is js type so convert to py.
-        if prop=='length':
-            if 'value' not in desc:
-                return PyJs.define_own_property(self, prop, desc)
-            new_len =  desc['value'].to_uint32()
-            if new_len!=desc['value'].to_number().value:
-                raise MakeError('RangeError', 'Invalid range!')
-            new_desc = dict((k,v) for k,v in six.iteritems(desc))
-            new_desc['value'] = Js(new_len)
-            if new_len>=old_len:
-                return PyJs.define_own_property(self, prop, new_desc)
-            if not old_len_desc['writable']:
-                return False
-            if 'writable' not in new_desc or new_desc['writable']==True:
-                new_writable = True
-            else:
-                new_writable = False
-                new_desc['writable'] = True
-            if not PyJs.define_own_property(self, prop, new_desc):
-                return False
-            if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = Js(old_len+1)
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(str(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = Js(old_len+1)
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc)
-                            return False
-            if not new_writable:
-                self.own['length']['writable'] = False
-            return True
-        elif prop.isdigit():
-            index = int(int(prop) % 2**32)
-            if index>=old_len and not old_len_desc['writable']:
-                return False
-            if not PyJs.define_own_property(self, prop, desc):
-                return False
-            if index>=old_len:
-                old_len_desc['value'] = Js(index + 1)
-            return True
-        else:
-            return PyJs.define_own_property(self, prop, desc)
-
-    def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
-
-    def __repr__(self):
-        return repr(self.to_python().to_list())
+    FORMAT = 'd'
+    convert = staticmethod(float)
 
 ArrayPrototype = PyJsArray([], ObjectPrototype)
 
@@ -2370,18 +2226,65 @@ Float32ArrayPrototype = PyJsFloat32Array([], ObjectPrototype)
 
 Float64ArrayPrototype = PyJsFloat64Array([], ObjectPrototype)
 
+# struct format of the element -> typed array viewing such elements
+TYPED_ARRAYS = {
+    'b': (PyJsInt8Array, Int8ArrayPrototype),
+    'B': (PyJsUint8Array, Uint8ArrayPrototype),
+    'h': (PyJsInt16Array, Int16ArrayPrototype),
+    'H': (PyJsUint16Array, Uint16ArrayPrototype),
+    'i': (PyJsInt32Array, Int32ArrayPrototype),
+    'I': (PyJsUint32Array, Uint32ArrayPrototype),
+    'f': (PyJsFloat32Array, Float32ArrayPrototype),
+    'd': (PyJsFloat64Array, Float64ArrayPrototype),
+}
+
+
+def construct_typed_array(cls, prototype, args):
+    '''new TypedArray(length), new TypedArray(array-like) or new TypedArray(buffer, byteOffset, length).
+    The buffer is a PyJsArrayBuffer or a wrapped python object supporting the buffer protocol.'''
+    size = struct.calcsize(cls.FORMAT)
+    a = args[0]
+    buffer = None
+    if isinstance(a, PyJsArrayBuffer):
+        buffer = a
+    elif isinstance(a, PyObjectWrapper):
+        try:
+            buffer = PyJsArrayBuffer(a.obj, ArrayBufferPrototype)
+        except TypeError:  # not a buffer
+            pass
+    if buffer is not None:
+        total = buffer.byte_length()
+        offset = 0 if args[1].is_undefined() else args[1].to_int()
+        if offset < 0 or offset % size:
+            raise MakeError('RangeError', 'Start offset of %s should be a multiple of %d' % (cls.Class, size))
+        if args[2].is_undefined():
+            if total % size:
+                raise MakeError('RangeError', 'Byte length of %s should be a multiple of %d' % (cls.Class, size))
+            length = (total - offset) // size
+        else:
+            length = args[2].to_int()
+        if length < 0 or offset + length * size > total:
+            raise MakeError('RangeError', 'Invalid typed array length')
+        return cls(prototype=prototype, buffer=buffer, byte_offset=offset, length=length)
+    if a.is_object():  # array-like, elements are copied
+        if isinstance(a, (PyJsArray, PyJsTypedArray)):
+            return cls(a.to_list(), prototype)
+        return cls([a.get(str(i)) for i in xrange(a.get('length').to_uint32())], prototype)
+    length = a.to_number().value if not a.is_undefined() else 0
+    if not 0 <= length < 2**32 or length % 1:
+        raise MakeError('RangeError', 'Invalid typed array length')
+    return cls(array.array(cls.FORMAT, [0]) * int(length), prototype)
+
 class PyJsArguments(PyJs):
     Class = 'Arguments'
     def __init__(self, args, callee):
-        self.own = {}
         self.extensible = True
         self.prototype = ObjectPrototype
-        self.define_own_property('length', {'value': Js(len(args)), 'writable': True,
-                                            'enumerable': False, 'configurable': True})
-        self.define_own_property('callee', {'value': callee, 'writable': True,
-                                            'enumerable': False, 'configurable': True})
-        for i, e in enumerate(args):
-            self.put(str(i), Js(e))
+        # new object, so the properties can be created directly
+        self.own = dict((str(i), {'value': e, 'writable': True, 'enumerable': True, 'configurable': True})
+                        for i, e in enumerate(args))
+        self.own['length'] = {'value': Js(len(args)), 'writable': True, 'enumerable': False, 'configurable': True}
+        self.own['callee'] = {'value': callee, 'writable': True, 'enumerable': False, 'configurable': True}
 
     def to_list(self):
         return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
@@ -2392,10 +2295,125 @@ FunctionPrototype = PyJsFunction(Empty, ObjectPrototype)
 FunctionPrototype.own['name']['value'] = Js('')
 
 
+# Inline caches. The translator creates a PropertyCache for every obj.prop and obj.prop(...) site with
+# a constant property name and they remember where the property was found. Objects of the prototype
+# chains they rely on get cache_dependency set and any change of their properties (other than the new
+# value of a data property) or of their prototype invalidates the cached lookups of all the caches.
+inline_cache_epoch = 0
+
+
+def invalidate_inline_caches():
+    global inline_cache_epoch
+    inline_cache_epoch += 1
+
+
+# kinds of the cache entries
+OWN_SLOT, PROTO_SLOT, PROTO_DATA, PROTO_ACCESSOR, MISSING = range(5)
+
+
+class PropertyCache(object):
+    '''Polymorphic inline cache of a property access site in the translated code.
+
+    An entry is kept for each kind of receiver seen (its shape for PyJsObject, its class otherwise).
+    The property name is checked on every access, so a cache shared by many sites is still correct.'''
+    MAX_ENTRIES = 4
+    # sites with more failed attempts to cache the property are megamorphic and just do obj.get(prop)
+    MAX_MISSES = 8
+    RECEIVERS = frozenset([PyJsObject, PyJsArray, PyJsFunction, PyJsString, PyJsNumber, PyJsBoolean])
+    # objects that can be on cached prototype chains (their changes call invalidate_inline_caches)
+    PROTOTYPES = frozenset([PyJsObject, PyJsArray, PyJsFunction])
+
+    def __init__(self):
+        self.prop = None
+        self.entries = []
+        self.misses = 0
+
+    def get(self, obj, prop):
+        entries = self.entries
+        if entries is None:
+            return obj.get(prop)
+        if prop != self.prop:
+            self.prop = prop
+            del entries[:]
+        cls = type(obj)
+        key = obj.shape if cls is PyJsObject else cls
+        for entry in entries:
+            if entry[0] is key:
+                kind = entry[1]
+                if kind is OWN_SLOT:
+                    return obj.slots[entry[4]]
+                # functions and strings create their own properties lazily, they only have them once created
+                own = obj.__dict__.get('own')
+                if entry[5] == inline_cache_epoch and obj.prototype is entry[2] and (own is None or prop not in own):
+                    if kind is PROTO_SLOT:
+                        return entry[3].slots[entry[4]]
+                    if kind is PROTO_DATA:
+                        return entry[4]['value']
+                    if kind is PROTO_ACCESSOR:
+                        getter = entry[4]['get']
+                        return getter if getter.is_undefined() else getter.call(obj)
+                    return undefined
+                entries.remove(entry)
+                break
+        res = obj.get(prop)
+        entry = self._lookup(obj, prop, key)
+        if entry is None:
+            self.misses += 1
+            if self.misses > self.MAX_MISSES:
+                self.entries = None
+        elif len(entries) < self.MAX_ENTRIES:
+            entries.append(entry)
+        else:
+            self.entries = None
+        return res
+
+    def _lookup(self, obj, prop, key):
+        '''Returns the cache entry for the access of prop on obj or None if it can't be cached'''
+        if type(obj) not in self.RECEIVERS or obj.get_own_property(prop) is not None:
+            return None
+        try:
+            int(prop)
+            return None  # array indices, characters of strings...
+        except ValueError:
+            pass
+        if type(obj) is PyJsObject:
+            index = key.lookup(prop)
+            if index is not None:
+                return (key, OWN_SLOT, None, None, index, None)
+        proto = holder = obj.prototype
+        while holder is not None:
+            if type(holder) not in self.PROTOTYPES:
+                return None
+            holder.cache_dependency = True
+            if type(holder) is PyJsObject:
+                index = holder.shape.lookup(prop)
+                if index is not None:
+                    return (key, PROTO_SLOT, proto, holder, index, inline_cache_epoch)
+            desc = holder.own.get(prop)
+            if desc is not None:
+                kind = PROTO_ACCESSOR if is_accessor_descriptor(desc) else PROTO_DATA
+                return (key, kind, proto, holder, desc, inline_cache_epoch)
+            holder = holder.prototype
+        return (key, MISSING, proto, None, None, inline_cache_epoch)
+
+    def callprop(self, obj, prop, *args):
+        if type(obj) not in self.RECEIVERS:
+            return obj.callprop(prop, *args)
+        cand = self.get(obj, prop)
+        if not cand.is_callable():
+            raise MakeError('TypeError', '%s is not a function' % cand.typeof())
+        return cand.call(obj, args)
+
+    # used by the translator when it rewrites obj.prop to obj.prop = val or delete obj.prop
+    def put(self, obj, prop, val, op=None):
+        return obj.put(prop, val, op)
+
+    def delete(self, obj, prop):
+        return obj.delete(prop)
+
+
 # I will not rewrite RegExp engine from scratch. I will use re because its much faster.
 # I have to only make sure that I am handling all the differences correctly.
-REGEXP_DB = {}
-
 class PyJsRegExp(PyJs):
     Class = 'RegExp'
     extensible = True
@@ -2426,36 +2444,9 @@ class PyJsRegExp(PyJs):
             self.value = regexp[1:-1]
 
         try:
-            if self.value in REGEXP_DB:
-                self.pat = REGEXP_DB[regexp]
-            else:
-                comp =  'None'
-                # we have to check whether pattern is valid.
-                # also this will speed up matching later
-                # todo critical fix patter conversion etc. ..!!!!!
-                # ugly hacks porting js reg exp to py reg exp works in 99% of cases ;)
-                possible_fixes = [
-                    (u'[]', u'[\0]'),
-                    (u'[^]', u'[^\0]'),
-                    (u'nofix1791', u'nofix1791')
-                ]
-                reg = self.value
-                for fix, rep in possible_fixes:
-                    comp = REGEXP_CONVERTER._interpret_regexp(reg, flags)
-                    #print 'reg -> comp', reg, '->', comp
-                    try:
-                        self.pat = re.compile(comp, self.ignore_case | self.multiline)
-                        #print reg, '->', comp
-                        break
-                    except:
-                        reg = reg.replace(fix, rep)
-                       # print 'Fix', fix, '->', rep, '=', reg
-                else:
-                    raise
-                REGEXP_DB[regexp] = self.pat
-        except:
-            #print 'Invalid pattern but fuck it', self.value, comp
-            raise MakeError('SyntaxError', 'Invalid RegExp pattern: %s -> %s'% (repr(self.value), repr(comp)))
+            self.pat = compile_regexp(self.value, flags)
+        except ValueError as e:
+            raise MakeError('SyntaxError', str(e))
         # now set own properties:
         self.own = {'source' : {'value': Js(self.value), 'enumerable': False, 'writable': False, 'configurable': False},
                     'global' : {'value': Js(self.glob), 'enumerable': False, 'writable': False, 'configurable': False},
@@ -2596,6 +2587,8 @@ getter = __proto__
 @Js
 def __proto__(val):
     if val.is_object():
+        if this.cache_dependency:
+            invalidate_inline_caches()
         this.prototype = val
 setter =  __proto__
 ObjectPrototype.define_own_property('__proto__', {'set': setter,
@@ -2755,10 +2748,6 @@ scope = dict(zip(builtins, [eval(e) for e in builtins]))
 JS_BUILTINS = dict((k,v) for k,v in scope.items())
 
 
-# Fill in NUM_BANK
-for e in xrange(-2**10,2**14):
-    NUM_BANK[e] = Js(e)
-
 if __name__=='__main__':
     print(ObjectPrototype.get('toString').callprop('call'))
     print(FunctionPrototype.own)
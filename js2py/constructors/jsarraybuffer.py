@@ -1,27 +1,28 @@
 # this is based on jsarray.py
 
-# todo check everything :)
-
 from ..base import *
-try:
-    import numpy
-except:
-    pass
 
 
 @Js
 def ArrayBuffer():
     a = arguments[0]
-    if isinstance(a, PyJsNumber):
-        length = a.to_uint32()
-        if length!=a.value:
-            raise MakeError('RangeError', 'Invalid array length')
-        temp = Js(bytearray([0]*length))
-        return temp
-    return Js(bytearray([0]))
+    length = a.to_number().value if not a.is_undefined() else 0
+    if not 0 <= length < 2**32 or length % 1:
+        raise MakeError('RangeError', 'Invalid array buffer length')
+    return PyJsArrayBuffer(bytearray(int(length)), ArrayBufferPrototype)
 
 ArrayBuffer.create = ArrayBuffer
-ArrayBuffer.own['length']['value'] = Js(None)
+ArrayBuffer.own['length']['value'] = Js(1)
+
+@Js
+def isView(arg):
+    return isinstance(arg, PyJsTypedArray)
+
+
+ArrayBuffer.define_own_property('isView', {'value': isView,
+                                         'enumerable': False,
+                                         'writable': True,
+                                         'configurable': True})
 
 ArrayBuffer.define_own_property('prototype', {'value': ArrayBufferPrototype,
                                          'enumerable': False,
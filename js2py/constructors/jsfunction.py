@@ -18,18 +18,19 @@ def Function():
     js_func = '(function (%s) {%s})' % (','.join(args), body)
     # now translate js inline to python function
     py_func =  translate_js(js_func, '')
-    # add set func scope to global scope
-    # a but messy solution but works :)
-    globals()['var'] = PyJs.GlobalObject
-    # define py function and return it
-    temp = executor(py_func, globals())
+    # define py function with the global scope as its scope and return it
+    # (wrapped in a child Scope because the global object does not raise ReferenceError on its own)
+    temp = executor(py_func, Scope({}, PyJs.GlobalObject))
     temp.source = '{%s}'%body
     temp.func_name = 'anonymous'
     return temp
 
-def executor(f, glob):
-    exec(f, globals())
-    return globals()['PyJs_anonymous_0_']
+def executor(f, var):
+    # own namespace for every call so that Function is safe to call from many threads
+    glob = dict(globals())
+    glob['var'] = var
+    exec(f, glob)
+    return glob['PyJs_anonymous_0_']
 
 
 #new statement simply calls Function
@@ -35,12 +35,12 @@ class ObjectMethods:
     def getOwnPropertyDescriptor (obj, prop):
         if not obj.is_object():
             raise MakeError('TypeError', 'Object.getOwnPropertyDescriptor called on non-object')
-        return obj.own.get(prop.to_string().value) # will return undefined if we dont have this prop
+        return obj.get_own_property(prop.to_string().value) # will return undefined if we dont have this prop
 
     def getOwnPropertyNames(obj):
         if not obj.is_object():
             raise MakeError('TypeError', 'Object.getOwnPropertyDescriptor called on non-object')
-        return obj.own.keys()
+        return obj.own_keys()
 
     def create(obj):
         if not (obj.is_object() or obj.is_null()):
@@ -74,18 +74,19 @@ class ObjectMethods:
     def seal(obj):
         if not obj.is_object():
             raise MakeError('TypeError', 'Object.seal called on non-object')
-        for desc in obj.own.values():
-            desc['configurable'] = False
+        for name in obj.own_keys():
+            obj.define_own_property(name, {'configurable': False})
         obj.extensible = False
         return obj
 
     def freeze(obj):
         if not obj.is_object():
             raise MakeError('TypeError', 'Object.freeze called on non-object')
-        for desc in obj.own.values():
-            desc['configurable'] = False
-            if is_data_descriptor(desc):
+        for name in obj.own_keys():
+            desc = {'configurable': False}
+            if is_data_descriptor(obj.get_own_property(name)):
                 desc['writable'] = False
+            obj.define_own_property(name, desc)
         obj.extensible = False
         return obj
 
@@ -100,8 +101,8 @@ class ObjectMethods:
             raise MakeError('TypeError', 'Object.isSealed called on non-object')
         if obj.extensible:
             return False
-        for desc in obj.own.values():
-            if desc['configurable']:
+        for name in obj.own_keys():
+            if obj.get_own_property(name)['configurable']:
                 return False
         return True
 
@@ -110,7 +111,8 @@ class ObjectMethods:
             raise MakeError('TypeError', 'Object.isFrozen called on non-object')
         if obj.extensible:
             return False
-        for desc in obj.own.values():
+        for name in obj.own_keys():
+            desc = obj.get_own_property(name)
             if desc['configurable']:
                 return False
             if is_data_descriptor(desc) and desc['writable']:
@@ -125,7 +127,7 @@ class ObjectMethods:
     def keys(obj):
         if not obj.is_object():
             raise MakeError('TypeError', 'Object.keys called on non-object')
-        return [e for e,d in six.iteritems(obj.own) if d.get('enumerable')]
+        return [e for e in obj.own_keys() if obj.get_own_property(e).get('enumerable')]
 
 
 # add methods attached to Object constructor
@@ -3,15 +3,24 @@ import time
 import datetime
 import warnings
 
-try:
-    from tzlocal import get_localzone
-    LOCAL_ZONE = get_localzone()
-except: # except all problems...
-    warnings.warn('Please install or fix tzlocal library (pip install tzlocal) in order to make Date object work better. Otherwise I will assume DST is in effect all the time')
-    class LOCAL_ZONE:
-        @staticmethod
-        def dst(*args):
-            return 1
+class DefaultZone:
+    @staticmethod
+    def dst(*args):
+        return 1
+
+LOCAL_ZONE = None
+
+def get_local_zone():
+    # tzlocal is slow to import and to detect the zone so do it only when Date really needs it
+    global LOCAL_ZONE
+    if LOCAL_ZONE is None:
+        try:
+            from tzlocal import get_localzone
+            LOCAL_ZONE = get_localzone()
+        except: # except all problems...
+            warnings.warn('Please install or fix tzlocal library (pip install tzlocal) in order to make Date object work better. Otherwise I will assume DST is in effect all the time')
+            LOCAL_ZONE = DefaultZone
+    return LOCAL_ZONE
 
 from js2py.base import MakeError
 CUM = (0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334, 365)
@@ -34,7 +43,7 @@ def DaylightSavingTA(t):
     if t is NaN:
         return t
     try:
-        return int(LOCAL_ZONE.dst(datetime.datetime.utcfromtimestamp(t//1000)).seconds)*1000
+        return int(get_local_zone().dst(datetime.datetime.utcfromtimestamp(t//1000)).seconds)*1000
     except:
         warnings.warn('Invalid datetime date, assumed DST time, may be inaccurate...', Warning)
         return 1
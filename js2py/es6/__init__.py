@@ -1,32 +1,80 @@
+'''ES6 support. ES6 code is converted to ES5 by babel (translated to python in babel.py).
+
+Importing babel.py takes a long time, it happens on the first use or when init_babel is called.
+Processes that fork workers can call init_babel first so that the workers get babel ready to use
+(see JsPool). Results of js6_to_js5 are cached in memory and in the disk cache if it is enabled
+(see enable_disk_cache), so the same code is converted only once.'''
+import threading
+from ..translators import translator
+from ..utils.cache import BoundedCache
+
 INITIALISED = False
 babel = None
 babelPresetEs2015 = None
 
-def js6_to_js5(code):
+# babel is not thread safe
+_lock = threading.RLock()
+
+# ES6 source -> ES5 source
+cache = BoundedCache(max_size=1024)
+
+
+def init_babel(warmup=False):
+    '''Imports babel if it was not imported yet.
+
+    warmup=True also runs the old warm-up hack (the first conversion is interrupted with signal.alarm and
+    then it sleeps for up to 3 seconds). It only works in the main thread and babel works without it.'''
     global INITIALISED, babel, babelPresetEs2015
-    if not INITIALISED:
-        import signal, warnings, time
+    with _lock:
+        if INITIALISED:
+            return
+        import warnings
         warnings.warn('\nImporting babel.py for the first time - this can take some time. \nPlease note that currently Javascript 6 in Js2Py is unstable and slow. Use only for tiny scripts!')
 
         from .babel import babel as _babel
         babel = _babel.Object.babel
         babelPresetEs2015 = _babel.Object.babelPresetEs2015
-
-        # very weird hack. Somehow this helps babel to initialise properly!
-        try:
-            babel.transform('warmup', {'presets': {}})
-            signal.alarm(2)
-            def kill_it(a,b): raise KeyboardInterrupt('Better work next time!')
-            signal.signal(signal.SIGALRM, kill_it)
-            babel.transform('stuckInALoop', {'presets': babelPresetEs2015}).code
-            for n in range(3):
-                time.sleep(1)
-        except:
-            print("Initialised babel!")
+        if warmup:
+            _warmup()
         INITIALISED = True
-    return babel.transform(code, {'presets': babelPresetEs2015}).code
+
+
+def _warmup():
+    import signal, time
+    # very weird hack. Somehow this helps babel to initialise properly!
+    try:
+        babel.transform('warmup', {'presets': {}})
+        signal.alarm(2)
+        def kill_it(a,b): raise KeyboardInterrupt('Better work next time!')
+        signal.signal(signal.SIGALRM, kill_it)
+        babel.transform('stuckInALoop', {'presets': babelPresetEs2015}).code
+        for n in range(3):
+            time.sleep(1)
+    except:
+        print("Initialised babel!")
+
+
+def js6_to_js5(code):
+    es5 = cache.get(code)
+    if es5 is not None:
+        return es5
+    disk_cache = translator.disk_cache
+    key = u'es5:' + code
+    if disk_cache is not None:
+        data = disk_cache.get(key)
+        if data is not None:
+            es5 = data.decode('utf-8')
+            cache.put(code, es5)
+            return es5
+    init_babel()
+    with _lock:
+        es5 = babel.transform(code, {'presets': babelPresetEs2015}).code
+    cache.put(code, es5)
+    if disk_cache is not None:
+        disk_cache.set(key, es5.encode('utf-8'))
+    return es5
 
 if __name__=='__main__':
     print(js6_to_js5('obj={}; obj.x = function() {return () => this}'))
     print()
-    print(js6_to_js5('const a = 1;'))
\ No newline at end of file
+    print(js6_to_js5('const a = 1;'))
@@ -1,6 +1,11 @@
 # coding=utf-8
-from .translators import translate_js, DEFAULT_HEADER
+from .translators import translate_js, DEFAULT_HEADER, enable_disk_cache, disable_disk_cache
+from .translators import translator
 from .es6 import js6_to_js5
+from .utils.cache import BoundedCache
+from .utils.limits import ExecutionLimits, JsLimitExceeded
+from .snapshot import shared_objects, fork
+from .base import PyJs
 import sys
 import time
 import json
@@ -8,8 +13,17 @@ import six
 import os
 import hashlib
 import codecs
-
-__all__  = ['EvalJs', 'translate_js', 'import_js', 'eval_js', 'translate_file', 'eval_js6', 'translate_js6', 'run_file', 'disable_pyimport', 'get_file_contents', 'write_file_contents']
+import keyword
+import re
+import marshal
+try:
+    from importlib.util import MAGIC_NUMBER as PY_MAGIC
+except ImportError:
+    import imp
+    PY_MAGIC = imp.get_magic()
+
+__all__  = ['EvalJs', 'translate_js', 'import_js', 'eval_js', 'translate_file', 'translate_package', 'eval_js6', 'translate_js6', 'run_file', 'disable_pyimport', 'get_file_contents', 'write_file_contents',
+            'enable_disk_cache', 'disable_disk_cache', 'SnippetCache', 'JsLimitExceeded']
 DEBUG = False
 
 
@@ -66,17 +80,167 @@ def translate_file(input_path, output_path):
     '''
     js = get_file_contents(input_path)
 
-    py_code = translate_js(js)
     lib_name = os.path.basename(output_path).split('.')[0]
+    write_file_contents(output_path, _module_code(js, lib_name))
+
+
+def _module_code(js, lib_name):
+    py_code = translate_js(js)
     head = '__all__ = [%s]\n\n# Don\'t look below, you will not understand this Python code :) I don\'t.\n\n' % repr(lib_name)
     tail = '\n\n# Add lib to the module scope\n%s = var.to_python()' % lib_name
-    out = head + py_code + tail
-    write_file_contents(output_path, out)
+    return head + py_code + tail
+
+
+MANIFEST_NAME = 'js2py_manifest.json'
+
+
+# module names that can't be imported or would replace the __init__ of the package, also on other python versions
+RESERVED_NAMES = set(keyword.kwlist) | set(['False', 'None', 'True', 'nonlocal', 'async', 'await', 'print', 'exec',
+                                            '__init__', '__main__'])
 
 
+def _module_name(file_name):
+    name = re.sub(r'\W', '_', file_name)
+    if not name or name[0].isdigit():
+        name = '_' + name
+    if name in RESERVED_NAMES:
+        name += '_'
+    return name
+
+
+def _pyc_path(py_path):
+    if six.PY3:
+        from importlib.util import cache_from_source
+        return cache_from_source(py_path)
+    return py_path + 'c'
+
+
+def translate_package(input_dir, output_dir, force=False):
+    '''
+    Translates all the .js files found in input_dir (recursively) into python package output_dir
+    and byte-compiles them, so that importing them later does not require any translation or compilation.
+    Every subdirectory becomes a subpackage and file names are converted to valid module names
+    (names that are python keywords or __init__ get a trailing underscore), for example lib/jquery-1.2.js
+    can be used via:
+    >>> from output_dir.lib.jquery_1_2 import jquery_1_2
+
+    output_dir contains a manifest with hashes of translated sources so when run again
+    only new and modified files are translated. Modules of removed sources are deleted.
+    Use force=True to translate everything again.
+
+    Returns (translated, skipped) lists of source paths relative to input_dir.
+    '''
+    import js2py
+    import py_compile
+    input_dir, output_dir = path_as_local(input_dir), path_as_local(output_dir)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        manifest = {}
+    # modules of all the previously translated files are removed if their sources are gone,
+    # but they are reused only if they were translated by this version of js2py
+    previous_files = manifest.get('files', {})
+    old_files = previous_files if manifest.get('version') == js2py.__version__ and not force else {}
+    files = {}
+    translated, skipped = [], []
+    for root, dirs, names in os.walk(input_dir):
+        dirs.sort()
+        rel_dir = os.path.relpath(root, input_dir)
+        parts = [] if rel_dir == os.curdir else [_module_name(d) for d in rel_dir.split(os.sep)]
+        package_dir = os.path.join(output_dir, *parts)
+        if not os.path.isdir(package_dir):
+            os.makedirs(package_dir)
+        init_path = os.path.join(package_dir, '__init__.py')
+        if not os.path.exists(init_path):
+            write_file_contents(init_path, '')
+        # distinct names can become the same module name (a-b and a_b), their modules would replace each other
+        modules = {}
+        for name in dirs:  # subpackages
+            lib_name = _module_name(name)
+            if lib_name in modules:
+                raise ValueError('%s clashes with %s in %s' % (name, modules[lib_name], root))
+            modules[lib_name] = name
+        for name in sorted(names):
+            if not name.endswith('.js'):
+                continue
+            lib_name = _module_name(name[:-3])
+            if lib_name in modules:
+                raise ValueError('%s clashes with %s in %s' % (name, modules[lib_name], root))
+            modules[lib_name] = name
+            source = os.path.join(rel_dir, name) if parts else name
+            source = source.replace(os.sep, '/')
+            with open(os.path.join(root, name), 'rb') as f:
+                js = f.read()
+            digest = hashlib.sha1(js).hexdigest()
+            module = '/'.join(parts + [lib_name + '.py'])
+            py_path = os.path.join(output_dir, *module.split('/'))
+            files[source] = {'sha1': digest, 'module': module}
+            if old_files.get(source) == files[source] and os.path.exists(py_path):
+                skipped.append(source)
+                if os.path.exists(_pyc_path(py_path)):
+                    continue  # may be missing when built with other python version
+            else:
+                code = _module_code(js.decode('utf-8'), lib_name)
+                with open(py_path, 'wb') as f:
+                    f.write(b'# -*- coding: utf-8 -*-\n' + code.encode('utf-8'))
+                translated.append(source)
+            py_compile.compile(py_path, doraise=True)
+        if not os.path.exists(_pyc_path(init_path)):
+            py_compile.compile(init_path, doraise=True)
+    # remove modules whose sources no longer exist (unless other source is translated to the same module now)
+    current_modules = set(entry['module'] for entry in files.values())
+    for source, entry in previous_files.items():
+        if source not in files and entry['module'] not in current_modules:
+            py_path = os.path.join(output_dir, *entry['module'].split('/'))
+            for path in (py_path, py_path + 'c', _pyc_path(py_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+    with open(manifest_path, 'w') as f:
+        json.dump({'version': js2py.__version__, 'files': files}, f, indent=1, sort_keys=True)
+    return translated, skipped
+
+
+
+
+
+
+def compile_js(js, use_compilation_plan=False):
+    '''Translates js and compiles it to python code object that can be executed in the EvalJs context.
+    Code objects are stored in the disk cache if it is enabled (see enable_disk_cache).'''
+    disk_cache = translator.disk_cache
+    if disk_cache is not None:
+        # marshalled code objects are specific to the python version
+        key = b'code:' + PY_MAGIC + b':' + translator.cache_key(js).encode('utf-8')
+        data = disk_cache.get(key)
+        if data is not None:
+            try:
+                return marshal.loads(data)
+            except (EOFError, ValueError, TypeError):
+                pass # corrupted entry, translate again
+    code = translate_js(js, '', use_compilation_plan=use_compilation_plan)
+    compiled = compile(code, '<EvalJS snippet>', 'exec')
+    if disk_cache is not None:
+        disk_cache.set(key, marshal.dumps(compiled))
+    return compiled
+
 
+def code_size(compiled):
+    '''Approximate size of the compiled snippet in bytes'''
+    return len(marshal.dumps(compiled))
 
 
+def SnippetCache(max_size=1024, max_bytes=None, policy='lru'):
+    '''Returns a bounded cache for compiled snippets that can be passed to (and shared by) EvalJs instances.
+
+    max_size limits the number of snippets, max_bytes their total size (None means no limit).
+    policy is either 'lru' or 'lfu'. Use its info() method to get hit/miss/eviction counters.'''
+    return BoundedCache(max_size, max_bytes, policy, sizeof=code_size)
+
+# used by all EvalJs instances that were not given their own cache
+DEFAULT_SNIPPET_CACHE = SnippetCache()
+
 
 def run_file(path_or_file, context=None):
     ''' Context must be EvalJS object. Runs given path as a JS program. Returns (eval_value, context).
@@ -138,8 +302,12 @@ class EvalJs(object):
         >>> js.x
         30
 
+        cache is a SnippetCache for the compiled code, by default all EvalJs instances share
+        DEFAULT_SNIPPET_CACHE.
+
        You can run interactive javascript console with console method!"""
-    def __init__(self, context={}):
+    def __init__(self, context={}, cache=None):
+        self.__dict__['cache'] = cache if cache is not None else DEFAULT_SNIPPET_CACHE
         self.__dict__['_context'] = {}
         exec(DEFAULT_HEADER, self._context)
         self.__dict__['_var'] = self._context['var'].to_python()
@@ -151,7 +319,20 @@ class EvalJs(object):
         for k, v in six.iteritems(context):
             setattr(self._var, k, v)
 
-    def execute(self, js=None, use_compilation_plan=False):
+    def snapshot(self):
+        """Returns EvalJsSnapshot of the current state of the context. Use its fork method
+        to create new independent contexts without running the initialisation code again:
+
+        >>> base = EvalJs()
+        >>> base.execute('var lib = {calls: 0, f: function () {return ++lib.calls}}')
+        >>> snap = base.snapshot()
+        >>> a, b = snap.fork(), snap.fork()
+        >>> a.lib.f(), a.lib.f(), b.lib.f()
+        (1, 2, 1)
+        """
+        return EvalJsSnapshot(self)
+
+    def execute(self, js=None, use_compilation_plan=False, timeout=None, max_steps=None, max_memory=None):
         """executes javascript js in current context
 
         During initial execute() the converted js is cached for re-use. That means next time you
@@ -161,25 +342,42 @@ class EvalJs(object):
         This cache causes minor overhead (a cache dicts is updated) but the Js=>Py conversion process
         is typically expensive compared to actually running the generated python code.
 
-        Note that the cache is just a dict, it has no expiration or cleanup so when running this
-        in automated situations with vast amounts of snippets it might increase memory usage.
+        The cache is bounded (see SnippetCache) so least recently used snippets are dropped when
+        running vast amounts of different snippets.
+
+        If the disk cache is enabled (see enable_disk_cache) the compiled code is also stored on disk
+        and shared with other processes so the translation is done only once per snippet.
+
+        timeout (seconds), max_steps (loop iterations and function calls) and max_memory (bytes the
+        process can grow by) limit the execution, JsLimitExceeded is raised when any of them is exceeded.
+        See js2py.utils.limits.
         """
-        try:
-            cache = self.__dict__['cache']
-        except KeyError:
-            cache = self.__dict__['cache'] = {}
-        hashkey = hashlib.md5(js.encode('utf-8')).digest()
-        try:
-            compiled = cache[hashkey]
-        except KeyError:
-            code = translate_js(js, '', use_compilation_plan=use_compilation_plan)
-            compiled = cache[hashkey] = compile(code, '<EvalJS snippet>', 'exec')
+        if timeout is None and max_steps is None and max_memory is None:
+            return self._execute(js, use_compilation_plan)
+        with ExecutionLimits(timeout, max_steps, max_memory):
+            self._execute(js, use_compilation_plan)
+
+    def _execute(self, js, use_compilation_plan):
+        cache = self.__dict__['cache']
+        hashkey = hashlib.md5(translator.cache_key(js).encode('utf-8')).digest()
+        compiled = cache.get(hashkey)
+        if compiled is None:
+            compiled = compile_js(js, use_compilation_plan=use_compilation_plan)
+            cache.put(hashkey, compiled)
         exec(compiled, self._context)
 
-    def eval(self, expression, use_compilation_plan=False):
-        """evaluates expression in current context and returns its value"""
+    def execute_incremental(self, js, translator):
+        """executes javascript js in current context like execute, but translates it with translator
+        (IncrementalTranslator) so that when js is a new version of a script executed before, only
+        the top level statements that changed are translated and compiled again"""
+        for code in translator.compile(js):
+            exec(code, self._context)
+
+    def eval(self, expression, use_compilation_plan=False, timeout=None, max_steps=None, max_memory=None):
+        """evaluates expression in current context and returns its value, see execute for the limits"""
         code = 'PyJsEvalResult = eval(%s)'%json.dumps(expression)
-        self.execute(code, use_compilation_plan=use_compilation_plan)
+        self.execute(code, use_compilation_plan=use_compilation_plan, timeout=timeout, max_steps=max_steps,
+                     max_memory=max_memory)
         return self['PyJsEvalResult']
 
     def execute_debug(self, js):
@@ -246,6 +444,37 @@ class EvalJs(object):
 
 
 
+class EvalJsSnapshot(object):
+    """Frozen copy of EvalJs context, changes made to the context after the snapshot was taken
+    (and changes made to the forks) are not visible in the snapshot.
+
+    Forks are copies of all the JS objects of the context (functions are recreated with the copied scopes).
+    Builtin objects like Object or Array.prototype are shared by all the contexts, just like in case of
+    separate EvalJs instances, and so are python objects passed to the context."""
+    def __init__(self, context):
+        self.cache = context.__dict__['cache']
+        self.shared = shared_objects()
+        self.context = self._fork_context(context.__dict__['_context'])
+
+    def _fork_context(self, context):
+        memo = dict(self.shared)
+        new = memo[id(context)] = {}
+        for k, v in six.iteritems(context):
+            new[k] = v if k == '__builtins__' else fork(v, memo)
+        return new
+
+    def fork(self):
+        """Returns new EvalJs with a copy of the snapshot context"""
+        context = self._fork_context(self.context)
+        # just like creating new EvalJs, makes it the current global object
+        PyJs.GlobalObject = context['var'].get('this')
+        js = EvalJs.__new__(EvalJs)
+        js.__dict__['cache'] = self.cache
+        js.__dict__['_context'] = context
+        js.__dict__['_var'] = context['var'].to_python()
+        return js
+
+
 #print x
 
 
@@ -11,7 +11,6 @@ def Eval(code):
     global_scope = this.GlobalObject
     # todo fix scope - we have to behave differently if called through variable other than eval
     # we will use local scope (default)
-    globals()['var'] = local_scope
     try:
         py_code = translate_js(code.to_string().value, '')
     except SyntaxError as syn_err:
@@ -39,12 +38,16 @@ def Eval(code):
                 py_code = '\n'.join(lines)
                 break
     #print py_code
-    executor(py_code)
+    glob = executor(py_code, local_scope)
     if has_return:
-        return globals()['EVAL_RESULT']
+        return glob['EVAL_RESULT']
 
 
 
-def executor(code):
-    exec(code, globals())
+def executor(code, var):
+    # own namespace for every call so that eval is safe to call from many threads
+    glob = dict(globals())
+    glob['var'] = var
+    exec(code, glob)
+    return glob
 
@@ -7,7 +7,8 @@ from desc import *
 from simplex import *
 from conversions import *
 import six
-from pyjsparser import PyJsParser
+from ..utils.regexp_cache import compile_regexp
+from ..utils.shapes import ROOT_SHAPE, DICT_SHAPE, is_plain_property
 from itertools import izip
 
 
@@ -54,14 +55,19 @@ class PyJs(object):
         # takes py returns py
         return self.own.get(prop)
 
+    def own_keys(self):
+        # returns names of all own properties
+        return list(self.own)
+
     def get_property(self, prop):
         assert type(prop) == unicode
         # take py returns py
-        cand = self.get_own_property(prop)
-        if cand:
-            return cand
-        if self.prototype is not None:
-            return self.prototype.get_property(prop)
+        obj = self
+        while obj is not None:  # walks the chain in a loop, the builtins call it for every index
+            cand = obj.get_own_property(prop)
+            if cand:
+                return cand
+            obj = obj.prototype
 
     def put(self, prop, val, throw=False):
         assert type(prop) == unicode
@@ -288,20 +294,24 @@ class PyJsObject(PyJs):
     def __init__(self, prototype=None):
         self.prototype = prototype
         self.own = {}
+        # values of plain properties, self.shape maps their names to indices (see utils/shapes.py)
+        self.shape = ROOT_SHAPE
+        self.slots = []
 
     def _init(self, props, vals):
         i = 0
         for prop, kind in props:
-            if prop in self.own: # just check... probably will not happen very often.
-                if is_data_descriptor(self.own[prop]):
+            current = self.get_own_property(prop)
+            if current is not None: # just check... probably will not happen very often.
+                if is_data_descriptor(current):
                     if kind!='i':
                         raise MakeError('SyntaxError', 'Invalid object initializer! Duplicate property name "%s"' % prop)
                 else:
-                    if kind=='i' or (kind=='g' and 'get' in self.own[prop]) or (kind=='s' and 'set' in self.own[prop]):
+                    if kind=='i' or (kind=='g' and 'get' in current) or (kind=='s' and 'set' in current):
                         raise MakeError('SyntaxError', 'Invalid object initializer! Duplicate setter/getter of prop: "%s"' % prop)
 
             if kind == 'i': # init
-                self.own[prop] = {'value': vals[i], 'writable': True, 'enumerable': True, 'configurable': True}
+                self.define_own_property(prop, {'value': vals[i], 'writable': True, 'enumerable': True, 'configurable': True}, False)
             elif kind == 'g': # get
                 self.define_own_property(prop, {'get': vals[i], 'enumerable': True, 'configurable': True}, False)
             elif kind == 's': # get
@@ -314,31 +324,185 @@ class PyJsObject(PyJs):
         for prop, desc in six.iteritems(prop_descs):
             self.define_own_property(prop, desc)
 
+    def _to_dict_mode(self):
+        for name, value in izip(self.shape.keys, self.slots):
+            self.own[name] = {'value': value, 'writable': True, 'enumerable': True, 'configurable': True}
+        self.shape = DICT_SHAPE
+        self.slots = []
+
+    def get(self, prop):
+        shape = self.shape
+        index = shape.index.get(prop)
+        if index is not None and index < shape.size:
+            return self.slots[index]
+        return PyJs.get(self, prop)
+
+    def put(self, prop, val, throw=False):
+        shape = self.shape
+        index = shape.index.get(prop)
+        if index is not None and index < shape.size:
+            self.slots[index] = val
+            return
+        if self.extensible and prop not in self.own:
+            # new property, unless the prototype chain has a setter or a read-only property
+            if self.prototype is None or self.prototype.get_property(prop) is None:
+                new_shape = shape.add(prop)
+                if new_shape is not None:
+                    self.shape = new_shape
+                    self.slots.append(val)
+                    return
+        return PyJs.put(self, prop, val, throw)
+
+    def get_own_property(self, prop):
+        shape = self.shape
+        index = shape.index.get(prop)
+        if index is not None and index < shape.size:
+            return {'value': self.slots[index], 'writable': True, 'enumerable': True, 'configurable': True}
+        return self.own.get(prop)
+
+    def own_keys(self):
+        return list(self.shape.keys) + list(self.own)
+
+    def delete(self, prop, throw=False):
+        shape = self.shape
+        if shape.lookup(prop) is not None:
+            if prop == shape.name:  # the last one added, just go back to the previous shape
+                self.shape = shape.parent
+                self.slots.pop()
+                return True
+            self._to_dict_mode()
+        return PyJs.delete(self, prop, throw)
+
+    def define_own_property(self, prop, desc, throw):
+        shape = self.shape
+        index = shape.index.get(prop)
+        if index is not None and index < shape.size:
+            if is_plain_property(desc, False):
+                if 'value' in desc:
+                    self.slots[index] = desc['value']
+                return True
+            self._to_dict_mode()
+        elif prop not in self.own and self.extensible and is_plain_property(desc, True):
+            new_shape = self.shape.add(prop)
+            if new_shape is not None:
+                self.shape = new_shape
+                self.slots.append(desc.get('value', undefined))
+                return True
+        return PyJs.define_own_property(self, prop, desc, throw)
+
 
 
 
 # Array
 
-# todo Optimise Array - extremely slow due to index conversions from str to int and back etc.
-# solution - make get and put methods callable with any type of prop and handle conversions from inside
-# if not array then use to_string(prop). In array if prop is integer then just use it
-# also consider removal of these stupid writable, enumerable etc for ints.
+# max number of holes added to the dense storage of an array when an element is put after its end
+DENSE_GAP = 1024
+
+
 class PyJsArray(PyJs):
     Class = 'Array'
     def __init__(self, length, prototype=None):
         self.prototype = prototype
         self.own = {'length' : {'value': float(length), 'writable': True,
                                 'enumerable': False, 'configurable': False}}
+        # Values of plain elements (see is_plain_property) by index. Other elements are normal
+        # properties in self.own and have None (a hole) here.
+        self.dense = []
 
     def _init(self, elements):
-        for i, ele in enumerate(elements):
-            if ele is None: continue
-            self.own[unicode(i)] = {'value': ele, 'writable': True,
-                                    'enumerable': True, 'configurable': True}
+        self.dense = list(elements)
+        while self.dense and self.dense[-1] is None:
+            self.dense.pop()
+
+    def _index(self, prop):
+        """Returns prop (unicode or float) as int if it is an array index, else -1"""
+        if type(prop) is float:
+            if not 0 <= prop < 4294967295 or prop % 1:
+                return -1
+            return int(prop)
+        if type(prop) is not unicode or not prop.isdigit() or (prop[0] == '0' and prop != '0'):
+            return -1
+        try:
+            index = int(prop)
+        except ValueError:  # other unicode digits
+            return -1
+        return index if index < 4294967295 else -1
+
+    def _dense_index(self, prop):
+        """Returns the index of prop if it is an element stored in self.dense, else -1"""
+        if type(prop) is unicode and len(prop) > len(str(len(self.dense))):
+            return -1  # too many digits, not parsed
+        index = self._index(prop)
+        if 0 <= index < len(self.dense) and self.dense[index] is not None:
+            return index
+        return -1
+
+    def _remove_dense(self, index):
+        dense = self.dense
+        dense[index] = None
+        while dense and dense[-1] is None:
+            dense.pop()
+
+    def get_member(self, unconverted_prop):
+        index = self._dense_index(unconverted_prop)
+        if index >= 0:
+            return self.dense[index]
+        return self.get(to_string(unconverted_prop))
+
+    def put_member(self, unconverted_prop, val):
+        index = self._dense_index(unconverted_prop)
+        if index >= 0:
+            self.dense[index] = val
+            return
+        return self.put(to_string(unconverted_prop), val)
+
+    def get(self, prop):
+        if prop == 'length':  # always an own data property
+            return self.own['length']['value']
+        index = self._dense_index(prop)
+        if index >= 0:
+            return self.dense[index]
+        return PyJs.get(self, prop)
+
+    def get_own_property(self, prop):
+        dense = self.dense
+        # Array.prototype and most other arrays in the chain have no elements. The builtins probe
+        # every index of sparse arrays, most of them are holes after dense and are not parsed.
+        if dense and (type(prop) is not unicode or len(prop) <= len(str(len(dense)))):
+            index = self._index(prop)
+            if 0 <= index < len(dense) and dense[index] is not None:
+                return {'value': dense[index], 'writable': True, 'enumerable': True, 'configurable': True}
+        return self.own.get(prop)
+
+    def own_keys(self):
+        keys = [unicode(i) for i, e in enumerate(self.dense) if e is not None]
+        keys.extend(self.own)
+        return keys
+
+    def delete(self, prop, throw=False):
+        index = self._dense_index(prop)
+        if index >= 0:
+            self._remove_dense(index)
+            return True
+        return PyJs.delete(self, prop, throw)
 
     def put(self, prop, val, throw=False):
         assert type(val) != int
         # takes py, returns none
+        index = self._index(prop)
+        dense = self.dense
+        if 0 <= index < len(dense) and dense[index] is not None:
+            dense[index] = val
+            return
+        if index == len(dense) and self.extensible:
+            # appending, the usual way of filling arrays
+            length_desc = self.own['length']
+            if (length_desc['writable'] and prop not in self.own and
+                    (self.prototype is None or self.prototype.get_property(prop) is None)):
+                dense.append(val)
+                if index >= length_desc['value']:
+                    length_desc['value'] = index + 1.
+                return
         if not self.can_put(prop):
             if throw:
                 raise MakeError('TypeError', 'Could not define own property')
@@ -381,26 +545,20 @@ class PyJsArray(PyJs):
             if not PyJs.define_own_property(self, prop, new_desc, False):
                 return False
             if new_len<old_len:
-                # not very efficient for sparse arrays, so using different method for sparse:
-                if old_len>30*len(self.own):
-                    for ele in self.own.keys():
-                        if ele.isdigit() and int(ele)>=new_len:
-                            if not self.delete(ele): # if failed to delete set len to current len and reject.
-                                new_desc['value'] = old_len+1.
-                                if not new_writable:
-                                    new_desc['writable'] = False
-                                PyJs.define_own_property(self, prop, new_desc, False)
-                                return False
-                    old_len = new_len
-                else: # standard method
-                    while new_len<old_len:
-                        old_len -= 1
-                        if not self.delete(unicode(int(old_len))): # if failed to delete set len to current len and reject.
-                            new_desc['value'] = old_len+1.
-                            if not new_writable:
-                                new_desc['writable'] = False
-                            PyJs.define_own_property(self, prop, new_desc, False)
-                            return False
+                # elements in self.dense can always be deleted, so only the elements in self.own
+                # (from the highest one) can stop the truncation.
+                indices = sorted((int(ele) for ele in self.own if ele.isdigit() and int(ele)>=new_len), reverse=True)
+                for index in indices:
+                    if not self.delete(unicode(index)): # if failed to delete set len to current len and reject.
+                        del self.dense[index+1:]
+                        new_desc['value'] = index+1.
+                        if not new_writable:
+                            new_desc['writable'] = False
+                        PyJs.define_own_property(self, prop, new_desc, False)
+                        return False
+                del self.dense[new_len:]
+                while self.dense and self.dense[-1] is None:
+                    self.dense.pop()
             if not new_writable:
                 self.own['length']['writable'] = False
             return True
@@ -409,6 +567,23 @@ class PyJsArray(PyJs):
             index = to_uint32(prop)
             if index>=old_len and not old_len_desc['writable']:
                 return False
+            dense = self.dense
+            if index < len(dense) + DENSE_GAP and unicode(index) == prop:
+                if index < len(dense) and dense[index] is not None:
+                    if is_plain_property(desc, False):
+                        if 'value' in desc:
+                            dense[index] = desc['value']
+                        return True
+                    # from now on the element needs its own descriptor
+                    self.own[prop] = self.get_own_property(prop)
+                    self._remove_dense(index)
+                elif prop not in self.own and self.extensible and is_plain_property(desc, True):
+                    if index >= len(dense):
+                        dense.extend([None] * (index + 1 - len(dense)))
+                    dense[index] = desc.get('value', undefined)
+                    if index>=old_len:
+                        old_len_desc['value'] = index + 1.
+                    return True
             if not PyJs.define_own_property(self, prop, desc, False):
                 return False
             if index>=old_len:
@@ -418,11 +593,15 @@ class PyJsArray(PyJs):
             return PyJs.define_own_property(self, prop, desc, False)
 
     def to_list(self):
-        return [self.get(str(e)) for e in xrange(self.get('length').to_uint32())]
-
+        dense = self.dense
+        res = []
+        for i in xrange(to_uint32(self.get('length'))):
+            if i < len(dense) and dense[i] is not None:
+                res.append(dense[i])
+            else:
+                res.append(self.get(unicode(i)))
+        return res
 
-# database with compiled patterns. Js pattern -> Py pattern.
-REGEXP_DB = {}
 
 class PyJsRegExp(PyJs):
     Class = 'RegExp'
@@ -434,34 +613,10 @@ class PyJsRegExp(PyJs):
         self.multiline = re.MULTILINE if 'm' in flags else 0
         self.value = body
 
-        if (body, flags) in REGEXP_DB:
-            self.pat = REGEXP_DB[body, flags]
-        else:
-            comp = None
-            try:
-                # converting JS regexp pattern to Py pattern.
-                possible_fixes = [
-                    (u'[]', u'[\0]'),
-                    (u'[^]', u'[^\0]'),
-                    (u'nofix1791', u'nofix1791')
-                ]
-                reg = self.value
-                for fix, rep in possible_fixes:
-                    comp = PyJsParser()._interpret_regexp(reg, flags)
-                    #print 'reg -> comp', reg, '->', comp
-                    try:
-                        self.pat = re.compile(comp, self.ignore_case | self.multiline)
-                        #print reg, '->', comp
-                        break
-                    except:
-                        reg = reg.replace(fix, rep)
-                       # print 'Fix', fix, '->', rep, '=', reg
-                else:
-                    raise Exception()
-                REGEXP_DB[body, flags] = self.pat
-            except:
-                #print 'Invalid pattern...', self.value, comp
-                raise MakeError('SyntaxError', 'Invalid RegExp pattern: %s -> %s'% (repr(self.value), repr(comp)))
+        try:
+            self.pat = compile_regexp(body, flags)
+        except ValueError as e:
+            raise MakeError('SyntaxError', str(e))
         # now set own properties:
         self.own = {'source' : {'value': self.value, 'enumerable': False, 'writable': False, 'configurable': False},
                     'global' : {'value': self.glob, 'enumerable': False, 'writable': False, 'configurable': False},
@@ -618,7 +773,7 @@ class Scope(PyJs):
         # slow, global scope
         if var not in self.own:
             # try in ObjectPrototype...
-            if var in self.space.ObjectPrototype.own:
+            if self.space.ObjectPrototype.get_own_property(var) is not None:
                 return self.space.ObjectPrototype.get(var)
             if throw:
                 raise MakeError('ReferenceError', '%s is not defined' % var)
@@ -654,16 +809,36 @@ def get_new_arguments_obj(args, space):
     return obj
 
 
+LAZY_FUNCTION_PROPERTIES = frozenset([u'length', u'name', u'prototype'])
+
+
+class LazyFunctionProperties(object):
+    ''' own properties of a function (length, name and prototype of user defined functions) are created
+        on the first access to PyJsFunction.own. most of the functions, for example callbacks, are only called'''
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        own = obj.__dict__['own'] = {}
+        own['length'] = {'value': float(len(obj.params)), 'writable': False, 'enumerable': False, 'configurable': False}
+        if obj.name:
+            own['name'] = {'value': obj.name, 'writable': False, 'enumerable': False, 'configurable': True}
+        if not obj.is_native:
+            # constructor points to this function
+            proto = obj.space.NewObject()
+            proto.own['constructor'] = {'value': obj, 'writable': True, 'enumerable': False, 'configurable': True}
+            own['prototype'] = {'value': proto, 'writable': True, 'enumerable': False, 'configurable': False}
+        return own
+
 
 #Function
 class PyJsFunction(PyJs):
     Class = 'Function'
     source = '{ [native code] }'
     IS_CONSTRUCTOR = True
+    own = LazyFunctionProperties()  # shadowed by the instance attribute once created
 
-    def __init__(self, code, ctx, params, name, space, is_declaration, definitions, prototype=None):
+    def __init__(self, code, ctx, params, name, space, is_declaration, definitions, prototype=None, needs_arguments=True):
         self.prototype = prototype
-        self.own = {}
 
         self.code = code
         if type(self.code) == int: # just a label pointing to the beginning of the code.
@@ -675,28 +850,31 @@ class PyJsFunction(PyJs):
 
         self.params = params
         self.arguments_in_params = 'arguments' in params
-        self.definitions = definitions
-
-        # todo remove this check later
-        for p in params:
-            assert p in self.definitions
+        # the arguments object is created only if the code can access it
+        self.creates_arguments = needs_arguments and not self.arguments_in_params
+        self.definitions = definitions  # LOAD_FUNCTION includes params
 
         self.name = name
         self.space = space
         self.is_declaration = is_declaration
 
-        #set own property length to the number of arguments
-        self.own['length'] = {'value': float(len(params)), 'writable': False, 'enumerable': False, 'configurable': False}
+        # length, name and prototype are created by LazyFunctionProperties
+        # todo set up throwers on callee and arguments if in strict mode
 
-        if name:
-            self.own['name'] = {'value': name, 'writable': False, 'enumerable': False, 'configurable': True}
+    def get_own_property(self, prop):
+        if 'own' not in self.__dict__ and prop not in LAZY_FUNCTION_PROPERTIES:
+            return None  # only the lazy properties can exist, no need to create them
+        return self.own.get(prop)
 
-        if not self.is_native:  # set prototype for user defined functions
-            # constructor points to this function
-            proto = space.NewObject()
-            proto.own['constructor'] = {'value': self, 'writable': True, 'enumerable': False, 'configurable': True}
-            self.own['prototype'] = {'value': proto, 'writable': True, 'enumerable': False, 'configurable': False}
-        # todo set up throwers on callee and arguments if in strict mode
+    def own_keys(self):
+        if 'own' not in self.__dict__:  # names of the properties LazyFunctionProperties would create
+            keys = [u'length']
+            if self.name:
+                keys.append(u'name')
+            if not self.is_native:
+                keys.append(u'prototype')
+            return keys
+        return list(self.own)
 
 
     def call(self, this, args=()):
@@ -736,7 +914,7 @@ class PyJsFunction(PyJs):
         my_ctx = Scope(dict(izip(self.params, args)), self.space, parent=self.ctx)
         my_ctx.registers(self.definitions)
         my_ctx.THIS_BINDING = this
-        if not self.arguments_in_params:
+        if self.creates_arguments:
             my_ctx.own['arguments'] = get_new_arguments_obj(args, self.space)
         if not self.is_declaration and self.name and self.name not in my_ctx.own:
             my_ctx.own[self.name] = self  # this should be immutable binding but come on!
@@ -302,7 +302,7 @@ class ByteCodeGenerator:
         name = id.get('name')
         assert name is not None
         self.declared_vars.append(name)
-        self.function_declaration_tape.append(LOAD_FUNCTION(function_start, tuple(p['name'] for p in params), name, True, tuple(declared_vars)))
+        self.function_declaration_tape.append(LOAD_FUNCTION(function_start, tuple(p['name'] for p in params), name, True, tuple(declared_vars), uses_arguments(body)))
         self.function_declaration_tape.append(STORE(name))
         self.function_declaration_tape.append(POP())
 
@@ -340,7 +340,7 @@ class ByteCodeGenerator:
 
         # create function object and append to stack
         name = id.get('name') if id else None
-        self.emit('LOAD_FUNCTION', function_start, tuple(p['name'] for p in params), name, False, tuple(declared_vars))
+        self.emit('LOAD_FUNCTION', function_start, tuple(p['name'] for p in params), name, False, tuple(declared_vars), uses_arguments(body))
 
 
                                                         
@@ -6,6 +6,7 @@ class Code:
     '''Can generate, store and run sequence of ops representing js code'''
     def __init__(self, is_strict=False):
         self.tape = []
+        self.evals = []  # bound eval methods of the ops on the tape, filled by compile
         self.compiled = False
         self.label_locs = None
         self.is_strict = is_strict
@@ -20,6 +21,12 @@ class Code:
         self.GLOBAL_THIS = None
         self.space = None
 
+        # compiles hot functions, see jit.py
+        self.jit = None
+
+        # ExecutionLimits checked at every instruction, see js2py.utils.limits
+        self.limits = None
+
     def get_new_label(self):
         self._label_count += 1
         return self._label_count
@@ -29,15 +36,30 @@ class Code:
         self.tape.append(OP_CODES[op_code](*args))
 
     def compile(self, start_loc=0):
-        ''' Records locations of labels and compiles the code '''
+        ''' Records locations of labels and compiles the code:
+            removes the labels, fuses common pairs of ops (see FUSIONS in opcodes)
+            and translates labels used by the ops to tape locations.'''
         self.label_locs = {} if self.label_locs is None else self.label_locs
-        loc = start_loc
-        while loc < len(self.tape):
-            if type(self.tape[loc]) == LABEL:
-                self.label_locs[self.tape[loc].num] = loc
-                del self.tape[loc]
+        ops = self.tape[start_loc:]
+        del self.tape[start_loc:]
+        labelled_loc = None  # location pointed by the last label, jumps can land there
+        for op in ops:
+            loc = len(self.tape)
+            if type(op) == LABEL:
+                self.label_locs[op.num] = labelled_loc = loc
                 continue
-            loc += 1
+            if loc > start_loc and loc != labelled_loc:
+                fuse = FUSIONS.get((type(self.tape[-1]), type(op)))
+                if fuse is not None:
+                    self.tape[-1] = fuse(self.tape[-1], op)
+                    continue
+            self.tape.append(op)
+        for op in self.tape[start_loc:]:
+            if hasattr(op, 'resolve_labels'):
+                op.resolve_labels(self.label_locs)
+        # keep the same list object, it may be used by the running loop
+        del self.evals[start_loc:]
+        self.evals.extend(op.eval for op in self.tape[start_loc:])
         self.compiled = True
 
     def _call(self, func, this, args):
@@ -78,6 +100,8 @@ class Code:
         try:
             self.current_ctx = ctx
             return self._execute_fragment_under_context(ctx, start_label, end_label)
+        except JsLimitExceeded:
+            raise  # can't be caught by JS code
         except JsException as err:
             # undo the things that were put on the stack (if any)
             # don't worry, I know the recovery is possible through try statement and for this reason try statement
@@ -91,96 +115,102 @@ class Code:
         start, end = self.label_locs[start_label], self.label_locs[end_label]
         initial_len = len(ctx.stack)
         loc = start
-        entry_level = len(self.contexts)
-        # for e in self.tape[start:end]:
-        #     print e
-
-        while loc < len(self.tape):
-            #print loc, self.tape[loc]
-            if len(self.contexts) == entry_level and loc >= end:
+        # both lists stay the same objects during this call (_call restores them)
+        contexts = self.contexts
+        return_locs = self.return_locs
+        entry_level = len(contexts)
+        evals = self.evals
+        label_locs = self.label_locs
+        limits = self.limits
+
+        while loc < len(evals):
+            if limits is not None:
+                limits.step()
+            if loc >= end and len(contexts) == entry_level:
                 assert loc == end
                 assert len(ctx.stack) == (1 + initial_len), 'Stack change must be equal to +1!'
                 return ctx.stack.pop(), 0, None # means normal return
 
             # execute instruction
-            status = self.tape[loc].eval(ctx)
+            status = evals[loc](ctx)
 
             # check status for special actions
-            if status is not None:
-                if type(status) == int:  # jump to label
-                    loc = self.label_locs[status]
-                    if len(self.contexts) == entry_level:
-                        # check if jumped outside of the fragment and break if so
-                        if not start <= loc < end:
-                            assert len(ctx.stack) == (1+initial_len), 'Stack change must be equal to +1!'
-                            return ctx.stack.pop(), 2, status  # jump outside
-                    continue
-
-                elif len(status)==2:  # a call or a return!
-                    # call: (new_ctx, func_loc_label_num)
-                    if status[0] is not None:
-                        # append old state to the stack
-                        self.contexts.append(ctx)
-                        self.return_locs.append(loc+1)
-                        # set new state
-                        loc = self.label_locs[status[1]]
-                        ctx = status[0]
-                        self.current_ctx = ctx
-                        continue
-
-                    # return: (None, None)
-                    else:
-                        if len(self.contexts) == entry_level:
-                            assert len(ctx.stack) == 1 + initial_len
-                            return undefined, 1, ctx.stack.pop() # return signal
-                        return_value = ctx.stack.pop()
-                        ctx = self.contexts.pop()
-                        self.current_ctx = ctx
-                        ctx.stack.append(return_value)
-
-                        loc = self.return_locs.pop()
-                        continue
-            # next instruction
-            loc += 1
+            if status is None:
+                # next instruction
+                loc += 1
+            elif type(status) is int:  # jump to location
+                loc = status
+                if len(contexts) == entry_level:
+                    # check if jumped outside of the fragment and break if so
+                    if not start <= loc < end:
+                        assert len(ctx.stack) == (1+initial_len), 'Stack change must be equal to +1!'
+                        return ctx.stack.pop(), 2, status  # jump outside
+
+            # a call or a return!
+            elif status[0] is not None:
+                # call: (new_ctx, func_loc_label_num)
+                # append old state to the stack
+                contexts.append(ctx)
+                return_locs.append(loc+1)
+                # set new state
+                loc = label_locs[status[1]]
+                ctx = status[0]
+                self.current_ctx = ctx
+
+            # return: (None, None)
+            else:
+                if len(contexts) == entry_level:
+                    assert len(ctx.stack) == 1 + initial_len
+                    return undefined, 1, ctx.stack.pop() # return signal
+                return_value = ctx.stack.pop()
+                ctx = contexts.pop()
+                self.current_ctx = ctx
+                ctx.stack.append(return_value)
+
+                loc = return_locs.pop()
         assert False, 'Remember to add NOP at the end!'
 
     def run(self, ctx, starting_loc=0):
         loc = starting_loc
         self.current_ctx = ctx
-        while loc < len(self.tape):
+        # both lists stay the same objects during this call (_call restores them)
+        contexts = self.contexts
+        return_locs = self.return_locs
+        evals = self.evals
+        label_locs = self.label_locs
+        limits = self.limits
+        while loc < len(evals):
+            if limits is not None:
+                limits.step()
             # execute instruction
-            #print loc, self.tape[loc]
-            status = self.tape[loc].eval(ctx)
+            status = evals[loc](ctx)
 
             # check status for special actions
-            if status is not None:
-                if type(status) == int:  # jump to label
-                    loc = self.label_locs[status]
-                    continue
-
-                elif len(status)==2:  # a call or a return!
-                    # call: (new_ctx, func_loc_label_num)
-                    if status[0] is not None:
-                        # append old state to the stack
-                        self.contexts.append(ctx)
-                        self.return_locs.append(loc+1)
-                        # set new state
-                        loc = self.label_locs[status[1]]
-                        ctx = status[0]
-                        self.current_ctx = ctx
-                        continue
-
-                    # return: (None, None)
-                    else:
-                        return_value = ctx.stack.pop()
-                        ctx = self.contexts.pop()
-                        self.current_ctx = ctx
-                        ctx.stack.append(return_value)
-
-                        loc = self.return_locs.pop()
-                        continue
-            # next instruction
-            loc += 1
+            if status is None:
+                # next instruction
+                loc += 1
+            elif type(status) is int:  # jump to location
+                loc = status
+
+            # a call or a return!
+            elif status[0] is not None:
+                # call: (new_ctx, func_loc_label_num)
+                # append old state to the stack
+                contexts.append(ctx)
+                return_locs.append(loc+1)
+                # set new state
+                loc = label_locs[status[1]]
+                ctx = status[0]
+                self.current_ctx = ctx
+
+            # return: (None, None)
+            else:
+                return_value = ctx.stack.pop()
+                ctx = contexts.pop()
+                self.current_ctx = ctx
+                ctx.stack.append(return_value)
+
+                loc = return_locs.pop()
         assert len(ctx.stack) == 1, ctx.stack
         return ctx.stack.pop()
 
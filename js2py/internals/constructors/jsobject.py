@@ -36,7 +36,7 @@ class ObjectMethods:
         prop = get_arg(args, 1)
         if not is_object(obj):
             raise MakeError('TypeError', 'Object.getOwnPropertyDescriptor called on non-object')
-        desc = obj.own.get(to_string(prop))
+        desc = obj.get_own_property(to_string(prop))
         return convert_to_js_type(desc, args.space)
 
 
@@ -44,7 +44,7 @@ class ObjectMethods:
         obj = get_arg(args, 0)
         if not is_object(obj):
             raise MakeError('TypeError', 'Object.getOwnPropertyDescriptor called on non-object')
-        return args.space.ConstructArray(obj.own.keys())
+        return args.space.ConstructArray(obj.own_keys())
 
     def create(this, args):
         obj = get_arg(args, 0)
@@ -78,8 +78,8 @@ class ObjectMethods:
         if not is_object(obj):
             raise MakeError('TypeError', 'Object.defineProperties called on non-object')
         props = to_object(properties, args.space)
-        for k, v in props.own.items():
-            if not v.get('enumerable'):
+        for k in props.own_keys():
+            if not props.get_own_property(k).get('enumerable'):
                 continue
             desc = ToPropertyDescriptor(props.get(unicode(k)))
             if not obj.define_own_property(unicode(k), desc, False):
@@ -90,8 +90,8 @@ class ObjectMethods:
         obj = get_arg(args, 0)
         if not is_object(obj):
             raise MakeError('TypeError', 'Object.seal called on non-object')
-        for desc in obj.own.values():
-            desc['configurable'] = False
+        for name in obj.own_keys():
+            obj.define_own_property(name, {'configurable': False}, False)
         obj.extensible = False
         return obj
 
@@ -99,10 +99,11 @@ class ObjectMethods:
         obj = get_arg(args, 0)
         if not is_object(obj):
             raise MakeError('TypeError', 'Object.freeze called on non-object')
-        for desc in obj.own.values():
-            desc['configurable'] = False
-            if is_data_descriptor(desc):
+        for name in obj.own_keys():
+            desc = {'configurable': False}
+            if is_data_descriptor(obj.get_own_property(name)):
                 desc['writable'] = False
+            obj.define_own_property(name, desc, False)
         obj.extensible = False
         return obj
 
@@ -119,8 +120,8 @@ class ObjectMethods:
             raise MakeError('TypeError', 'Object.isSealed called on non-object')
         if obj.extensible:
             return False
-        for desc in obj.own.values():
-            if desc.get('configurable'):
+        for name in obj.own_keys():
+            if obj.get_own_property(name).get('configurable'):
                 return False
         return True
 
@@ -130,7 +131,8 @@ class ObjectMethods:
             raise MakeError('TypeError', 'Object.isFrozen called on non-object')
         if obj.extensible:
             return False
-        for desc in obj.own.values():
+        for name in obj.own_keys():
+            desc = obj.get_own_property(name)
             if desc.get('configurable'):
                 return False
             if is_data_descriptor(desc) and desc.get('writable'):
@@ -147,7 +149,7 @@ class ObjectMethods:
         obj = get_arg(args, 0)
         if not is_object(obj):
             raise MakeError('TypeError', 'Object.keys called on non-object')
-        return args.space.ConstructArray([unicode(e) for e,d in six.iteritems(obj.own) if d.get('enumerable')])
+        return args.space.ConstructArray([unicode(e) for e in obj.own_keys() if obj.get_own_property(e).get('enumerable')])
 
 
 
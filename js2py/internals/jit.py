@@ -0,0 +1,175 @@
+'''Optional backend of the bytecode interpreter that compiles hot functions to python code.
+
+After a function has been called threshold times, its ops are split into basic blocks and every block
+(a sequence of ops without jump targets inside and without calls) is translated to a python function that does
+the work of all its ops. The block function is installed in Code.evals in place of the first op of the block
+and returns the location of the next op to execute (or the status of its last op), so the interpreter
+loop still does the calls, returns and jumps between the blocks - JS recursion does not use the python stack.
+
+Functions containing TRY_CATCH_FINALLY, WITH or FOR_IN are never compiled, they are left to the interpreter.'''
+from opcodes import *
+
+__all__ = ['JIT']
+
+COMPLEX_OPS = (TRY_CATCH_FINALLY, WITH, FOR_IN)
+CALL_OPS = (CALL, CALL_METHOD, CALL_METHOD_DOT, CALL_NO_ARGS, CALL_METHOD_NO_ARGS, CALL_METHOD_DOT_NO_ARGS,
+            CALL_N, CALL_METHOD_DOT_N)
+# ops that end the block because they may change the location
+ENDING_OPS = (BASE_JUMP, RETURN, THROW)
+
+RETURN_STATUS = (None, None)
+
+
+# Python source templates of the most common ops, they must do exactly the same as the eval methods.
+# k is the name of the op's constant, l is the jump location and b the expression computing
+# the binary operation {f}(left, right).
+TEMPLATES = {
+    LOAD: ['stack.append(ctx.get({k}, throw=True))'],
+    LOAD_NUMBER: ['stack.append({k})'],
+    LOAD_STRING: ['stack.append({k})'],
+    LOAD_BOOLEAN: ['stack.append({k})'],
+    LOAD_UNDEFINED: ['stack.append(undefined)'],
+    LOAD_NULL: ['stack.append(null)'],
+    LOAD_THIS: ['stack.append(ctx.THIS_BINDING)'],
+    LOAD_MEMBER: ['prop = stack.pop()',
+                  'stack.append(get_member(stack.pop(), prop, ctx.space))'],
+    LOAD_MEMBER_DOT: ['stack.append(get_member_dot(stack.pop(), {k}, ctx.space))'],
+    LOAD_MEMBER_DOT_OF: ['stack.append(get_member_dot(ctx.get({k}, throw=True), {k2}, ctx.space))'],
+    POP: ['del stack[-1]'],
+    STORE: ['ctx.put({k}, stack[-1])'],
+    STORE_POP: ['ctx.put({k}, stack.pop())'],
+    BINARY_OP: ['right = stack.pop()',
+                'left = stack.pop()',
+                'stack.append({b})'],
+    BINARY_OP_CONST: ['right = {k}',
+                      'left = stack.pop()',
+                      'stack.append({b})'],
+    BINARY_OP_LOAD: ['right = ctx.get({k}, throw=True)',
+                     'left = stack.pop()',
+                     'stack.append({b})'],
+    JUMP: ['return {l}'],
+    JUMP_IF_TRUE: ['if to_boolean(stack.pop()):',
+                   '    return {l}'],
+    JUMP_IF_FALSE: ['if not to_boolean(stack.pop()):',
+                    '    return {l}'],
+    BINARY_OP_JUMP_IF_FALSE: ['right = stack.pop()',
+                              'left = stack.pop()',
+                              'if not to_boolean({b}):',
+                              '    return {l}'],
+    RETURN: ['return RETURN_STATUS'],
+}
+
+# attributes of the ops used by the templates
+CONSTANTS = {
+    LOAD: 'identifier', LOAD_NUMBER: 'val', LOAD_STRING: 'val', LOAD_BOOLEAN: 'val',
+    LOAD_MEMBER_DOT: 'prop', LOAD_MEMBER_DOT_OF: 'identifier', STORE: 'identifier', STORE_POP: 'identifier',
+    BINARY_OP_CONST: 'val', BINARY_OP_LOAD: 'identifier',
+}
+
+# operators that give the same result as python operators when both operands are numbers (floats).
+# / and % are not here because python raises ZeroDivisionError.
+FLOAT_OPERATORS = {
+    '+': '+', '-': '-', '*': '*', '<': '<', '<=': '<=', '>': '>', '>=': '>=',
+    '==': '==', '!=': '!=', '===': '==', '!==': '!=',
+}
+
+
+class JIT(object):
+    '''Counts calls of bytecode functions and compiles them when they become hot.'''
+    def __init__(self, exe, threshold=2):
+        self.exe = exe
+        self.threshold = threshold
+        self.calls = {}  # function label -> number of calls, None once handled
+        self.compiled_blocks = 0
+
+    def called(self, label):
+        count = self.calls.get(label, 0)
+        if count is None:
+            return
+        count += 1
+        if count >= self.threshold:
+            self.calls[label] = None
+            self.compile_function(self.exe.label_locs[label])
+        else:
+            self.calls[label] = count
+
+    def compile_function(self, start):
+        tape = self.exe.tape
+        reachable = set()
+        leaders = set([start])
+        todo = [start]
+        while todo:
+            loc = todo.pop()
+            if loc in reachable:
+                continue
+            reachable.add(loc)
+            op = tape[loc]
+            if isinstance(op, COMPLEX_OPS):
+                return False
+            if isinstance(op, BASE_JUMP):
+                leaders.add(op.loc)
+                todo.append(op.loc)
+                if type(op) is not JUMP:
+                    leaders.add(loc + 1)
+                    todo.append(loc + 1)
+            elif isinstance(op, (RETURN, THROW)):
+                pass
+            else:
+                if isinstance(op, CALL_OPS):
+                    leaders.add(loc + 1)  # calls are done by the interpreter and return here
+                todo.append(loc + 1)
+        for leader in sorted(leaders):
+            block = []
+            loc = leader
+            while loc in reachable:
+                op = tape[loc]
+                if isinstance(op, CALL_OPS):
+                    break
+                block.append(op)
+                loc += 1
+                if isinstance(op, ENDING_OPS) or loc in leaders:
+                    break
+            if len(block) > 1:
+                self.exe.evals[leader] = self.compile_block(block, loc)
+                self.compiled_blocks += 1
+        return True
+
+    def compile_block(self, ops, next_loc):
+        namespace = {
+            'undefined': undefined,
+            'null': null,
+            'to_boolean': to_boolean,
+            'get_member': get_member,
+            'get_member_dot': get_member_dot,
+            'RETURN_STATUS': RETURN_STATUS,
+        }
+        lines = ['def block(ctx):', '    stack = ctx.stack']
+        for n, op in enumerate(ops):
+            typ = type(op)
+            template = TEMPLATES.get(typ)
+            if template is None:
+                # not a common op, just call its eval
+                namespace['e%d' % n] = op.eval
+                if isinstance(op, ENDING_OPS):
+                    lines += ['    status = e%d(ctx)' % n,
+                              '    if status is not None:',
+                              '        return status']
+                else:
+                    lines.append('    e%d(ctx)' % n)
+                continue
+            names = {'k': 'k%d' % n, 'k2': 'k%d_2' % n, 'f': 'f%d' % n, 'l': getattr(op, 'loc', None)}
+            names['b'] = '%s(left, right)' % names['f']
+            if getattr(op, 'operator', None) in FLOAT_OPERATORS:
+                names['b'] = '(left %s right if type(left) is float and type(right) is float else %s)' % (
+                    FLOAT_OPERATORS[op.operator], names['b'])
+            if typ in CONSTANTS:
+                namespace[names['k']] = getattr(op, CONSTANTS[typ])
+            if typ is LOAD_MEMBER_DOT_OF:
+                namespace[names['k2']] = op.prop
+            if hasattr(op, 'func'):
+                namespace[names['f']] = op.func
+            lines += ['    ' + line.format(**names) for line in template]
+        if not isinstance(ops[-1], (JUMP, RETURN, THROW)):
+            lines.append('    return %d' % next_loc)
+        exec('\n'.join(lines), namespace)
+        return namespace['block']
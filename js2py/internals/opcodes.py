@@ -16,10 +16,11 @@ class UNARY_OP(OP_CODE):
     _params = ['operator']
     def __init__(self, operator):
         self.operator = operator
+        self.func = UNARY_OPERATIONS[operator]
 
     def eval(self, ctx):
         val = ctx.stack.pop()
-        ctx.stack.append(UNARY_OPERATIONS[self.operator](val))
+        ctx.stack.append(self.func(val))
 
 
 # special unary operations
@@ -107,11 +108,12 @@ class BINARY_OP(OP_CODE):
     _params = ['operator']
     def __init__(self, operator):
         self.operator = operator
+        self.func = BINARY_OPERATIONS[operator]
 
     def eval(self, ctx):
         right = ctx.stack.pop()
         left = ctx.stack.pop()
-        ctx.stack.append(BINARY_OPERATIONS[self.operator](left, right))
+        ctx.stack.append(self.func(left, right))
 
 # &&, || and conditional are implemented in bytecode
 
@@ -127,22 +129,27 @@ class LABEL(OP_CODE):
 
 
 # I implemented interpreter in the way that when an integer is returned by eval operation the execution will jump
-# to the location of the label (it is loc = label_locations[label])
+# to that location of the tape. Code.compile translates the labels to locations (loc = label_locations[label])
+# by calling resolve_labels of every op.
 
 class BASE_JUMP(OP_CODE):
     _params = ['label']
     def __init__(self, label):
         self.label = label
+        self.loc = None
+
+    def resolve_labels(self, label_locs):
+        self.loc = label_locs[self.label]
 
 class JUMP(BASE_JUMP):
     def eval(self, ctx):
-        return self.label
+        return self.loc
 
 class JUMP_IF_TRUE(BASE_JUMP):
     def eval(self, ctx):
         val = ctx.stack.pop()
         if to_boolean(val):
-            return self.label
+            return self.loc
 
 
 class JUMP_IF_EQ(BASE_JUMP):
@@ -151,25 +158,25 @@ class JUMP_IF_EQ(BASE_JUMP):
         cmp = ctx.stack.pop()
         if strict_equality_op(ctx.stack[-1], cmp):
             ctx.stack.pop()
-            return self.label
+            return self.loc
 
 class JUMP_IF_TRUE_WITHOUT_POP(BASE_JUMP):
     def eval(self, ctx):
         val = ctx.stack[-1]
         if to_boolean(val):
-            return self.label
+            return self.loc
 
 class JUMP_IF_FALSE(BASE_JUMP):
     def eval(self, ctx):
         val = ctx.stack.pop()
         if not to_boolean(val):
-            return self.label
+            return self.loc
 
 class JUMP_IF_FALSE_WITHOUT_POP(BASE_JUMP):
     def eval(self, ctx):
         val = ctx.stack[-1]
         if not to_boolean(val):
-            return self.label
+            return self.loc
 
 class POP(OP_CODE):
     def eval(self, ctx):
@@ -256,17 +263,19 @@ class LOAD_REGEXP(OP_CODE):
 
 
 class LOAD_FUNCTION(OP_CODE):
-    _params = ['start', 'params', 'name', 'is_declaration', 'definitions']
-    def __init__(self, start, params, name, is_declaration, definitions):
+    _params = ['start', 'params', 'name', 'is_declaration', 'definitions', 'needs_arguments']
+    def __init__(self, start, params, name, is_declaration, definitions, needs_arguments=True):
         assert type(start) == int
         self.start = start  # its an ID of label pointing to the beginning of the function bytecode
         self.params = params
         self.name = name
         self.is_declaration = bool(is_declaration)
         self.definitions = tuple(set(definitions+params))
+        self.needs_arguments = needs_arguments  # arguments object is created only if the function uses it
 
     def eval(self, ctx):
-        ctx.stack.append(ctx.space.NewFunction(self.start, ctx, self.params, self.name, self.is_declaration, self.definitions))
+        ctx.stack.append(ctx.space.NewFunction(self.start, ctx, self.params, self.name, self.is_declaration,
+                                               self.definitions, self.needs_arguments))
 
 
 class LOAD_OBJECT(OP_CODE):
@@ -391,10 +400,11 @@ class STORE_OP(OP_CODE):
     def __init__(self, identifier, op):
         self.identifier = identifier
         self.op = op
+        self.func = BINARY_OPERATIONS[op]
 
     def eval(self, ctx):
         value = ctx.stack.pop()
-        new_value = BINARY_OPERATIONS[self.op](ctx.get(self.identifier), value)
+        new_value = self.func(ctx.get(self.identifier), value)
         ctx.put(self.identifier, new_value)
         ctx.stack.append(new_value)
 
@@ -403,6 +413,7 @@ class STORE_MEMBER_OP(OP_CODE):
     _params = ['op']
     def __init__(self, op):
         self.op = op
+        self.func = BINARY_OPERATIONS[op]
 
     def eval(self, ctx):
         value = ctx.stack.pop()
@@ -415,10 +426,10 @@ class STORE_MEMBER_OP(OP_CODE):
                 raise MakeError('TypeError', "Cannot set property '%s' of null" % to_string(name))
             elif typ is UNDEFINED_TYPE:
                 raise MakeError('TypeError', "Cannot set property '%s' of undefined" % to_string(name))
-            ctx.stack.append(BINARY_OPERATIONS[self.op](get_member(left, name, ctx.space), value))
+            ctx.stack.append(self.func(get_member(left, name, ctx.space), value))
             return
         else:
-            ctx.stack.append(BINARY_OPERATIONS[self.op](get_member(left, name, ctx.space), value))
+            ctx.stack.append(self.func(get_member(left, name, ctx.space), value))
             left.put_member(name, ctx.stack[-1])
 
 
@@ -427,6 +438,7 @@ class STORE_MEMBER_DOT_OP(OP_CODE):
     def __init__(self, prop, op):
         self.prop = prop
         self.op = op
+        self.func = BINARY_OPERATIONS[op]
 
     def eval(self, ctx):
         value = ctx.stack.pop()
@@ -438,10 +450,10 @@ class STORE_MEMBER_DOT_OP(OP_CODE):
                 raise MakeError('TypeError', "Cannot set property '%s' of null" % self.prop)
             elif typ == UNDEFINED_TYPE:
                 raise MakeError('TypeError', "Cannot set property '%s' of undefined" % self.prop)
-            ctx.stack.append(BINARY_OPERATIONS[self.op](get_member_dot(left, self.prop, ctx.space), value))
+            ctx.stack.append(self.func(get_member_dot(left, self.prop, ctx.space), value))
             return
         else:
-            ctx.stack.append(BINARY_OPERATIONS[self.op](get_member_dot(left, self.prop, ctx.space), value))
+            ctx.stack.append(self.func(get_member_dot(left, self.prop, ctx.space), value))
             left.put(self.prop, ctx.stack[-1])
 
 
@@ -455,6 +467,9 @@ def bytecode_call(ctx, func, this, args):
         return None
 
     # therefore not native. we have to return (new_context, function_label) to instruct interpreter to call
+    jit = ctx.space.exe.jit
+    if jit is not None:
+        jit.called(func.code)
     return func._generate_my_context(this, args), func.code
 
 
@@ -674,18 +689,24 @@ class FOR_IN(OP_CODE):
         self.body_start_label = body_start_label
         self.continue_label = continue_label
         self.break_label = break_label
+        self.continue_loc = self.break_loc = None
+
+    def resolve_labels(self, label_locs):
+        self.continue_loc = label_locs[self.continue_label]
+        self.break_loc = label_locs[self.break_label]
 
     def eval(self, ctx):
         iterable = ctx.stack.pop()
         if is_null(iterable) or is_undefined(iterable):
             ctx.stack.pop()
             ctx.stack.append(undefined)
-            return self.break_label
+            return self.break_loc
 
         obj = to_object(iterable, ctx.space)
 
-        for e in sorted(obj.own):
-            if not obj.own[e]['enumerable']:
+        for e in sorted(obj.own_keys()):
+            desc = obj.get_own_property(e)
+            if desc is None or not desc['enumerable']:  # could have been deleted by the loop body
                 continue
 
             ctx.put(self.name, e) # JS would have been so much nicer if this was ctx.space.put(self.name, obj.get(e))
@@ -707,7 +728,7 @@ class FOR_IN(OP_CODE):
             elif typ == 2:  # jump outside
                 # now have to figure out whether this is a continue or something else...
                 ctx.stack.append(val)
-                if spec == self.continue_label:
+                if spec == self.continue_loc:
                     # just a continue, perform next iteration as normal
                     continue
                 return spec # break or smth, go there and finish the iteration
@@ -717,7 +738,122 @@ class FOR_IN(OP_CODE):
             else:
                 raise RuntimeError('Invalid return code')
 
-        return self.break_label
+        return self.break_loc
+
+
+# ------------ FUSED ----------
+# Code.compile replaces common pairs of adjacent ops with one op doing the work of both,
+# this saves one dispatch and one push/pop of the stack. Only pairs whose first op never
+# returns status are fused so the execution never continues in the middle of a fused op.
+
+class LOAD_MEMBER_DOT_OF(OP_CODE):  # LOAD + LOAD_MEMBER_DOT
+    _params = ['identifier', 'prop']
+    def __init__(self, identifier, prop):
+        self.identifier = identifier
+        self.prop = prop
+
+    def eval(self, ctx):
+        obj = ctx.get(self.identifier, throw=True)
+        ctx.stack.append(get_member_dot(obj, self.prop, ctx.space))
+
+
+class LOAD_MEMBER_DOT_DOT(OP_CODE):  # LOAD_MEMBER_DOT + LOAD_MEMBER_DOT
+    _params = ['prop', 'prop2']
+    def __init__(self, prop, prop2):
+        self.prop = prop
+        self.prop2 = prop2
+
+    def eval(self, ctx):
+        obj = get_member_dot(ctx.stack.pop(), self.prop, ctx.space)
+        ctx.stack.append(get_member_dot(obj, self.prop2, ctx.space))
+
+
+class BINARY_OP_CONST(OP_CODE):  # LOAD_NUMBER/LOAD_STRING + BINARY_OP
+    _params = ['operator', 'val']
+    def __init__(self, operator, val):
+        self.operator = operator
+        self.func = BINARY_OPERATIONS[operator]
+        self.val = val
+
+    def eval(self, ctx):
+        ctx.stack.append(self.func(ctx.stack.pop(), self.val))
+
+
+class BINARY_OP_LOAD(OP_CODE):  # LOAD + BINARY_OP
+    _params = ['operator', 'identifier']
+    def __init__(self, operator, identifier):
+        self.operator = operator
+        self.func = BINARY_OPERATIONS[operator]
+        self.identifier = identifier
+
+    def eval(self, ctx):
+        right = ctx.get(self.identifier, throw=True)
+        ctx.stack.append(self.func(ctx.stack.pop(), right))
+
+
+class BINARY_OP_JUMP_IF_FALSE(BASE_JUMP):  # BINARY_OP + JUMP_IF_FALSE, typical loop condition
+    _params = ['operator', 'label']
+    def __init__(self, operator, label):
+        BASE_JUMP.__init__(self, label)
+        self.operator = operator
+        self.func = BINARY_OPERATIONS[operator]
+
+    def eval(self, ctx):
+        right = ctx.stack.pop()
+        if not to_boolean(self.func(ctx.stack.pop(), right)):
+            return self.loc
+
+
+class STORE_POP(OP_CODE):  # STORE + POP, assignment statement
+    _params = ['identifier']
+    def __init__(self, identifier):
+        self.identifier = identifier
+
+    def eval(self, ctx):
+        ctx.put(self.identifier, ctx.stack.pop())
+
+
+class CALL_N(OP_CODE):  # LOAD_N_TUPLE + CALL
+    _params = ['n']
+    def __init__(self, n):
+        self.n = n
+
+    def eval(self, ctx):
+        args = tuple(ctx.stack[-self.n:])
+        del ctx.stack[-self.n:]
+        func = ctx.stack.pop()
+
+        return bytecode_call(ctx, func, ctx.space.GlobalObj, args)
+
+
+class CALL_METHOD_DOT_N(OP_CODE):  # LOAD_N_TUPLE + CALL_METHOD_DOT
+    _params = ['n', 'prop']
+    def __init__(self, n, prop):
+        self.n = n
+        self.prop = prop
+
+    def eval(self, ctx):
+        args = tuple(ctx.stack[-self.n:])
+        del ctx.stack[-self.n:]
+        base = ctx.stack.pop()
+
+        func = get_member_dot(base, self.prop, ctx.space)
+
+        return bytecode_call(ctx, func, base, args)
+
+
+# (first op type, second op type) -> function returning the fused op
+FUSIONS = {
+    (LOAD, LOAD_MEMBER_DOT): lambda a, b: LOAD_MEMBER_DOT_OF(a.identifier, b.prop),
+    (LOAD_MEMBER_DOT, LOAD_MEMBER_DOT): lambda a, b: LOAD_MEMBER_DOT_DOT(a.prop, b.prop),
+    (LOAD_NUMBER, BINARY_OP): lambda a, b: BINARY_OP_CONST(b.operator, a.val),
+    (LOAD_STRING, BINARY_OP): lambda a, b: BINARY_OP_CONST(b.operator, a.val),
+    (LOAD, BINARY_OP): lambda a, b: BINARY_OP_LOAD(b.operator, a.identifier),
+    (BINARY_OP, JUMP_IF_FALSE): lambda a, b: BINARY_OP_JUMP_IF_FALSE(a.operator, b.label),
+    (STORE, POP): lambda a, b: STORE_POP(a.identifier),
+    (LOAD_N_TUPLE, CALL): lambda a, b: CALL_N(a.n),
+    (LOAD_N_TUPLE, CALL_METHOD_DOT): lambda a, b: CALL_METHOD_DOT_N(a.n, b.prop),
+}
 
 
 # all opcodes...
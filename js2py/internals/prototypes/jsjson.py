@@ -2,9 +2,11 @@ from __future__ import unicode_literals
 from ..conversions import *
 from ..func_utils import *
 from ..operations import strict_equality_op
+from ...utils.shapes import ROOT_SHAPE
+from ...utils.gc_pause import without_gc
 import json
+from json.encoder import encode_basestring_ascii
 
-indent = ''
 # python 3 support
 import six
 if six.PY3:
@@ -13,15 +15,17 @@ if six.PY3:
     xrange = range
     unicode = str
 
+# stringify joins the written pieces of JSON text into a chunk after this many pieces
+PIECES_PER_CHUNK = 4096
+
 
 def parse(this, args):
     text, reviver = get_arg(args, 0), get_arg(args, 1)
     s = to_string(text)
     try:
-        unfiltered = json.loads(s)
-    except:
+        unfiltered = without_gc(decode, s, args.space)
+    except ValueError:
         raise MakeError('SyntaxError', 'JSON.parse could not parse JSON string - Invalid syntax')
-    unfiltered = to_js(unfiltered, args.space)
     if is_callable(reviver):
         root = args.space.ConstructObject({'': unfiltered})
         return walk(root, '', reviver)
@@ -30,151 +34,240 @@ def parse(this, args):
 
 
 def stringify(this, args):
-    global indent
     value, replacer, space = get_arg(args, 0), get_arg(args, 1), get_arg(args, 2)
-    stack = set([])
-    indent = ''
-    property_list = replacer_function = undefined
-    if is_object(replacer):
-        if is_callable(replacer):
-            replacer_function = replacer
-        elif replacer.Class=='Array':
-            property_list = []
-            for e in replacer:
-                v = replacer[e]
-                item = undefined
-                typ = Type(v)
-                if typ=='Number':
-                    item = to_string(v)
-                elif typ=='String':
-                    item = v
-                elif typ=='Object':
-                    if GetClass(v) in ('String', 'Number'):
+    writer = JsonWriter()
+    holder = args.space.ConstructObject({'': value})
+    if not Stringifier(replacer, space, writer).dump(value, holder):
+        return undefined
+    return writer.getvalue()
+
+
+class JsonWriter(object):
+    '''Stringifier appends the pieces of JSON text to self.pieces and calls flush every PIECES_PER_CHUNK pieces.
+    The pieces are joined into a chunk that is passed to fp.write or, if there is no fp, kept for getvalue.'''
+    def __init__(self, fp=None):
+        self.fp = fp
+        self.pieces = []
+        self.chunks = []
+
+    def flush(self):
+        if self.pieces:
+            chunk = ''.join(self.pieces)
+            del self.pieces[:]
+            if self.fp is None:
+                self.chunks.append(chunk)
+            else:
+                self.fp.write(chunk)
+
+    def getvalue(self):
+        self.flush()
+        return ''.join(self.chunks)
+
+
+class Stringifier(object):
+    '''State of one JSON.stringify call'''
+    def __init__(self, replacer, space, writer):
+        self.writer = writer
+        self.pieces = writer.pieces
+        self.write = writer.pieces.append
+        self.stack = set()
+        self.indent = ''
+        self.replacer_function = self.property_list = None
+        if is_object(replacer):
+            if is_callable(replacer):
+                self.replacer_function = replacer
+            elif replacer.Class=='Array':
+                property_list = []
+                for i in xrange(js_arr_length(replacer)):
+                    v = replacer.get(unicode(i))
+                    item = undefined
+                    typ = Type(v)
+                    if typ=='Number':
                         item = to_string(v)
-                if not is_undefined(item) and item not in property_list:
-                    property_list.append(item)
-    if is_object(space):
-        if GetClass(space)=='Number':
-            space = to_number(space)
-        elif GetClass(space)=='String':
-            space = to_string(space)
-    if Type(space)=='Number':
-        space =min(10, to_int(space))
-        gap = max(int(space), 0)* ' '
-    elif Type(space)=='String':
-        gap = space[:10]
-    else:
-        gap = ''
-    return Str('', args.space.ConstructObject({'':value}), replacer_function, property_list, gap, stack, space)
-
-
-
-def Str(key, holder, replacer_function, property_list, gap, stack, space):
-    value = holder.get(key)
-    if is_object(value):
-        to_json = value.get('toJSON')
-        if is_callable(to_json):
-            value = to_json.call(value, (key,))
-    if not is_undefined(replacer_function):
-        value = replacer_function.call(holder, (key, value))
-
-    if is_object(value):
-        if value.Class=='String':
-            value = to_string(value)
-        elif value.Class=='Number':
-            value = to_number(value)
-        elif value.Class=='Boolean':
-            value = to_boolean(value)
-    typ = Type(value)
-    if is_null(value):
-        return 'null'
-    elif typ=='Boolean':
-        return 'true' if value else 'false'
-    elif typ=='String':
-        return Quote(value)
-    elif typ=='Number':
-        if not is_infinity(value):
-            return to_string(value)
-        return 'null'
-    if is_object(value) and not is_callable(value):
-        if value.Class=='Array':
-            return ja(value, stack, gap, property_list, replacer_function, space)
+                    elif typ=='String':
+                        item = v
+                    elif typ=='Object':
+                        if GetClass(v) in ('String', 'Number'):
+                            item = to_string(v)
+                    if not is_undefined(item) and item not in property_list:
+                        property_list.append(item)
+                self.property_list = property_list
+        if is_object(space):
+            if GetClass(space)=='Number':
+                space = to_number(space)
+            elif GetClass(space)=='String':
+                space = to_string(space)
+        if Type(space)=='Number':
+            self.gap = max(min(10, to_int(space)), 0) * ' '
+        elif Type(space)=='String':
+            self.gap = space[:10]
         else:
-            return jo(value, stack, gap, property_list, replacer_function, space)
-    return undefined
+            self.gap = ''
 
+    def dump(self, value, holder):
+        '''Writes value, returns False if it is not serializable (undefined, function...)'''
+        value = self.prepare('', value, holder)
+        if value is None:
+            return False
+        self.serialize(value)
+        return True
 
+    def prepare(self, key, value, holder):
+        '''Returns the value that should be serialized under key or None if the key should be skipped'''
+        if is_object(value):
+            to_json = value.get('toJSON')
+            if is_callable(to_json):
+                value = to_json.call(value, (key,))
+        if self.replacer_function is not None:
+            value = self.replacer_function.call(holder, (key, value))
+        if is_object(value):
+            if value.Class=='String':
+                value = to_string(value)
+            elif value.Class=='Number':
+                value = to_number(value)
+            elif value.Class=='Boolean':
+                value = to_boolean(value)
+            elif is_callable(value):
+                return None
+        elif value is undefined:
+            return None
+        return value
 
-def jo(value, stack, gap, property_list, replacer_function, space):
-    global indent
-    if value in stack:
-        raise MakeError('TypeError', 'Converting circular structure to JSON')
-    stack.add(value)
-    stepback = indent
-    indent += gap
-    if not is_undefined(property_list):
-        k = property_list
-    else:
-        k = [unicode(e) for e,d in value.own.items() if d.get('enumerable')]
-    partial = []
-    for p in k:
-        str_p = Str(p, value, replacer_function, property_list, gap, stack, space)
-        if not is_undefined(str_p):
-            member = json.dumps(p) + ':' + (' ' if gap else '')  + str_p # todo not sure here - what space character?
-            partial.append(member)
-    if not partial:
-        final = '{}'
-    else:
-        if not gap:
-            final = '{%s}' % ','.join(partial)
-        else:
-            sep = ',\n'+indent
-            properties = sep.join(partial)
-            final = '{\n'+indent+properties+'\n'+stepback+'}'
-    stack.remove(value)
-    indent = stepback
-    return final
-
-
-def ja(value, stack, gap, property_list, replacer_function, space):
-    global indent
-    if value in stack:
-        raise MakeError('TypeError', 'Converting circular structure to JSON')
-    stack.add(value)
-    stepback = indent
-    indent += gap
-    partial = []
-    length = js_arr_length(value)
-    for index in xrange(length):
-        index = unicode(index)
-        str_index = Str(index, value, replacer_function, property_list, gap, stack, space)
-        if is_undefined(str_index):
-            partial.append('null')
+    def serialize(self, value):
+        typ = type(value)
+        if typ is unicode:
+            self.write(encode_basestring_ascii(value))
+        elif typ is float:
+            if value != value or value in (float('inf'), -float('inf')):
+                self.write('null')
+            elif not value % 1 and abs(value) < 1e21:
+                self.write(unicode(int(value)))
+            else:
+                self.write(to_string(value))
+        elif typ is bool:
+            self.write('true' if value else 'false')
+        elif value is null:
+            self.write('null')
+        elif value.Class=='Array':
+            self.serialize_array(value)
         else:
-            partial.append(str_index)
-    if not partial:
-        final = '[]'
-    else:
-        if not gap:
-            final = '[%s]' % ','.join(partial)
+            self.serialize_object(value)
+
+    def serialize_object(self, value):
+        if value in self.stack:
+            raise MakeError('TypeError', 'Converting circular structure to JSON')
+        self.stack.add(value)
+        stepback = self.indent
+        self.indent = indent = stepback + self.gap
+        if self.property_list is not None:
+            keys = self.property_list
+        elif hasattr(value, 'shape'):
+            # properties in slots are always enumerable
+            keys = list(value.shape.keys)
+            keys.extend(k for k, desc in six.iteritems(value.own) if desc.get('enumerable'))
         else:
-            sep = ',\n'+indent
-            properties = sep.join(partial)
-            final = '[\n'+indent +properties+'\n'+stepback+']'
-    stack.remove(value)
-    indent = stepback
-    return final
+            keys = [unicode(e) for e in value.own_keys() if value.get_own_property(e).get('enumerable')]
+        write, pieces = self.write, self.pieces
+        sep = ',\n' + indent if self.gap else ','
+        colon = ': ' if self.gap else ':'
+        first = True
+        write('{')
+        for k in keys:
+            v = self.prepare(k, value.get(k), value)
+            if v is None:
+                continue
+            if first:
+                first = False
+                write(('\n' + indent if self.gap else '') + encode_basestring_ascii(k) + colon)
+            else:
+                write(sep + encode_basestring_ascii(k) + colon)
+            self.serialize(v)
+            if len(pieces) >= PIECES_PER_CHUNK:
+                self.writer.flush()
+        if self.gap and not first:
+            write('\n' + stepback)
+        write('}')
+        self.stack.remove(value)
+        self.indent = stepback
+
+    def serialize_array(self, value):
+        if value in self.stack:
+            raise MakeError('TypeError', 'Converting circular structure to JSON')
+        self.stack.add(value)
+        stepback = self.indent
+        self.indent = indent = stepback + self.gap
+        # plain elements are read directly from the dense list
+        dense = getattr(value, 'dense', ())
+        length = js_arr_length(value)
+        write, pieces = self.write, self.pieces
+        sep = ',\n' + indent if self.gap else ','
+        write('[')
+        for index in xrange(length):
+            if index:
+                write(sep)
+            elif self.gap:
+                write('\n' + indent)
+            e = dense[index] if index < len(dense) else None
+            if e is None:
+                e = value.get(unicode(index))
+            e = self.prepare(unicode(index), e, value)
+            if e is None:
+                write('null')
+            else:
+                self.serialize(e)
+            if len(pieces) >= PIECES_PER_CHUNK:
+                self.writer.flush()
+        if self.gap and length:
+            write('\n' + stepback)
+        write(']')
+        self.stack.remove(value)
+        self.indent = stepback
 
 
+def decode(s, space):
+    '''Parses JSON text s building JS objects directly, without the intermediate python dicts.'''
+    def js_array(lst):
+        return space.ConstructArray([to_js(e) for e in lst])
 
+    def js_object(pairs):
+        # object_pairs_hook, stores the properties in slots directly
+        obj = space.NewObject()
+        shape, slots, own = ROOT_SHAPE, obj.slots, obj.own
+        for k, v in pairs:
+            conv = converters.get(type(v))
+            if conv is not None:
+                v = conv(v)
+            index = shape.lookup(k)
+            if index is not None:  # duplicate key, the last value wins
+                slots[index] = v
+            elif k in own:
+                own[k]['value'] = v
+            else:
+                new_shape = shape.add(k)
+                if new_shape is None:
+                    own[k] = {'value': v, 'writable': True, 'enumerable': True, 'configurable': True}
+                else:
+                    shape = new_shape
+                    slots.append(v)
+        obj.shape = shape
+        return obj
 
+    def to_js(d):
+        conv = converters.get(type(d))
+        return d if conv is None else conv(d)
 
-def Quote(string):
-    return json.dumps(string)
+    converters = {
+        str: unicode,
+        type(None): lambda n: null,
+        list: js_array,
+    }
+    # numbers are parsed as floats
+    decoder = json.JSONDecoder(object_pairs_hook=js_object, parse_int=float, parse_constant=reject_constant)
+    return to_js(decoder.decode(s))
 
 
-def to_js(d, _args_space):
-    return convert_to_js_type(d, _args_space)
+def reject_constant(name):
+    raise ValueError('%s is not valid JSON' % name)
 
 
 def walk(holder, name, reviver):
@@ -186,17 +279,12 @@ def walk(holder, name, reviver):
             if is_undefined(new_element):
                 val.delete(i)
             else:
-                new_element.put(i, new_element)
+                val.put(i, new_element)
     elif is_object(val):
-        for key in [unicode(e) for e,d in val.own.items() if d.get('enumerable')]:
+        for key in [unicode(e) for e in val.own_keys() if val.get_own_property(e).get('enumerable')]:
             new_element = walk(val, key, reviver)
             if is_undefined(new_element):
                 val.delete(key)
             else:
                 val.put(key, new_element)
     return reviver.call(holder, (name, val))
-
-
-
-
-
@@ -2,6 +2,7 @@ from __future__ import unicode_literals
 from ..conversions import *
 from ..func_utils import *
 
+import math
 import six
 if six.PY3:
     basestring = str
@@ -16,6 +17,33 @@ RADIX_SYMBOLS = {0: '0', 1: '1', 2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7',
                  32: 'w', 33: 'x', 34: 'y', 35: 'z'}
 
 
+def to_radix(num, r):
+    '''Returns finite num in radix r, including the fraction digits'''
+    sign = '-' if num < 0 else ''
+    num = abs(num)
+    whole = int(num)
+    frac = num - whole
+    res = ''
+    while whole:
+        res = RADIX_SYMBOLS[whole % r] + res
+        whole //= r
+    res = res or '0'
+    if frac:
+        digits = ''
+        # enough digits for the 52 bit mantissa
+        for _ in xrange(int(52 / math.log(r, 2)) + 1):
+            frac *= r
+            d = int(frac)
+            digits += RADIX_SYMBOLS[d]
+            frac -= d
+            if not frac:
+                break
+        digits = digits.rstrip('0')
+        if digits:
+            res += '.' + digits
+    return sign + res
+
+
 def to_str_rep(num):
     if is_nan(num):
         return 'NaN'
@@ -41,18 +69,9 @@ class NumberPrototype:
             return to_str_rep(this)
         if r not in xrange(2, 37) or radix!=r:
             raise MakeError('RangeError', 'Number.prototype.toString() radix argument must be an integer between 2 and 36')
-        num = to_int(this)
-        if num < 0:
-            num = -num
-            sign = '-'
-        else:
-            sign = ''
-        res = ''
-        while num:
-            s = RADIX_SYMBOLS[num % r]
-            num = num // r
-            res = s + res
-        return sign + (res if res else '0')
+        if is_nan(this) or is_infinity(this):
+            return to_str_rep(this)
+        return to_radix(this, r)
 
     def valueOf(this, args):
         if GetClass(this)!='Number':
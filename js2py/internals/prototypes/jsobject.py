@@ -44,7 +44,7 @@ class ObjectPrototype:
     def propertyIsEnumerable(this, args):
         prop = get_arg(args, 0)
         o = to_object(this, args.space)
-        cand = o.own.get(to_string(prop))
+        cand = o.get_own_property(to_string(prop))
         return cand is not None and cand.get('enumerable')
 
 
@@ -38,17 +38,16 @@ def RegExpExec(this, string, space):
     string = to_string(string)
     length = len(string)
     i = to_int(this.get('lastIndex')) if this.glob else 0
-    matched = False
-    while not matched:
-        if i < 0 or i > length:
-            this.put('lastIndex', 0.)
-            return null
-        matched = this.match(string, i)
-        i += 1
+    # search tries to match at i, i+1, ..., length
+    matched = this.pat.search(string, i) if 0 <= i <= length else None
+    if matched is None:
+        this.put('lastIndex', 0.)
+        return null
     start, end = matched.span()#[0]+i-1, matched.span()[1]+i-1
     if this.glob:
         this.put('lastIndex', float(end))
-    arr = convert_to_js_type([matched.group()]+list(matched.groups()), space=space)
+    # captures that did not participate in the match are undefined
+    arr = space.ConstructArray([matched.group()] + [undefined if e is None else e for e in matched.groups()])
     arr.put('index', float(start))
     arr.put('input', unicode(string))
     return arr
@@ -9,45 +9,121 @@ from jsregexp import RegExpExec
 DIGS = set(u'0123456789')
 WHITE = u"\u0009\u000A\u000B\u000C\u000D\u0020\u00A0\u1680\u180E\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200A\u2028\u2029\u202F\u205F\u3000\uFEFF"
 
-def replacement_template(rep, source, span, npar):
-    """Takes the replacement template and some info about the match and returns filled template
-       """
+# markers of $` and $' in compiled replacement templates (other references are capture numbers, 0 is $&)
+BEFORE, AFTER = -1, -2
+
+
+def compile_replacement(rep, npar):
+    """Splits the replacement template into a list of strings and references to the parts of the match
+       (see fill_replacement). npar is the number of capturing groups"""
+    parts = []
+    literal = ''
     n = 0
-    res = ''
     while n < len(rep)-1:
         char = rep[n]
         if char=='$':
+            ref = None
             if rep[n+1]=='$':
-                res += '$'
+                literal += '$'
                 n += 2
                 continue
+            elif rep[n+1]=='&':
+                ref = 0
             elif rep[n+1]=='`':
                 # replace with string that is BEFORE match
-                res += source[:span[0]]
-                n += 2
-                continue
+                ref = BEFORE
             elif rep[n+1]=='\'':
                 # replace with string that is AFTER match
-                res += source[span[1]:]
-                n += 2
-                continue
+                ref = AFTER
             elif rep[n+1] in DIGS:
                 dig = rep[n+1]
                 if n+2<len(rep) and rep[n+2] in DIGS:
                     dig += rep[n+2]
                 num = int(dig)
+                n += 1 + len(dig)
                 # we will not do any replacements if we dont have this npar or dig is 0
-                if not num or num>len(npar):
-                    res += '$'+dig
+                if not num or num>npar:
+                    literal += '$'+dig
                 else:
-                    # None - undefined has to be replaced with ''
-                    res += npar[num-1] if npar[num-1] else ''
-                n += 1 + len(dig)
+                    parts.append(literal)
+                    parts.append(num)
+                    literal = ''
+                continue
+            if ref is not None:
+                parts.append(literal)
+                parts.append(ref)
+                literal = ''
+                n += 2
                 continue
-        res += char
+        literal += char
         n += 1
     if n<len(rep):
-        res += rep[-1]
+        literal += rep[-1]
+    parts.append(literal)
+    return parts
+
+
+def fill_replacement(parts, source, span, groups):
+    """Returns the replacement for the match at span of source with captures groups"""
+    if len(parts)==1:
+        return parts[0]
+    res = []
+    for part in parts:
+        if not isinstance(part, int):
+            res.append(part)
+        elif part>0:
+            # None - undefined has to be replaced with ''
+            res.append(groups[part-1] or '')
+        elif part==0:
+            res.append(source[span[0]:span[1]])
+        elif part==BEFORE:
+            res.append(source[:span[0]])
+        else:
+            res.append(source[span[1]:])
+    return ''.join(res)
+
+
+def global_matches(pat, s):
+    """Yields the matches of a global RegExp in s. Just like the lastIndex loop of the spec
+       the search continues at the next position after an empty match."""
+    pos = 0
+    length = len(s)
+    while pos<=length:
+        match = pat.search(s, pos)
+        if match is None:
+            return
+        yield match
+        start, end = match.span()
+        pos = end if end>start else end+1
+
+
+def regexp_split(pat, s, lim):
+    """Splits s at the matches of pat just like String.prototype.split, returns at most lim
+       elements. Captures that did not participate in the match are None."""
+    length = len(s)
+    if not length:
+        return [] if pat.match(s) else [s]
+    res = []
+    p = q = 0
+    while q<length:
+        match = pat.search(s, q)
+        if match is None:
+            break
+        start, end = match.span()
+        if start==length:
+            break
+        if end==p:  # empty match at the end of the previous one
+            q = start+1
+            continue
+        res.append(s[p:start])
+        if len(res)==lim:
+            return res
+        for element in match.groups():
+            res.append(element)
+            if len(res)==lim:
+                return res
+        p = q = end
+    res.append(s[p:])
     return res
 
 
@@ -122,78 +198,58 @@ class StringPrototype:
         r = args.space.NewRegExp(regexp, '') if GetClass(regexp)!='RegExp' else regexp
         if not r.glob:
             return RegExpExec(r, s, space=args.space)
+        found = [match.group() for match in global_matches(r.pat, s)]
         r.put('lastIndex', float(0))
-        found = []
-        previous_last_index = 0
-        last_match = True
-        while last_match:
-            result = RegExpExec(r, s, space=args.space)
-            if is_null(result):
-                last_match=False
-            else:
-                this_index = r.get('lastIndex')
-                if this_index==previous_last_index:
-                    r.put('lastIndex', float(this_index+1))
-                    previous_last_index += 1
-                else:
-                    previous_last_index = this_index
-                matchStr = result.get('0')
-                found.append(matchStr)
         if not found:
             return null
         return args.space.ConstructArray(found)
 
 
     def replace(this, args):
-        # VERY COMPLICATED. to check again.
         cok(this)
         s = to_string(this)
         searchValue = get_arg(args, 0)
         replaceValue = get_arg(args, 1)
-        res = ''
         if not is_callable(replaceValue):
             replaceValue = to_string(replaceValue)
             func = False
         else:
             func = True
-        # Replace all  ( global )
-        if GetClass(searchValue) == 'RegExp' and searchValue.glob:
+        if GetClass(searchValue)=='RegExp':
+            pat = searchValue.pat
+            if searchValue.glob:
+                matches = global_matches(pat, s)
+            else:
+                match = pat.search(s)
+                matches = () if match is None else (match,)
+            parts = None if func else compile_replacement(replaceValue, pat.groups)
+            res = []
             last = 0
-            for e in re.finditer(searchValue.pat, s):
-                res += s[last:e.span()[0]]
+            for match in matches:
+                span = match.span()
+                res.append(s[last:span[0]])
                 if func:
-                    # prepare arguments for custom func (replaceValue)
-                    call_args = (e.group(),) +  e.groups() + (e.span()[1], s)
-                    # convert all types to JS before Js bytecode call...
-                    res += to_string(replaceValue.call(this, ensure_js_types(call_args, space=args.space)))
+                    # prepare arguments for custom func (replaceValue): match, captures, position and string
+                    call_args = ((match.group(),) + tuple(undefined if e is None else e for e in match.groups())
+                                 + (float(span[0]), s))
+                    res.append(to_string(replaceValue.call(this, call_args)))
                 else:
-                    res += replacement_template(replaceValue, s, e.span(), e.groups())
-                last = e.span()[1]
-            res += s[last:]
-            return res
-        elif GetClass(searchValue)=='RegExp':
-            e = re.search(searchValue.pat, s)
-            if e is None:
+                    res.append(fill_replacement(parts, s, span, match.groups()))
+                last = span[1]
+            if not res:
                 return s
-            span = e.span()
-            pars = e.groups()
-            match = e.group()
-        else:
-            match = to_string(searchValue)
-            ind =  s.find(match)
-            if ind==-1:
-                return s
-            span = ind, ind + len(match)
-            pars = ()
-        res = s[:span[0]]
+            res.append(s[last:])
+            return u''.join(res)
+        match = to_string(searchValue)
+        ind = s.find(match)
+        if ind==-1:
+            return s
+        span = ind, ind + len(match)
         if func:
-            call_args = (match,) +  pars + (span[1], s)
-            # convert all types to JS before Js bytecode call...
-            res += to_string(replaceValue.call(this, ensure_js_types(call_args, space=args.space)))
+            rep = to_string(replaceValue.call(this, (match, float(ind), s)))
         else:
-            res += replacement_template(replaceValue, s, span, pars)
-        res += s[span[1]:]
-        return res
+            rep = fill_replacement(compile_replacement(replaceValue, 0), s, span, ())
+        return s[:span[0]] + rep + s[span[1]:]
 
     def search(this, args):
         cok(this)
@@ -221,7 +277,6 @@ class StringPrototype:
 
 
     def split(this, args):
-        # its a bit different from re.split!
         cok(this)
         s = to_string(this)
         separator = get_arg(args, 0)
@@ -231,29 +286,14 @@ class StringPrototype:
             return args.space.ConstructArray([])
         if is_undefined(separator):
             return args.space.ConstructArray([s])
-        len_s = len(s)
-        res = []
-        R = separator if GetClass(separator)=='RegExp' else to_string(separator)
-        if not len_s:
-            if SplitMatch(s, 0, R) is None:
-                return args.space.ConstructArray([s])
-            return args.space.ConstructArray([])
-        p = q = 0
-        while q!=len_s:
-            e, cap = SplitMatch(s, q, R)
-            if e is None or e==p:
-                q += 1
-                continue
-            res.append(s[p:q])
-            p = q = e
-            if len(res)==lim:
-                return args.space.ConstructArray(res)
-            for element in cap:
-                res.append(element)
-                if len(res)==lim:
-                    return args.space.ConstructArray(res)
-        res.append(s[p:])
-        return args.space.ConstructArray(res)
+        if GetClass(separator)=='RegExp':
+            res = regexp_split(separator.pat, s, lim)
+            return args.space.ConstructArray([undefined if e is None else e for e in res])
+        separator = to_string(separator)
+        if not separator:
+            return args.space.ConstructArray(list(s[:lim]))
+        # str.split finds the same (not overlapping) occurrences as the spec
+        return args.space.ConstructArray(s.split(separator, lim)[:lim])
 
 
     def substring (this, args):
@@ -300,17 +340,3 @@ class StringPrototype:
     def trim(this, args):
         cok(this)
         return to_string(this).strip(WHITE)
-
-
-
-
-def SplitMatch(s, q, R):
-    # s is Py String to match, q is the py int match start and R is Js RegExp or String.
-    if GetClass(R)=='RegExp':
-        res = R.match(s, q)
-        return (None, ()) if res is None else (res.span()[1], res.groups())
-    # R is just a string
-    if s[q:].startswith(R):
-        return q+len(R), ()
-    return None, ()
-
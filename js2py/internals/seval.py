@@ -3,18 +3,36 @@ from space import Space
 import fill_space
 from byte_trans import ByteCodeGenerator
 from code import Code
+from jit import JIT
 from simplex import MakeError
+from ..utils.limits import ExecutionLimits
 import sys
 sys.setrecursionlimit(100000)
 
 
 pyjsparser.parser.ENABLE_JS2PY_ERRORS = lambda msg: MakeError(u'SyntaxError', unicode(msg))
 
-def eval_js_vm(js):
+def eval_js_vm(js, jit_threshold=None, timeout=None, max_steps=None, max_memory=None):
+    '''Runs js in the bytecode interpreter and returns the result.
+    If jit_threshold is set, functions called that many times are compiled to python (see jit.py).
+
+    timeout (seconds), max_steps (executed instructions) and max_memory (bytes the process can grow by)
+    limit the execution, JsLimitExceeded is raised when any of them is exceeded. See js2py.utils.limits.'''
+    if timeout is None and max_steps is None and max_memory is None:
+        return _eval_js_vm(js, jit_threshold, None)
+    limits = ExecutionLimits(timeout, max_steps, max_memory)
+    with limits:
+        return _eval_js_vm(js, jit_threshold, limits)
+
+
+def _eval_js_vm(js, jit_threshold, limits):
     a = ByteCodeGenerator(Code())
+    a.exe.limits = limits
     s = Space()
     a.exe.space = s
     s.exe = a.exe
+    if jit_threshold is not None:
+        a.exe.jit = JIT(a.exe, jit_threshold)
 
     d = pyjsparser.parse(js)
 
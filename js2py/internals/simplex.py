@@ -100,6 +100,10 @@ class JsException(Exception):
                 return self.typ+': '+self.message
 
 
+class JsLimitExceeded(JsException):
+    '''Raised when an execution limit is exceeded (see js2py.utils.limits), JS code can't catch it.'''
+    pass
+
 
 def MakeError(typ, message=u'no info', throw=None):
     return JsException(typ, unicode(message) if message is not None else message, throw)
@@ -55,8 +55,9 @@ class Space(object):
     def NewObject(self):
         return PyJsObject(self.ObjectPrototype)
 
-    def NewFunction(self, code, ctx, params, name, is_declaration, definitions):
-        return PyJsFunction(code, ctx, params, name, self, is_declaration, definitions, prototype=self.FunctionPrototype)
+    def NewFunction(self, code, ctx, params, name, is_declaration, definitions, needs_arguments=True):
+        return PyJsFunction(code, ctx, params, name, self, is_declaration, definitions,
+                            prototype=self.FunctionPrototype, needs_arguments=needs_arguments)
 
     def NewDate(self, value):
         return PyJsDate(value, self.DatePrototype)
@@ -1,3 +1,26 @@
+FUNCTION_NODES = ('FunctionDeclaration', 'FunctionExpression')
+
+
+def uses_arguments(body):
+    ''' whether the function body can access the arguments object of the function (eval can access it too).
+        bodies of nested functions are not searched, they have their own arguments'''
+    stack = [body]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            typ = node.get('type')
+            if typ == 'Identifier':
+                if node['name'] in ('arguments', 'eval'):
+                    return True
+            elif typ in FUNCTION_NODES:
+                if node.get('id'):  # function declaration declares its name in this function
+                    stack.append(node['id'])
+            else:
+                stack.extend(e for e in node.values() if isinstance(e, (dict, list)))
+    return False
+
 
 def to_key(literal_or_identifier):
     ''' returns string representation of this object'''
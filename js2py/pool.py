@@ -0,0 +1,281 @@
+'''Pool of worker processes running many independent scripts in parallel.
+
+EvalJs is single threaded and bound by the GIL, so the pool runs the scripts in separate processes.
+Workers are started once, execute the libraries and then run the jobs in a fork of that initialised
+context (see EvalJs.snapshot), so jobs can't see each other's global variables. Translated code stays
+in the snippet cache of the worker and, with cache_dir, in the disk cache shared by all the workers.
+
+>>> with js2py.JsPool(processes=4, libraries=[rules_js], cache_dir='/tmp/js2py_cache') as pool:
+...     for res in pool.imap([('check(input)', {'age': 30}), ('while (1) {}', None)], timeout=1):
+...         print(res)
+JobResult(index=0, value=True, error=None)
+JobResult(index=1, value=None, error=u'RangeError: Execution time limit of 1s exceeded')
+'''
+import collections
+import multiprocessing
+import pickle
+import select
+import time
+import six
+try:
+    from multiprocessing.connection import wait as _wait
+except ImportError:  # python 2, only unix is supported
+    def _wait(connections, timeout):
+        return select.select(connections, [], [], timeout)[0]
+
+from .base import JsObjectWrapper, PyJsException, ARRAY_CLASSES, to_list, to_dict
+from .evaljs import EvalJs, enable_disk_cache, get_file_contents
+from .es6 import init_babel, js6_to_js5
+from .utils.limits import current_memory
+
+__all__ = ['JsPool', 'JobResult']
+
+# error is None or the error message, then value is None
+JobResult = collections.namedtuple('JobResult', 'index value error')
+
+# seconds the worker gets on top of the job timeout before it is killed
+KILL_GRACE = 1.0
+
+
+def error_message(e):
+    if isinstance(e, PyJsException):
+        return six.text_type(e)
+    return u'%s: %s' % (type(e).__name__, e)
+
+
+def to_builtin(value):
+    '''Converts the value returned by EvalJs.eval to python builtins that can be sent to other processes'''
+    if isinstance(value, JsObjectWrapper):
+        obj = value._obj
+        return to_list(obj) if obj.Class in ARRAY_CLASSES else to_dict(obj)
+    return value
+
+
+def _send(conn, message):
+    try:
+        data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        # only the results can fail
+        data = pickle.dumps(message[:2] + (None, u'Result can not be sent: ' + error_message(e)) + message[4:],
+                            pickle.HIGHEST_PROTOCOL)
+    conn.send_bytes(data)
+
+
+def _worker(conn, libraries, cache_dir, max_jobs, max_memory, isolated, es6):
+    '''Main function of the worker process. Messages sent to the parent:
+    ('ready', error) after the initialisation and ('done', index, value, error, retiring) after every job.'''
+    try:
+        if cache_dir is not None:
+            enable_disk_cache(cache_dir)
+        if es6:
+            init_babel()  # already done if the worker was forked
+        context = EvalJs()
+        for lib in libraries:
+            context.execute(js6_to_js5(lib) if es6 else lib)
+        snapshot = context.snapshot() if isolated else None
+    except Exception as e:
+        _send(conn, ('ready', u'Library initialisation failed: ' + error_message(e)))
+        return
+    _send(conn, ('ready', None))
+    done = 0
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        index, script, data, timeout = job
+        try:
+            job_context = snapshot.fork() if isolated else context
+            job_context.input = data
+            if es6:
+                script = js6_to_js5(script)
+            value, error = to_builtin(job_context.eval(script, timeout=timeout)), None
+        except Exception as e:
+            value, error = None, error_message(e)
+        done += 1
+        retiring = (max_jobs is not None and done >= max_jobs) or (
+            max_memory is not None and current_memory() > max_memory)
+        _send(conn, ('done', index, value, error, retiring))
+        if retiring:
+            return
+
+
+class _Worker(object):
+    def __init__(self, pool):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker, args=(child_conn, pool.libraries, pool.cache_dir,
+                                               pool.max_jobs_per_worker, pool.max_worker_memory, pool.isolated,
+                                               pool.es6))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.job = None  # (batch, index) of the running job
+        self.deadline = None
+
+    def start_job(self, batch, index, script, data, timeout):
+        self.job = batch, index
+        self.deadline = None if timeout is None else time.time() + timeout + KILL_GRACE
+        self.conn.send((index, script, data, timeout))
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except (IOError, OSError):
+                pass
+        self.process.join()
+        self.conn.close()
+
+
+class JsPool(object):
+    '''Runs (script, input) jobs in worker processes and returns what the scripts evaluate to,
+    converted to python builtins (JS objects to dicts, arrays to lists). Scripts see input as
+    the global variable input.
+
+    processes - number of the workers, multiprocessing.cpu_count() by default
+    libraries - JS sources (or files) executed once by every worker before running the jobs
+    cache_dir - disk cache directory for the translated code (see enable_disk_cache)
+    max_jobs_per_worker, max_worker_memory - the worker is replaced by a new one after running that
+        many jobs or when its resident memory grows over that many bytes
+    isolated - if False the jobs run directly in the context of the libraries, which is faster but
+        global variables created by a job are visible to the next ones
+    es6 - the libraries and the scripts are ES6, babel is loaded before starting the workers so
+        forked workers do not have to load it again (conversions are cached, use cache_dir to share them)
+
+    Jobs that take longer than their timeout fail with RangeError (see js2py.utils.limits),
+    workers that do not respond soon after that are killed and replaced. Failed jobs do not stop
+    the batch, JobResult.error is set instead. The pool runs one batch at a time.'''
+
+    def __init__(self, processes=None, libraries=(), cache_dir=None, max_jobs_per_worker=None,
+                 max_worker_memory=None, isolated=True, es6=False):
+        if max_worker_memory is not None and current_memory() is None:
+            raise ValueError('max_worker_memory is not supported on this platform')
+        self.processes = processes or multiprocessing.cpu_count()
+        self.libraries = [lib if isinstance(lib, six.string_types) else get_file_contents(lib)
+                          for lib in libraries]
+        self.cache_dir = cache_dir
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_worker_memory = max_worker_memory
+        self.isolated = isolated
+        self.es6 = es6
+        if es6:
+            init_babel()
+        self._batch = 0
+        self._workers = [_Worker(self) for _ in range(self.processes)]
+        try:
+            while not all(w.ready for w in self._workers):
+                for _ in self._collect():
+                    pass
+        except:
+            self.terminate()
+            raise
+
+    def map(self, jobs, timeout=None):
+        '''Returns list of JobResults of the jobs in their order'''
+        return list(self.imap(jobs, timeout))
+
+    def imap(self, jobs, timeout=None):
+        '''Like imap_unordered but results are yielded in the order of the jobs'''
+        waiting = {}
+        next_index = 0
+        for res in self.imap_unordered(jobs, timeout):
+            waiting[res.index] = res
+            while next_index in waiting:
+                yield waiting.pop(next_index)
+                next_index += 1
+
+    def imap_unordered(self, jobs, timeout=None):
+        '''Yields JobResults as soon as the jobs finish. jobs is an iterable of (script, input) pairs
+        (or just scripts), it is consumed lazily so it can be a generator. timeout is in seconds per job.'''
+        if self._workers is None:
+            raise ValueError('Pool is closed')
+        self._batch += 1
+        batch = self._batch
+        jobs = enumerate(jobs)
+        exhausted = False
+        try:
+            while True:
+                for worker in self._workers:
+                    if exhausted or not worker.ready or worker.job is not None:
+                        continue
+                    try:
+                        index, job = next(jobs)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    script, data = (job, None) if isinstance(job, six.string_types) else job
+                    worker.start_job(batch, index, script, data, timeout)
+                if exhausted and not any(w.job is not None and w.job[0] == batch for w in self._workers):
+                    return
+                for res in self._collect():
+                    yield res
+        finally:
+            self._batch += 1  # results of the jobs still running are dropped
+
+    def _collect(self):
+        '''Waits for messages from the workers, yields finished jobs of the current batch'''
+        deadlines = [w.deadline for w in self._workers if w.deadline is not None]
+        wait_time = max(min(deadlines) - time.time(), 0) if deadlines else None
+        ready = _wait([w.conn for w in self._workers], wait_time)
+        for i, worker in enumerate(list(self._workers)):
+            if worker.conn in ready:
+                try:
+                    message = pickle.loads(worker.conn.recv_bytes())
+                except (EOFError, IOError, OSError):
+                    worker.process.join()
+                    error = u'WorkerError: worker process died (exit code %s)' % worker.process.exitcode
+                    if not worker.ready:  # initialisation crashed
+                        raise RuntimeError(error)
+                    res = self._replace(i, worker, error)
+                    if res is not None:
+                        yield res
+                    continue
+                if message[0] == 'ready':
+                    if message[1] is not None:
+                        raise RuntimeError(message[1])
+                    worker.ready = True
+                    continue
+                _, index, value, error, retiring = message
+                batch = worker.job[0]
+                worker.job = worker.deadline = None
+                if retiring:
+                    worker.stop()
+                    self._workers[i] = _Worker(self)
+                if batch == self._batch:
+                    yield JobResult(index, value, error)
+            elif worker.deadline is not None and worker.deadline <= time.time():
+                worker.stop(kill=True)
+                res = self._replace(i, worker, u'TimeoutError: worker did not stop after the timeout, killed')
+                if res is not None:
+                    yield res
+
+    def _replace(self, i, worker, error):
+        '''Starts a new worker instead of the dead one, returns JobResult of its job if it had one'''
+        self._workers[i] = _Worker(self)
+        if worker.job is not None and worker.job[0] == self._batch:
+            return JobResult(worker.job[1], None, error)
+
+    def close(self):
+        '''Stops the workers after they finish their current jobs'''
+        if self._workers is not None:
+            for worker in self._workers:
+                worker.stop()
+            self._workers = None
+
+    def terminate(self):
+        '''Kills the workers immediately'''
+        if self._workers is not None:
+            for worker in self._workers:
+                worker.stop(kill=True)
+            self._workers = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.terminate()
@@ -1,17 +1,18 @@
 # this is based on jsarray.py
 
-import six
+from ..base import PyJsArrayBuffer
+from ..utils.typedarrays import copy_bytes
 
-if six.PY3:
-    xrange = range
-    import functools
-
-def to_arr(this):
-    """Returns Python array from Js array"""
-    return [this.get(str(e)) for e in xrange(len(this))]
-
-
-ARR_STACK = set({})
 
 class ArrayBufferPrototype:
-    pass
+
+    def slice(start, end):
+        if not isinstance(this, PyJsArrayBuffer):
+            raise this.MakeError('TypeError', 'ArrayBuffer.prototype.slice called on incompatible receiver')
+        length = this.byte_length()
+        relative_start = start.to_int()
+        first = max(length + relative_start, 0) if relative_start < 0 else min(relative_start, length)
+        relative_end = length if end.is_undefined() else end.to_int()
+        final = max(length + relative_end, 0) if relative_end < 0 else min(relative_end, length)
+        # the copy does not share memory with this
+        return PyJsArrayBuffer(copy_bytes(this.buff, first, max(final, first)), this.prototype)
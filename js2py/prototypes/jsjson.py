@@ -1,6 +1,9 @@
 import json
-from ..base import Js
-indent = ''
+from json.encoder import encode_basestring_ascii
+from ..base import Js, MakeError, PyJsObject, PyJsArray, PyJsString, PyJsNumber, PyJsBoolean, PyJsNull, \
+    PyObjectWrapper, ObjectPrototype, ArrayPrototype, StringPrototype, undefined, null, true, false
+from ..utils.shapes import ROOT_SHAPE
+from ..utils.gc_pause import without_gc
 # python 3 support
 import six
 if six.PY3:
@@ -9,15 +12,20 @@ if six.PY3:
     xrange = range
     unicode = str
 
+# stringify joins the written pieces of JSON text into a chunk after this many pieces
+PIECES_PER_CHUNK = 4096
+
 
 def parse(text):
     reviver = arguments[1]
-    s = text.to_string().value
+    if isinstance(text, PyObjectWrapper) and hasattr(text.obj, 'read'):
+        s = text.obj.read()  # python file-like object
+    else:
+        s = text.to_string().value
     try:
-        unfiltered = json.loads(s)
-    except:
+        unfiltered = without_gc(decode, s)
+    except ValueError:
         raise this.MakeError('SyntaxError', 'Could not parse JSON string - Invalid syntax')
-    unfiltered = to_js(this, unfiltered)
     if reviver.is_callable():
         root = this.Js({'': unfiltered})
         return walk(root, '', reviver)
@@ -26,151 +34,262 @@ def parse(text):
 
 
 def stringify(value, replacer, space):
-    global indent
-    stack = set([])
-    indent = ''
-    property_list = replacer_function = this.undefined
-    if replacer.is_object():
-        if replacer.is_callable():
-            replacer_function = replacer
-        elif replacer.Class=='Array':
-            property_list = []
-            for e in replacer:
-                v = replacer[e]
-                item = this.undefined
-                if v._type()=='Number':
-                    item = v.to_string()
-                elif v._type()=='String':
-                    item = v
-                elif v.is_object():
-                    if v.Class in ('String', 'Number'):
+    writer = JsonWriter()
+    if not Stringifier(replacer, space, writer).dump(value):
+        return this.undefined
+    return this.Js(writer.getvalue())
+
+
+def load(fp):
+    '''Parses JSON text read from the python file-like object fp and returns the JS value (PyJs).'''
+    return without_gc(decode, fp.read())
+
+
+def dump(value, fp, replacer=undefined, space=undefined):
+    '''Writes JSON.stringify(value, replacer, space) to the python file-like object fp in chunks,
+    the whole JSON text is never kept in memory. Returns False if value is not serializable (nothing is written).'''
+    writer = JsonWriter(fp)
+    written = Stringifier(Js(replacer), Js(space), writer).dump(Js(value))
+    writer.flush()
+    return written
+
+
+class JsonWriter(object):
+    '''Stringifier appends the pieces of JSON text to self.pieces and calls flush every PIECES_PER_CHUNK pieces.
+    The pieces are joined into a chunk that is passed to fp.write or, if there is no fp, kept for getvalue.'''
+    def __init__(self, fp=None):
+        self.fp = fp
+        self.pieces = []
+        self.chunks = []
+
+    def flush(self):
+        if self.pieces:
+            chunk = u''.join(self.pieces)
+            del self.pieces[:]
+            if self.fp is None:
+                self.chunks.append(chunk)
+            else:
+                self.fp.write(chunk)
+
+    def getvalue(self):
+        self.flush()
+        return u''.join(self.chunks)
+
+
+class Stringifier(object):
+    '''State of one JSON.stringify call'''
+    def __init__(self, replacer, space, writer):
+        self.writer = writer
+        self.pieces = writer.pieces
+        self.write = writer.pieces.append
+        self.stack = set()
+        self.indent = ''
+        self.replacer_function = self.property_list = None
+        if replacer.is_object():
+            if replacer.is_callable():
+                self.replacer_function = replacer
+            elif replacer.Class=='Array':
+                property_list = []
+                for e in replacer:
+                    v = replacer[e]
+                    item = undefined
+                    if v._type()=='Number':
                         item = v.to_string()
-                if not item.is_undefined() and item.value not in property_list:
-                    property_list.append(item.value)
-    if space.is_object():
-        if space.Class=='Number':
-            space = space.to_number()
-        elif space.Class=='String':
-            space = space.to_string()
-    if space._type()=='Number':
-        space = this.Js(min(10, space.to_int()))
-        gap = max(int(space.value), 0)* ' '
-    elif space._type()=='String':
-        gap = space.value[:10]
-    else:
-        gap = ''
-    return this.Js(Str('', this.Js({'':value}), replacer_function, property_list, gap, stack, space))
-
-
-
-def Str(key, holder, replacer_function, property_list, gap, stack, space):
-    value = holder[key]
-    if value.is_object():
-        to_json = value.get('toJSON')
-        if to_json.is_callable():
-            value = to_json.call(value, (key,))
-    if not replacer_function.is_undefined():
-        value = replacer_function.call(holder, (key, value))
-
-    if value.is_object():
-        if value.Class=='String':
-            value = value.to_string()
-        elif value.Class=='Number':
-            value = value.to_number()
-        elif value.Class=='Boolean':
-            value = value.to_boolean()
-    if value.is_null():
-        return 'null'
-    elif value.Class=='Boolean':
-        return 'true' if value.value else 'false'
-    elif value._type()=='String':
-        return Quote(value)
-    elif value._type()=='Number':
-        if not value.is_infinity():
-            return value.to_string()
-        return 'null'
-    if value.is_object() and not value.is_callable():
-        if value.Class=='Array':
-            return ja(value, stack, gap, property_list, replacer_function, space)
+                    elif v._type()=='String':
+                        item = v
+                    elif v.is_object():
+                        if v.Class in ('String', 'Number'):
+                            item = v.to_string()
+                    if not item.is_undefined() and item.value not in property_list:
+                        property_list.append(item.value)
+                self.property_list = property_list
+        if space.is_object():
+            if space.Class=='Number':
+                space = space.to_number()
+            elif space.Class=='String':
+                space = space.to_string()
+        if space._type()=='Number':
+            self.gap = max(min(10, space.to_int()), 0) * ' '
+        elif space._type()=='String':
+            self.gap = space.value[:10]
         else:
-            return jo(value, stack, gap, property_list, replacer_function, space)
-    return None # undefined
+            self.gap = ''
 
+    def dump(self, value):
+        '''Writes value, returns False if it is not serializable (undefined, function...)'''
+        value = self.prepare('', value, Js({'': value}))
+        if value is None:
+            return False
+        self.serialize(value)
+        return True
 
+    def prepare(self, key, value, holder):
+        '''Returns the value that should be serialized under key or None if the key should be skipped'''
+        if value.TYPE == 'Object':
+            to_json = value.get('toJSON')
+            if to_json.is_callable():
+                value = to_json.call(value, (Js(key),))
+        if self.replacer_function is not None:
+            value = self.replacer_function.call(holder, (Js(key), value))
+        if value.TYPE == 'Object':
+            if value.Class=='String':
+                value = value.to_string()
+            elif value.Class=='Number':
+                value = value.to_number()
+            elif value.Class=='Boolean':
+                value = value.to_boolean()
+            elif value.is_callable():
+                return None
+        elif value.TYPE == 'Undefined':
+            return None
+        return value
 
-def jo(value, stack, gap, property_list, replacer_function, space):
-    global indent
-    if value in stack:
-        raise value.MakeError('TypeError', 'Converting circular structure to JSON')
-    stack.add(value)
-    stepback = indent
-    indent += gap
-    if not property_list.is_undefined():
-        k = property_list
-    else:
-        k = [e.value for e in value]
-    partial = []
-    for p in k:
-        str_p = value.Js(Str(p, value, replacer_function, property_list, gap, stack, space))
-        if not str_p.is_undefined():
-            member = json.dumps(p) + ':' + (' ' if gap else '')  + str_p.value # todo not sure here - what space character?
-            partial.append(member)
-    if not partial:
-        final = '{}'
-    else:
-        if not gap:
-            final = '{%s}' % ','.join(partial)
-        else:
-            sep = ',\n'+indent
-            properties = sep.join(partial)
-            final = '{\n'+indent+properties+'\n'+stepback+'}'
-    stack.remove(value)
-    indent = stepback
-    return final
-
-
-def ja(value, stack, gap, property_list, replacer_function, space):
-    global indent
-    if value in stack:
-        raise value.MakeError('TypeError', 'Converting circular structure to JSON')
-    stack.add(value)
-    stepback = indent
-    indent += gap
-    partial = []
-    length = len(value)
-    for index in xrange(length):
-        index = str(index)
-        str_index = value.Js(Str(index, value, replacer_function, property_list, gap, stack, space))
-        if str_index.is_undefined():
-            partial.append('null')
+    def serialize(self, value):
+        typ = type(value)
+        if typ is PyJsString:
+            self.write(encode_basestring_ascii(value.value))
+        elif typ is PyJsNumber:
+            num = value.value
+            if num != num or num in (float('inf'), -float('inf')):
+                self.write('null')
+            elif not num % 1 and abs(num) < 1e21:
+                self.write(unicode(int(num)))
+            else:
+                self.write(value.to_string().value)
+        elif typ is PyJsBoolean:
+            self.write('true' if value.value else 'false')
+        elif typ is PyJsNull:
+            self.write('null')
+        elif value.Class=='Array':
+            self.serialize_array(value)
         else:
-            partial.append(str_index.value)
-    if not partial:
-        final = '[]'
-    else:
-        if not gap:
-            final = '[%s]' % ','.join(partial)
+            self.serialize_object(value)
+
+    def serialize_object(self, value):
+        if value in self.stack:
+            raise MakeError('TypeError', 'Converting circular structure to JSON')
+        self.stack.add(value)
+        stepback = self.indent
+        self.indent = indent = stepback + self.gap
+        if self.property_list is not None:
+            keys = self.property_list
+        elif type(value) is PyJsObject:
+            # properties in slots are always enumerable
+            keys = list(value.shape.keys)
+            keys.extend(k for k, desc in six.iteritems(value.own) if desc.get('enumerable'))
+            keys.sort()
         else:
-            sep = ',\n'+indent
-            properties = sep.join(partial)
-            final = '[\n'+indent +properties+'\n'+stepback+']'
-    stack.remove(value)
-    indent = stepback
-    return final
+            keys = sorted(k for k in value.own_keys() if value.get_own_property(k)['enumerable'])
+        write, pieces = self.write, self.pieces
+        sep = ',\n' + indent if self.gap else ','
+        colon = ': ' if self.gap else ':'
+        first = True
+        write('{')
+        for k in keys:
+            v = self.prepare(k, value.get(k), value)
+            if v is None:
+                continue
+            if first:
+                first = False
+                write(('\n' + indent if self.gap else '') + encode_basestring_ascii(k) + colon)
+            else:
+                write(sep + encode_basestring_ascii(k) + colon)
+            self.serialize(v)
+            if len(pieces) >= PIECES_PER_CHUNK:
+                self.writer.flush()
+        if self.gap and not first:
+            write('\n' + stepback)
+        write('}')
+        self.stack.remove(value)
+        self.indent = stepback
+
+    def serialize_array(self, value):
+        if value in self.stack:
+            raise MakeError('TypeError', 'Converting circular structure to JSON')
+        self.stack.add(value)
+        stepback = self.indent
+        self.indent = indent = stepback + self.gap
+        # plain elements are read directly from the dense list
+        dense = value.dense if type(value) is PyJsArray else ()
+        length = len(value)
+        write, pieces = self.write, self.pieces
+        sep = ',\n' + indent if self.gap else ','
+        write('[')
+        for index in xrange(length):
+            if index:
+                write(sep)
+            elif self.gap:
+                write('\n' + indent)
+            e = dense[index] if index < len(dense) else None
+            if e is None:
+                e = value.get(unicode(index))
+            e = self.prepare(unicode(index), e, value)
+            if e is None:
+                write('null')
+            else:
+                self.serialize(e)
+            if len(pieces) >= PIECES_PER_CHUNK:
+                self.writer.flush()
+        if self.gap and length:
+            write('\n' + stepback)
+        write(']')
+        self.stack.remove(value)
+        self.indent = stepback
 
 
+def to_js(d):
+    '''Converts the result of DECODER (objects are already PyJsObjects) to PyJs'''
+    conv = CONVERTERS.get(type(d))
+    return d if conv is None else conv(d)
 
 
+def decode(s):
+    return to_js(DECODER.decode(s))
+
+
+def js_array(lst):
+    return PyJsArray([to_js(e) for e in lst], ArrayPrototype)
+
+
+def js_object(pairs):
+    '''object_pairs_hook of DECODER, stores the properties in slots directly'''
+    obj = PyJsObject({}, ObjectPrototype)
+    shape, slots, own = ROOT_SHAPE, obj.slots, obj.own
+    for k, v in pairs:
+        conv = CONVERTERS.get(type(v))
+        if conv is not None:
+            v = conv(v)
+        index = shape.lookup(k)
+        if index is not None:  # duplicate key, the last value wins
+            slots[index] = v
+        elif k in own:
+            own[k]['value'] = v
+        else:
+            new_shape = shape.add(k)
+            if new_shape is None:
+                own[k] = {'value': v, 'writable': True, 'enumerable': True, 'configurable': True}
+            else:
+                shape = new_shape
+                slots.append(v)
+    obj.shape = shape
+    return obj
+
 
-def Quote(string):
-    return string.Js(json.dumps(string.value))
+def reject_constant(name):
+    raise ValueError('%s is not valid JSON' % name)
 
 
-def to_js(this, d):
-    if isinstance(d, dict):
-        return this.Js(dict((k,this.Js(v)) for k, v in six.iteritems(d)))
-    return this.Js(d)
+CONVERTERS = {
+    unicode: lambda s: PyJsString(s, StringPrototype),
+    str: lambda s: PyJsString(unicode(s), StringPrototype),
+    float: Js,
+    bool: lambda b: true if b else false,
+    type(None): lambda n: null,
+    list: js_array,
+}
 
+# builds JS objects while parsing, without the intermediate python dicts. Numbers are parsed as floats.
+DECODER = json.JSONDecoder(object_pairs_hook=js_object, parse_int=float, parse_constant=reject_constant)
 
 
 def walk(holder, name, reviver):
@@ -182,7 +301,7 @@ def walk(holder, name, reviver):
             if new_element.is_undefined():
                 val.delete(i)
             else:
-                new_element.put(i, new_element)
+                val.put(i, new_element)
     elif val.is_object():
         for key in val:
             new_element = walk(val, key, reviver)
@@ -207,4 +326,4 @@ JSON.define_own_property('parse', {'value': Js(parse),
 JSON.define_own_property('stringify', {'value': Js(stringify),
                                        'enumerable': False,
                                        'writable': True,
-                                       'configurable': True})
\ No newline at end of file
+                                       'configurable': True})
@@ -1,3 +1,4 @@
+import math
 import six
 if six.PY3:
     basestring = str
@@ -12,6 +13,33 @@ RADIX_SYMBOLS = {0: '0', 1: '1', 2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7',
                  32: 'w', 33: 'x', 34: 'y', 35: 'z'}
 
 
+def to_radix(num, r):
+    '''Returns finite num in radix r, including the fraction digits'''
+    sign = '-' if num < 0 else ''
+    num = abs(num)
+    whole = int(num)
+    frac = num - whole
+    res = ''
+    while whole:
+        res = RADIX_SYMBOLS[whole % r] + res
+        whole //= r
+    res = res or '0'
+    if frac:
+        digits = ''
+        # enough digits for the 52 bit mantissa
+        for _ in xrange(int(52 / math.log(r, 2)) + 1):
+            frac *= r
+            d = int(frac)
+            digits += RADIX_SYMBOLS[d]
+            frac -= d
+            if not frac:
+                break
+        digits = digits.rstrip('0')
+        if digits:
+            res += '.' + digits
+    return sign + res
+
+
 def to_str_rep(num):
     if num.is_nan():
         return num.Js('NaN')
@@ -34,18 +62,9 @@ class NumberPrototype:
             return to_str_rep(this)
         if r not in xrange(2, 37): 
             raise this.MakeError('RangeError', 'Number.prototype.toString() radix argument must be between 2 and 36')
-        num = this.to_int()
-        if num < 0:
-            num = -num
-            sign = '-'
-        else:
-            sign = ''
-        res = ''
-        while num:
-            s = RADIX_SYMBOLS[num % r]
-            num = num // r
-            res = s + res
-        return sign + (res if res else '0')
+        if this.is_nan() or this.is_infinity():
+            return to_str_rep(this)
+        return to_radix(this.value, r)
 
     def valueOf():
         if this.Class!='Number':
@@ -26,7 +26,7 @@ class ObjectPrototype:
                 return True
 
     def propertyIsEnumerable(prop):
-        cand = this.own.get(prop.to_string().value)
+        cand = this.get_own_property(prop.to_string().value)
         return cand is not None and cand.get('enumerable')
 
 
@@ -29,13 +29,11 @@ def Exec(this, string):
     string = string.to_string()
     length = len(string)
     i = this.get('lastIndex').to_int() if this.glob else 0
-    matched = False
-    while not matched:
-        if i < 0 or i > length:
-            this.put('lastIndex', this.Js(0))
-            return this.null
-        matched = this.match(string.value, i)
-        i += 1
+    # search tries to match at i, i+1, ..., length
+    matched = this.pat.search(string.value, i) if 0 <= i <= length else None
+    if matched is None:
+        this.put('lastIndex', this.Js(0))
+        return this.null
     start, end = matched.span()#[0]+i-1, matched.span()[1]+i-1
     if this.glob:
         this.put('lastIndex', this.Js(end))
@@ -1,21 +1,57 @@
 # this is based on jsarray.py
+# Elements of typed arrays are always numbers stored in array.view (see PyJsTypedArray) so the methods
+# read and write them in bulk with view[start:end].tolist() and view[start:end] = array(...), callbacks
+# are called per element only when they are supplied.
 
+from array import array as py_array
+import math
+import struct
 import six
-try:
+from ..base import Js, MakeError, PyJsArray, PyJsTypedArray, undefined, NUMPY_AVAILABLE
+if NUMPY_AVAILABLE:
     import numpy
-except:
-    pass
 
 if six.PY3:
     xrange = range
     import functools
 
-def to_arr(this):
-    """Returns Python array from Js array"""
-    return [this.get(str(e)) for e in xrange(len(this))]
+INF = float('inf')
 
 
-ARR_STACK = set({})
+def typed_array(this):
+    '''Returns this if it is a typed array, raises TypeError otherwise'''
+    if not isinstance(this, PyJsTypedArray):
+        raise MakeError('TypeError', '%s is not a typed array' % this.Class)
+    return this
+
+
+def relative_index(value, length, default):
+    if value.is_undefined():
+        return default
+    rel = value.to_int()
+    return max(length + rel, 0) if rel < 0 else min(rel, length)
+
+
+def write(array, start, values):
+    '''Stores values (already converted to the element type) from index start'''
+    array.view[start:start + len(values)] = py_array(array.FORMAT, values)
+
+
+def element_to_string(e):
+    '''Same as Js(e).to_string().value'''
+    if e != e:
+        return u'NaN'
+    if e in (INF, -INF):
+        return u'Infinity' if e > 0 else u'-Infinity'
+    if not e % 1:
+        return six.text_type(int(e))
+    return six.text_type(e)
+
+
+def new_like(array, values):
+    '''Returns new typed array of the same type with values (already converted to the element type)'''
+    return type(array)(py_array(array.FORMAT, values), array.prototype)
+
 
 class TypedArrayPrototype:
 
@@ -48,277 +84,199 @@ class TypedArrayPrototype:
         return ','.join(res)
 
     def join(separator):
-        ARR_STACK.add(this)
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
+        array = typed_array(this)
         separator = ',' if separator.is_undefined() else separator.to_string().value
-        elems = []
-        for e in xrange(arr_len):
-            elem = array.get(str(e))
-            if elem in ARR_STACK:
-                s = ''
-            else:
-                s = elem.to_string().value
-            elems.append(s if not (elem.is_undefined() or elem.is_null()) else '')
-        res =  separator.join(elems)
-        ARR_STACK.remove(this)
-        return res
+        return separator.join([element_to_string(e) for e in array.view.tolist()])
 
     def reverse():
-        array = this.to_object() # my own algorithm
-        vals = to_arr(array)
-        has_props = [array.has_property(str(e)) for e in xrange(len(array))]
-        vals.reverse()
-        has_props.reverse()
-        for i, val in enumerate(vals):
-            if has_props[i]:
-                array.put(str(i), val)
-            else:
-                array.delete(str(i))
+        array = typed_array(this)
+        values = array.view.tolist()
+        values.reverse()
+        write(array, 0, values)
         return array
 
-    def slice(start, end): # todo check
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
-        relative_start = start.to_int()
-        k = max((arr_len + relative_start), 0) if relative_start<0 else  min(relative_start, arr_len)
-        relative_end = arr_len if end.is_undefined() else end.to_int()
-        final =  max((arr_len + relative_end), 0) if relative_end<0 else min(relative_end, arr_len)
-        res = []
-        n = 0
-        while k<final:
-            pk = str(k)
-            if array.has_property(pk):
-                res.append(array.get(pk))
-            k += 1
-            n += 1
-        return res
+    def slice(start, end):
+        array = typed_array(this)
+        k = relative_index(start, array.length, 0)
+        final = relative_index(end, array.length, array.length)
+        return new_like(array, array.view[k:max(k, final)].tolist())
 
-    def sort(cmpfn):
-        if not this.Class in ('Array', 'Arguments'):
-            return this.to_object() # do nothing
-        arr = []
-        for i in xrange(len(this)):
-            arr.append(this.get(six.text_type(i)))
-
-        if not arr:
-            return this
-        if not cmpfn.is_callable():
-            cmpfn = None
-        cmp = lambda a,b: sort_compare(a, b, cmpfn)
-        if six.PY3:
-            key = functools.cmp_to_key(cmp)
-            arr.sort(key=key)
+    def subarray(begin, end):
+        array = typed_array(this)
+        k = relative_index(begin, array.length, 0)
+        final = max(k, relative_index(end, array.length, array.length))
+        view = array.view
+        if NUMPY_AVAILABLE and isinstance(view, numpy.ndarray):
+            # slicing numpy array also makes a view and works with any strides
+            return type(array)(view[k:final], array.prototype)
+        offset = int(array.get('byteOffset').value) + k * struct.calcsize(array.FORMAT)
+        return type(array)(prototype=array.prototype, buffer=array.get('buffer'), byte_offset=offset, length=final - k)
+
+    def fill(value):
+        array = typed_array(this)
+        num = array.convert(value.to_number().value)
+        k = relative_index(arguments[1], array.length, 0)
+        final = relative_index(arguments[2], array.length, array.length)
+        if final > k:
+            array.view[k:final] = py_array(array.FORMAT, [num]) * (final - k)
+        return array
+
+    def set(source, offset):
+        array = typed_array(this)
+        offset = offset.to_int()
+        if offset < 0:
+            raise MakeError('RangeError', 'offset must be >= 0')
+        convert = array.convert
+        if isinstance(source, PyJsTypedArray):
+            # copied before writing so it works when the memory is shared
+            values = source.view.tolist()
+            if type(source) is not type(array):
+                values = [convert(e) for e in values]
         else:
-            arr.sort(cmp=cmp)
-        for i in xrange(len(arr)):
-            this.put(six.text_type(i), arr[i])
+            source = source.to_object()
+            if isinstance(source, PyJsArray):
+                items = source.to_list()
+            else:
+                items = [source.get(str(i)) for i in xrange(source.get('length').to_uint32())]
+            values = [convert(e.to_number().value) for e in items]
+        if offset + len(values) > array.length:
+            raise MakeError('RangeError', 'offset is out of bounds')
+        write(array, offset, values)
 
-        return this
+    def sort(cmpfn):
+        array = typed_array(this)
+        values = array.view.tolist()
+        if cmpfn.is_callable():
+            def cmp(a, b):
+                res = cmpfn.call(undefined, (Js(a), Js(b))).to_number().value
+                return -1 if res < 0 else (1 if res > 0 else 0)
+            if six.PY3:
+                values.sort(key=functools.cmp_to_key(cmp))
+            else:
+                values.sort(cmp=cmp)
+        elif array.FORMAT in 'fd':
+            # numeric order, -0 before +0 and NaN at the end
+            values.sort(key=lambda x: (x != x, x, math.copysign(1, x)))
+        else:
+            values.sort()
+        write(array, 0, values)
+        return array
 
     def indexOf(searchElement):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
-        if arr_len == 0:
+        array = typed_array(this)
+        arr_len = array.length
+        n = arguments[1].to_int() if len(arguments)>1 else 0
+        k = n if n >= 0 else max(arr_len + n, 0)
+        if searchElement.TYPE != 'Number' or k >= arr_len:
             return -1
-        if len(arguments)>1:
-            n = arguments[1].to_int()
-        else:
-            n = 0
-        if n >= arr_len:
+        value = searchElement.value
+        if value != value:  # NaN
+            return -1
+        try:
+            return k + array.view[k:].tolist().index(value)
+        except ValueError:
             return -1
-        if n >= 0:
-            k = n
-        else:
-            k = arr_len - abs(n)
-            if k < 0:
-                k = 0
-        while k < arr_len:
-            if array.has_property(str(k)):
-                elementK = array.get(str(k))
-                if searchElement.strict_equality_comparison(elementK):
-                    return k
-            k += 1
-        return -1
 
     def lastIndexOf(searchElement):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
-        if arr_len == 0:
+        array = typed_array(this)
+        arr_len = array.length
+        n = arguments[1].to_int() if len(arguments)>1 else arr_len - 1
+        k = min(n, arr_len - 1) if n >= 0 else arr_len + n
+        if searchElement.TYPE != 'Number' or k < 0:
+            return -1
+        value = searchElement.value
+        if value != value:
+            return -1
+        values = array.view[:k + 1].tolist()
+        values.reverse()
+        try:
+            return k - values.index(value)
+        except ValueError:
             return -1
-        if len(arguments)>1:
-            n = arguments[1].to_int()
-        else:
-            n = arr_len - 1
-        if n >= 0:
-            k = min(n, arr_len-1)
-        else:
-            k = arr_len - abs(n)
-        while k >= 0:
-            if array.has_property(str(k)):
-                elementK = array.get(str(k))
-                if searchElement.strict_equality_comparison(elementK):
-                    return k
-            k -= 1
-        return -1
 
     def every(callbackfn):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
+        array = typed_array(this)
         if not callbackfn.is_callable():
-            raise this.MakeError('TypeError', 'callbackfn must be a function')
+            raise MakeError('TypeError', 'callbackfn must be a function')
         T = arguments[1]
-        k = 0
-        while k<arr_len:
-            if array.has_property(str(k)):
-                kValue = array.get(str(k))
-                if not callbackfn.call(T, (kValue, this.Js(k), array)).to_boolean().value:
-                    return False
-            k += 1
+        view = array.view
+        for k in xrange(array.length):
+            if not callbackfn.call(T, (Js(view[k]), Js(k), array)).to_boolean().value:
+                return False
         return True
 
     def some(callbackfn):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
+        array = typed_array(this)
         if not callbackfn.is_callable():
-            raise this.MakeError('TypeError', 'callbackfn must be a function')
+            raise MakeError('TypeError', 'callbackfn must be a function')
         T = arguments[1]
-        k = 0
-        while k<arr_len:
-            if array.has_property(str(k)):
-                kValue = array.get(str(k))
-                if callbackfn.call(T, (kValue, this.Js(k), array)).to_boolean().value:
-                    return True
-            k += 1
+        view = array.view
+        for k in xrange(array.length):
+            if callbackfn.call(T, (Js(view[k]), Js(k), array)).to_boolean().value:
+                return True
         return False
 
     def forEach(callbackfn):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
+        array = typed_array(this)
         if not callbackfn.is_callable():
-            raise this.MakeError('TypeError', 'callbackfn must be a function')
+            raise MakeError('TypeError', 'callbackfn must be a function')
         T = arguments[1]
-        k = 0
-        while k<arr_len:
-            if array.has_property(str(k)):
-                kValue = array.get(str(k))
-                callbackfn.call(T, (kValue, this.Js(k), array))
-            k+=1
+        view = array.view
+        for k in xrange(array.length):
+            callbackfn.call(T, (Js(view[k]), Js(k), array))
 
     def map(callbackfn):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
+        array = typed_array(this)
         if not callbackfn.is_callable():
-            raise this.MakeError('TypeError', 'callbackfn must be a function')
+            raise MakeError('TypeError', 'callbackfn must be a function')
         T = arguments[1]
-        A = this.Js([])
-        k = 0
-        while k<arr_len:
-            Pk = str(k)
-            if array.has_property(Pk):
-                kValue = array.get(Pk)
-                mappedValue = callbackfn.call(T, (kValue, this.Js(k), array))
-                A.define_own_property(Pk, {'value': mappedValue, 'writable': True,
-                    'enumerable': True, 'configurable': True})
-            k += 1
-        return A
+        view, convert = array.view, array.convert
+        return new_like(array, [convert(callbackfn.call(T, (Js(view[k]), Js(k), array)).to_number().value)
+                                for k in xrange(array.length)])
 
     def filter(callbackfn):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
+        array = typed_array(this)
         if not callbackfn.is_callable():
-            raise this.MakeError('TypeError', 'callbackfn must be a function')
+            raise MakeError('TypeError', 'callbackfn must be a function')
         T = arguments[1]
+        view = array.view
         res = []
-        k = 0
-        while k<arr_len:
-            if array.has_property(str(k)):
-                kValue = array.get(str(k))
-                if callbackfn.call(T, (kValue, this.Js(k), array)).to_boolean().value:
-                    res.append(kValue)
-            k += 1
-        return res # converted to js array automatically
+        for k in xrange(array.length):
+            value = view[k]
+            if callbackfn.call(T, (Js(value), Js(k), array)).to_boolean().value:
+                res.append(value)
+        return new_like(array, res)
 
     def reduce(callbackfn):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
+        array = typed_array(this)
         if not callbackfn.is_callable():
-            raise this.MakeError('TypeError', 'callbackfn must be a function')
-        if not arr_len and len(arguments)<2:
-            raise this.MakeError('TypeError', 'Reduce of empty array with no initial value')
+            raise MakeError('TypeError', 'callbackfn must be a function')
+        view = array.view
         k = 0
         if len(arguments)>1: # initial value present
             accumulator = arguments[1]
+        elif array.length:
+            accumulator = Js(view[0])
+            k = 1
         else:
-            kPresent = False
-            while not kPresent and k<arr_len:
-                kPresent = array.has_property(str(k))
-                if kPresent:
-                    accumulator = array.get(str(k))
-                k += 1
-            if not kPresent:
-                raise this.MakeError('TypeError', 'Reduce of empty array with no initial value')
-        while k<arr_len:
-            if array.has_property(str(k)):
-                kValue = array.get(str(k))
-                accumulator = callbackfn.call(this.undefined, (accumulator, kValue, this.Js(k), array))
-            k += 1
+            raise MakeError('TypeError', 'Reduce of empty array with no initial value')
+        for k in xrange(k, array.length):
+            accumulator = callbackfn.call(undefined, (accumulator, Js(view[k]), Js(k), array))
         return accumulator
 
-
     def reduceRight(callbackfn):
-        array = this.to_object()
-        arr_len = array.get("length").to_uint32()
+        array = typed_array(this)
         if not callbackfn.is_callable():
-            raise this.MakeError('TypeError', 'callbackfn must be a function')
-        if not arr_len and len(arguments)<2:
-            raise this.MakeError('TypeError', 'Reduce of empty array with no initial value')
-        k = arr_len - 1
+            raise MakeError('TypeError', 'callbackfn must be a function')
+        view = array.view
+        k = array.length - 1
         if len(arguments)>1: # initial value present
             accumulator = arguments[1]
-        else:
-            kPresent = False
-            while not kPresent and k>=0:
-                kPresent = array.has_property(str(k))
-                if kPresent:
-                    accumulator = array.get(str(k))
-                k -= 1
-            if not kPresent:
-                raise this.MakeError('TypeError', 'Reduce of empty array with no initial value')
-        while k>=0:
-            if array.has_property(str(k)):
-                kValue = array.get(str(k))
-                accumulator = callbackfn.call(this.undefined, (accumulator, kValue, this.Js(k), array))
+        elif array.length:
+            accumulator = Js(view[k])
             k -= 1
+        else:
+            raise MakeError('TypeError', 'Reduce of empty array with no initial value')
+        for k in xrange(k, -1, -1):
+            accumulator = callbackfn.call(undefined, (accumulator, Js(view[k]), Js(k), array))
         return accumulator
-
-def sort_compare(a, b, comp):
-    if a is None:
-        if b is None:
-            return 0
-        return 1
-    if b is None:
-        if a is None:
-            return 0
-        return -1
-    if a.is_undefined():
-        if b.is_undefined():
-            return 0
-        return 1
-    if b.is_undefined():
-        if a.is_undefined():
-            return 0
-        return -1
-    if comp is not None:
-        res = comp.call(a.undefined, (a, b))
-        return res.to_int()
-    x, y = a.to_string(), b.to_string()
-    if x<y:
-        return -1
-    elif x>y:
-        return 1
-    return 0
-
-
-
-
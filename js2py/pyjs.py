@@ -29,7 +29,8 @@ from .host.jsfunctions import parseFloat, parseInt, isFinite, \
 __all__ = ['Js', 'PyJsComma', 'PyJsStrictEq', 'PyJsStrictNeq',
            'PyJsException', 'PyJsBshift', 'Scope', 'PyExceptionToJs',
            'JsToPyException', 'JS_BUILTINS', 'appengine', 'set_global_object',
-           'JsRegExp', 'PyJsException', 'PyExceptionToJs', 'JsToPyException', 'PyJsSwitchException']
+           'JsRegExp', 'PyJsException', 'PyExceptionToJs', 'JsToPyException', 'PyJsSwitchException',
+           'PropertyCache', 'PyJsLimits', 'PyJsCheckLimits', 'PyJsLimitExceeded', 'PyJsFloat', 'PyJsDiv', 'PyJsMod']
 
 
 # these were defined in base.py
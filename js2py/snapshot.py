@@ -0,0 +1,138 @@
+'''Copying of JS object graphs, used to fork initialised EvalJs contexts (see EvalJs.snapshot).
+
+Builtin objects (Object, Array.prototype, undefined...) are shared by all the contexts of the translator
+so they are never copied. Neither are primitive values or host python objects. Translated JS functions
+keep their scope in the default value of their var argument, so they are recreated with the copied scope.
+Memory of array buffers is copied once and views of the copied typed arrays are made again, so typed arrays
+that shared memory share the copied memory.'''
+import array
+import types
+import six
+from .base import PyJs, PyJsNumber, PyJsString, PyJsBoolean, PyJsUndefined, PyJsNull, PyJsArrayBuffer, \
+    PyJsTypedArray, NUMPY_AVAILABLE
+from .utils.typedarrays import byte_length, copy_bytes, make_view
+
+if NUMPY_AVAILABLE:
+    import numpy
+
+__all__ = ['shared_objects', 'fork']
+
+PRIMITIVES = (PyJsNumber, PyJsString, PyJsBoolean, PyJsUndefined, PyJsNull)
+
+
+def shared_objects():
+    '''Returns fork memo that maps every object reachable from the builtins to itself'''
+    from .pyjs import JS_BUILTINS
+    memo = {}
+    stack = list(JS_BUILTINS.values())
+    while stack:
+        obj = stack.pop()
+        if not isinstance(obj, PyJs) or id(obj) in memo:
+            continue
+        memo[id(obj)] = obj
+        stack.append(obj.prototype)
+        for name in obj.own_keys():
+            desc = obj.get_own_property(name)
+            if isinstance(desc, dict):
+                stack.extend(desc.values())
+            else:
+                stack.append(desc)
+    return memo
+
+
+def _make_cell(value):
+    return (lambda: value).__closure__[0]
+
+
+def fork(obj, memo):
+    '''Returns a copy of obj. memo maps ids of already copied objects to their copies,
+    start with shared_objects().'''
+    try:
+        return memo[id(obj)]
+    except KeyError:
+        pass
+    if isinstance(obj, PyJs):
+        if isinstance(obj, PRIMITIVES):
+            return obj
+        new = obj.__class__.__new__(obj.__class__)
+        memo[id(obj)] = new
+        if isinstance(obj, PyJsArrayBuffer) and id(obj.buff) not in memo:
+            memo[id(obj.buff)] = _copy_memory(obj.buff)
+        new.__dict__.update(fork(obj.__dict__, memo))
+        if isinstance(obj, PyJsTypedArray):
+            new.view = _fork_view(obj, new)
+        return new
+    elif isinstance(obj, dict):
+        new = memo[id(obj)] = {}
+        for k, v in six.iteritems(obj):
+            new[k] = fork(v, memo)
+        return new
+    elif isinstance(obj, list):
+        new = memo[id(obj)] = []
+        new.extend(fork(e, memo) for e in obj)
+        return new
+    elif isinstance(obj, tuple):
+        new = tuple(fork(e, memo) for e in obj)
+        if all(a is b for a, b in zip(obj, new)):
+            new = obj
+        memo[id(obj)] = new
+        return new
+    elif isinstance(obj, types.FunctionType):
+        return _fork_function(obj, memo)
+    elif NUMPY_AVAILABLE and isinstance(obj, numpy.ndarray):
+        new = memo[id(obj)] = obj.copy()
+        return new
+    # other python objects are immutable or belong to the host
+    return obj
+
+
+def _copy_memory(buff):
+    if NUMPY_AVAILABLE and isinstance(buff, numpy.ndarray):
+        return buff.copy()
+    if isinstance(buff, array.array):
+        return array.array(buff.typecode, buff)
+    return copy_bytes(buff, 0, byte_length(buff))
+
+
+def _fork_view(obj, new):
+    '''Returns view of the copied memory of the typed array new (fork of obj)'''
+    buff = new.own['buffer']['value'].buff
+    if obj.view is obj.own['buffer']['value'].buff:
+        return buff
+    return make_view(buff, obj.FORMAT, int(obj.own['byteOffset']['value'].value), obj.length)
+
+
+def _fork_function(func, memo):
+    globals_ = six.get_function_globals(func)
+    new_globals = memo.get(id(globals_), globals_)
+    closure = six.get_function_closure(func)
+    if closure:
+        memo[id(func)] = func  # in case the closure leads back to this function
+        new_closure = []
+        for cell in closure:
+            try:
+                contents = cell.cell_contents
+            except ValueError:  # empty cell
+                new_closure.append(cell)
+                continue
+            new_contents = fork(contents, memo)
+            new_closure.append(cell if new_contents is contents else _make_cell(new_contents))
+        new_closure = tuple(new_closure)
+        if all(a is b for a, b in zip(closure, new_closure)):
+            new_closure = closure
+    else:
+        new_closure = closure
+    if new_globals is globals_ and new_closure is closure and not six.get_function_defaults(func):
+        memo[id(func)] = func
+        return func
+    new = types.FunctionType(six.get_function_code(func), new_globals, func.__name__,
+                             None, new_closure)
+    memo[id(func)] = new
+    # defaults may lead back to this function (scope -> PyJsFunction -> code)
+    defaults = six.get_function_defaults(func)
+    if defaults:
+        new.__defaults__ = fork(defaults, memo)
+    if getattr(func, '__kwdefaults__', None):
+        new.__kwdefaults__ = fork(func.__kwdefaults__, memo)
+    new.__dict__.update(func.__dict__)
+    return new
@@ -19,11 +19,12 @@
 #  OR THE USE OR OTHER DEALINGS IN THE SOFTWARE
 
 __all__ = ['PyJsParser', 'Node', 'WrappingNode', 'node_to_dict', 'parse', 'translate_js', 'translate', 'syntax_tree_translate',
-           'DEFAULT_HEADER']
+           'DEFAULT_HEADER', 'enable_disk_cache', 'disable_disk_cache', 'IncrementalTranslator']
 __author__ = 'Piotr Dabkowski'
-__version__ = '2.2.0'
+__version__ = '2.3.5'
 from pyjsparser import PyJsParser
-from .translator import translate_js, trasnlate, syntax_tree_translate, DEFAULT_HEADER
+from .translator import translate_js, trasnlate, syntax_tree_translate, DEFAULT_HEADER, enable_disk_cache, disable_disk_cache
+from .incremental import IncrementalTranslator
 
 
 def parse(javascript_code):
@@ -0,0 +1,185 @@
+'''Incremental translation of scripts that are edited and run again, for example when hot reloading.
+
+Translated and compiled top level statements are cached by the hash of their source, so only the statements
+that changed since the previous version are parsed, translated and compiled again:
+
+>>> translator = IncrementalTranslator()
+>>> context = js2py.EvalJs()
+>>> context.execute_incremental(bundle, translator)
+>>> context.execute_incremental(edited_bundle, translator)  # only the edited functions are translated
+>>> translator.translated
+1
+
+The parts of the source before the first and after the last difference from the previous version are
+not parsed again, so use one IncrementalTranslator per script.'''
+import hashlib
+import pyjsparser
+from . import translating_nodes
+from .translator import DEFAULT_HEADER, cache_key
+from ..utils.cache import BoundedCache
+
+__all__ = ['IncrementalTranslator']
+
+FILE_NAME = '<EvalJS snippet>'
+
+
+class RangeParser(pyjsparser.PyJsParser):
+    '''Also records the source ranges (start, end) of the top level statements in self.ranges'''
+    def parse(self, code, options={}):
+        self.ranges = []
+        self.depth = 0
+        return pyjsparser.PyJsParser.parse(self, code, options)
+
+    def parseStatementListItem(self):
+        if self.depth:
+            return pyjsparser.PyJsParser.parseStatementListItem(self)
+        start = self.startIndex
+        self.depth += 1
+        try:
+            statement = pyjsparser.PyJsParser.parseStatementListItem(self)
+        finally:
+            self.depth -= 1
+        if statement is not None:
+            self.ranges.append((start, self.lastIndex))
+        return statement
+
+
+def parse_statements(js):
+    '''Returns list of (start, end, tree) of the top level statements of js'''
+    parser = RangeParser()
+    body = parser.parse(js)['body']
+    # the parser appends ' \n ; //END' to the source, the last statement can end inside it
+    return [(start, min(end, len(js)), tree) for (start, end), tree in zip(parser.ranges, body)
+            if start < len(js)]
+
+
+def common_prefix(a, b):
+    n = min(len(a), len(b))
+    lo, hi = 0, n
+    while lo < hi:  # binary search with slice comparisons is much faster than comparing characters in python
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class Part(object):
+    '''Translation of a top level statement'''
+    def __init__(self, registers, definitions, code):
+        self.registers = registers
+        self.definitions = definitions
+        self.code = code
+        self.compiled = None
+
+    def compile(self):
+        if self.compiled is None:
+            self.compiled = (compile(self.definitions, FILE_NAME, 'exec') if self.definitions else None,
+                             compile(self.code, FILE_NAME, 'exec'))
+        return self.compiled
+
+
+class IncrementalTranslator(object):
+    '''Translates successive versions of a script reusing translations of the unchanged top level statements.
+    max_size limits the number of cached statements. After every call translated is the number of
+    statements that had to be translated.'''
+    def __init__(self, max_size=10000):
+        self.cache = BoundedCache(max_size=max_size)
+        self.source = None
+        self.ranges = []
+        self.translated = 0
+
+    def _reparse_changed(self, js):
+        '''Parses only the changed part of js, returns list of (start, end, tree) of the statements
+        with trees set to None for the statements that were not parsed again, or None when it is not possible'''
+        old, ranges = self.source, self.ranges
+        prefix = common_prefix(old, js)
+        suffix = common_suffix(old, js, min(len(old), len(js)) - prefix)
+        delta = len(js) - len(old)
+        # statements before the change are kept, except the last one because the change could continue it
+        head = 0
+        while head < len(ranges) and ranges[head][1] <= prefix:
+            head += 1
+        head = max(head - 1, 0)
+        # and so are the statements after the change, the first one is parsed again to check that
+        # the changed part ends before it
+        tail = len(ranges)
+        while tail > head and ranges[tail - 1][0] >= len(old) - suffix:
+            tail -= 1
+        start = ranges[head][0] if head else 0
+        if tail < len(ranges):
+            check = ranges[tail][0] + delta
+            end = ranges[tail][1] + delta
+            tail += 1
+        else:
+            check = None
+            end = len(js)
+        try:
+            changed = parse_statements(js[start:end])
+        except Exception:
+            return None
+        if check is not None and (not changed or changed[-1][0] + start != check):
+            return None
+        return ([(s, e, None) for s, e in ranges[:head]] +
+                [(s + start, e + start, tree) for s, e, tree in changed] +
+                [(s + delta, e + delta, None) for s, e in ranges[tail:]])
+
+    def parts(self, js):
+        '''Returns list of Parts of the top level statements of js'''
+        statements = None
+        if self.source is not None:
+            statements = self._reparse_changed(js)
+        if statements is None:
+            statements = parse_statements(js)
+        self.source = js
+        self.ranges = [(start, end) for start, end, _ in statements]
+        self.translated = 0
+        occurrences = {}
+        parts = []
+        for start, end, tree in statements:
+            source = js[start:end]
+            digest = hashlib.md5(source.encode('utf-8')).hexdigest()[:16]
+            # the same statement can be repeated, every occurrence needs its own names
+            n = occurrences[digest] = occurrences.get(digest, -1) + 1
+            key = '%s_%d' % (digest, n)
+            part = self.cache.get(cache_key(key))
+            if part is None:
+                trees = [tree] if tree is not None else [e for _, _, e in parse_statements(source)]
+                translator = translating_nodes.Translator(key, key + '_')
+                part = Part(*translator.translate_part(trees))
+                self.cache.put(cache_key(key), part)
+                self.translated += 1
+            parts.append(part)
+        return parts
+
+    def translate(self, js, HEADER=DEFAULT_HEADER):
+        '''Returns python code of js, like translate_js'''
+        parts = self.parts(js)
+        return (HEADER + self._registers(parts) + ''.join(p.definitions for p in parts) +
+                ''.join(p.code for p in parts))
+
+    def compile(self, js):
+        '''Returns list of code objects that run js when they are executed in order in the EvalJs context'''
+        parts = self.parts(js)
+        compiled = [p.compile() for p in parts]
+        return ([compile(self._registers(parts), FILE_NAME, 'exec')] +
+                [definitions for definitions, _ in compiled if definitions is not None] +
+                [code for _, code in compiled])
+
+    def _registers(self, parts):
+        names = set()
+        for p in parts:
+            names.update(p.registers)
+        return 'var.registers([%s])\n' % ', '.join(repr(e) for e in sorted(names))
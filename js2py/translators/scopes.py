@@ -0,0 +1,305 @@
+'''Static analysis of the variables of JS functions.
+
+Variables are normally kept in the Scope of the function (var.get / var.put in the translated code).
+Variables declared by a function (parameters and var declarations) are compiled to python locals
+instead, unless:
+ - eval is used in the function or in a function nested in it, eval code can access any variable
+ - the variable is assigned inside of an expression (python 2 has no assignment expressions)
+ - a nested function assigns it (python 2 has no nonlocal), nested functions that only read it
+   use the python closure
+ - it is deleted, declared also as a function or it is the name of the function expression itself
+ - the function declares its own arguments variable
+
+Python locals that are always numbers hold unboxed python floats (see FunctionInfo.numbers), arithmetic
+on them is done directly on floats and the result is boxed only when it leaves the function or goes
+to a place that needs a JS value.
+'''
+import six
+from .friendly_nodes import is_valid_py_name, to_hex
+
+FUNCTIONS = ('FunctionDeclaration', 'FunctionExpression')
+# operators that always return a number
+NUMBER_OPERATORS = ('-', '*', '/', '%', '<<', '>>', '>>>', '&', '|', '^')
+
+
+def is_number_literal(node):
+    return (node['type'] == 'Literal' and isinstance(node['value'], (float,) + six.integer_types)
+            and not isinstance(node['value'], bool))
+
+
+def is_number(node, typed):
+    '''Whether the expression always evaluates to a number, typed(name) tells whether the variable is always a number'''
+    typ = node['type']
+    if typ == 'Literal':
+        return is_number_literal(node)
+    elif typ == 'Identifier':
+        return typed(node['name'])
+    elif typ == 'UnaryExpression':
+        return node['operator'] in ('-', '+', '~')
+    elif typ == 'UpdateExpression':
+        return True
+    elif typ == 'BinaryExpression':
+        return node['operator'] in NUMBER_OPERATORS or (
+            node['operator'] == '+' and is_number(node['left'], typed) and is_number(node['right'], typed))
+    elif typ == 'AssignmentExpression':
+        return node['operator'][:-1] in NUMBER_OPERATORS or (
+            node['operator'] == '=' and is_number(node['right'], typed))
+    elif typ == 'ConditionalExpression':
+        return is_number(node['consequent'], typed) and is_number(node['alternate'], typed)
+    elif typ == 'SequenceExpression':
+        return is_number(node['expressions'][-1], typed)
+    return False
+
+
+def is_pure(node, typed):
+    '''Whether the expression is only unboxed arithmetic of literals and number variables (has no side effects)'''
+    typ = node['type']
+    if typ == 'Literal':
+        return is_number_literal(node)
+    elif typ == 'Identifier':
+        return typed(node['name'])
+    elif typ == 'UnaryExpression':
+        return node['operator'] in ('-', '+') and is_pure(node['argument'], typed)
+    elif typ == 'BinaryExpression':
+        return (node['operator'] in ('+', '-', '*', '/', '%') and is_pure(node['left'], typed)
+                and is_pure(node['right'], typed))
+    return False
+
+
+def dominates(definition, read):
+    '''Whether the statement at the definition path always runs before the read. That is when the read
+    is in a later statement of the same block (or in a block nested in it).'''
+    n = len(definition) - 1
+    if len(read) <= n or read[:n] != definition[:n]:
+        return False
+    return read[n][0] == definition[n][0] and read[n][1] > definition[n][1]
+
+
+def local_name(name):
+    '''Python name of the local variable, prefixed so it can't hide names used by the translated code'''
+    py_name = 'PyJsVar_%s_' % name
+    # for example $, python 2 names are ascii only
+    return py_name if is_valid_py_name(py_name) else 'PyJsVarHex_%s_' % to_hex(name)
+
+
+class FunctionInfo(object):
+    '''Walks the body of a function and finds out which of its variables can be python locals'''
+    def __init__(self, params, body, name=None):
+        self.params = [p['name'] for p in params]
+        self.name = name
+        self.vars = set()
+        self.functions = set()
+        self.dynamic = set()  # must stay in the Scope
+        self.uses_eval = False
+        self.needs_scope = False  # catch clauses and pyimport put their variables directly to the Scope
+        # for numbers: assigned values, paths of the assignments that can define the variable and of
+        # the reads. Path is a tuple of (block id, index of the statement in the block), the index is
+        # minus 0.5 inside of the init of a for loop
+        self.values = {}
+        self.definitions = {}
+        self.reads = {}
+        self.nested_reads = set()
+        self.catch_names = set()
+        self.path = ()
+        self.blocks = 0
+        self.visit_block(body['body'], False)
+
+    def declared(self):
+        '''Names bound by the function'''
+        names = set(self.params) | self.vars | self.functions
+        names.add('arguments')
+        if self.name:
+            names.add(self.name)
+        return names
+
+    def locals(self):
+        '''Returns dict mapping the names of the variables that can be python locals to python names'''
+        names = set(self.params) | self.vars
+        if self.uses_eval or 'arguments' in names or 'arguments' in self.functions:
+            return {}
+        names -= self.functions | self.dynamic
+        names.discard(self.name)
+        res = dict((name, local_name(name)) for name in names)
+        if 'arguments' not in self.dynamic:
+            res['arguments'] = 'arguments'
+        return res
+
+    def uses_arguments(self):
+        '''Whether the function needs its arguments object, functions that don't use it get None instead'''
+        if 'arguments' in self.params:
+            return False
+        return bool(self.uses_eval or 'arguments' in self.reads or 'arguments' in self.values
+                    or 'arguments' in self.dynamic or 'arguments' in self.vars or 'arguments' in self.functions)
+
+    def numbers(self, locals):
+        '''Returns set of the names of the python locals that are always numbers. They must be assigned
+        at the top level of the function before they are read and they can't be read by nested functions.'''
+        typed = set(name for name in locals if name not in self.params and name != 'arguments'
+                    and name not in self.catch_names and name not in self.nested_reads
+                    and any(all(dominates(d, r) for r in self.reads.get(name, ()))
+                            for d in self.definitions.get(name, ())))
+        changed = True
+        while changed:
+            changed = False
+            for name in list(typed):
+                for operator, value in self.values.get(name, ()):
+                    if operator in ('=', '+='):
+                        number = is_number(value, typed.__contains__)
+                    else:
+                        number = operator[:-1] in NUMBER_OPERATORS or operator in ('++', '--')
+                    if not number:
+                        typed.discard(name)
+                        changed = True
+                        break
+        return typed
+
+    def visit_block(self, statements, nested):
+        '''Statements of the function body or of a block, they are executed in order'''
+        if nested:
+            self.visit(statements, nested)
+            return
+        outer = self.path
+        self.blocks += 1
+        block = self.blocks
+        for n, statement in enumerate(statements):
+            self.path = outer + ((block, n),)
+            self.define(statement)
+            if statement['type'] == 'ForStatement' and statement['init'] is not None:
+                self.path = outer + ((block, n - 0.5),)
+                if statement['init']['type'] == 'VariableDeclaration':
+                    self.visit(statement['init'], False)
+                else:
+                    self.visit_statement_expression(statement['init'], False)
+                self.path = outer + ((block, n),)
+                self.visit(dict(statement, init=None), False)
+            else:
+                self.visit(statement, False)
+        self.path = outer
+
+    def define(self, statement):
+        '''Remembers the paths of the variables assigned by the statement of a block'''
+        typ = statement['type']
+        path = self.path
+        if typ == 'ForStatement' and statement['init'] is not None:
+            block, n = path[-1]
+            statement, path = statement['init'], path[:-1] + ((block, n - 0.5),)
+            typ = 'VariableDeclaration' if statement['type'] == 'VariableDeclaration' else 'Expression'
+        if typ == 'VariableDeclaration':
+            names = [d['id']['name'] for d in statement['declarations'] if d['init'] is not None]
+        elif typ in ('ExpressionStatement', 'Expression'):
+            expression = statement['expression'] if typ == 'ExpressionStatement' else statement
+            expressions = expression['expressions'] if expression['type'] == 'SequenceExpression' else [expression]
+            names = [e['left']['name'] for e in expressions if e['type'] == 'AssignmentExpression'
+                     and e['operator'] == '=' and e['left']['type'] == 'Identifier']
+        else:
+            names = []
+        for name in names:
+            self.definitions.setdefault(name, []).append(path)
+
+    def read(self, name, nested):
+        if nested:
+            self.nested_reads.add(name)
+        else:
+            self.reads.setdefault(name, []).append(self.path)
+
+    def write(self, name, nested, statement, operator='=', value=None):
+        if nested or not statement:
+            self.dynamic.add(name)
+        self.values.setdefault(name, []).append((operator, value))
+        if operator != '=':  # compound assignments and updates also read the variable
+            self.read(name, nested)
+
+    def visit_statement_expression(self, node, nested):
+        '''Expression of the expression statement (or of the for loop init or update), assignments
+        to identifiers at its top level are translated as python assignments'''
+        typ = node['type']
+        if typ == 'AssignmentExpression' and node['left']['type'] == 'Identifier':
+            self.visit(node['right'], nested)
+            self.write(node['left']['name'], nested, True, node['operator'], node['right'])
+        elif typ == 'UpdateExpression' and node['argument']['type'] == 'Identifier':
+            self.write(node['argument']['name'], nested, True, node['operator'])
+        elif typ == 'SequenceExpression':
+            for e in node['expressions']:
+                self.visit_statement_expression(e, nested)
+        else:
+            self.visit(node, nested)
+
+    def visit(self, node, nested):
+        if isinstance(node, list):
+            for e in node:
+                self.visit(e, nested)
+            return
+        if not isinstance(node, dict) or 'type' not in node:
+            return
+        typ = node['type']
+        if typ in FUNCTIONS:
+            if typ == 'FunctionDeclaration' and not nested and node['id']:
+                self.functions.add(node['id']['name'])
+            self.visit(node['body'], True)
+        elif typ == 'BlockStatement':
+            self.visit_block(node['body'], nested)
+        elif typ == 'Identifier':
+            if node['name'] == 'eval':
+                self.uses_eval = True
+            self.read(node['name'], nested)
+        elif typ == 'VariableDeclarator':
+            # declarations in nested functions declare their own variables
+            if not nested:
+                self.vars.add(node['id']['name'])
+            if node['init'] is not None:
+                self.visit(node['init'], nested)
+                if not nested:
+                    self.values.setdefault(node['id']['name'], []).append(('=', node['init']))
+        elif typ == 'ExpressionStatement':
+            self.visit_statement_expression(node['expression'], nested)
+        elif typ == 'ForStatement':
+            init = node['init']
+            if init is not None:
+                if init['type'] == 'VariableDeclaration':
+                    self.visit(init, nested)
+                else:
+                    self.visit_statement_expression(init, nested)
+            self.visit(node['test'], nested)
+            if node['update'] is not None:
+                self.visit_statement_expression(node['update'], nested)
+            self.visit(node['body'], nested)
+        elif typ == 'ForInStatement':
+            if node['left']['type'] == 'Identifier':
+                self.write(node['left']['name'], nested, True, 'in')
+            else:
+                left = node['left']['declarations'][0]['id']['name']
+                self.visit(node['left'], nested)
+                if not nested:
+                    self.values.setdefault(left, []).append(('in', None))
+            self.visit(node['right'], nested)
+            self.visit(node['body'], nested)
+        elif typ == 'AssignmentExpression':
+            self.visit(node['right'], nested)
+            if node['left']['type'] == 'Identifier':
+                self.write(node['left']['name'], nested, False, node['operator'], node['right'])
+            else:
+                self.visit(node['left'], nested)
+        elif typ == 'UpdateExpression':
+            if node['argument']['type'] == 'Identifier':
+                self.write(node['argument']['name'], nested, False, node['operator'])
+            else:
+                self.visit(node['argument'], nested)
+        elif typ == 'UnaryExpression' and node['operator'] == 'delete' and node['argument']['type'] == 'Identifier':
+            self.dynamic.add(node['argument']['name'])
+        elif typ == 'MemberExpression' and not node['computed']:
+            self.visit(node['object'], nested)
+        elif typ == 'Property':
+            self.visit(node['value'], nested)
+        elif typ in ('LabeledStatement', 'BreakStatement', 'ContinueStatement'):
+            self.visit(node.get('body'), nested)
+        elif typ == 'CatchClause':
+            self.needs_scope = self.needs_scope or not nested
+            self.catch_names.add(node['param']['name'])
+            self.visit(node['body'], nested)
+        elif typ == 'PyimportStatement':
+            self.needs_scope = self.needs_scope or not nested
+            self.dynamic.add(node['imp']['name'])
+        else:
+            for value in six.itervalues(node):
+                if isinstance(value, (dict, list)):
+                    self.visit(value, nested)
@@ -1,7 +1,9 @@
 from __future__ import unicode_literals
 from pyjsparser.pyjsparserdata import *
 from .friendly_nodes import *
+from .scopes import FunctionInfo, is_number, is_number_literal, is_pure
 import random
+import threading
 import six
 
 if six.PY3:
@@ -13,6 +15,15 @@ if six.PY3:
 # set it to smaller value only if you have problems with parser stack overflow
 LINE_LEN_LIMIT = 400   #  200  # or any other value - the larger the smaller probability of errors :)
 
+# every loop reads once whether any ExecutionLimits are active, then the first statement of its body counts
+# the step only if they are (function calls are counted by PyJsFunction)
+LOOP_START = 'PyJsLimited = PyJsLimits.enabled\n'
+LOOP_CHECK = 'if PyJsLimited: PyJsCheckLimits()\n'
+# unboxed arithmetic on python floats, see float_code
+NUMBER_FAST_PATHS = True
+# name of the arguments parameter of the functions that don't use it, PyJsFunction.call passes None to them
+UNUSED_ARGUMENTS = 'PyJsUnusedArguments'
+
 class ForController:
     def __init__(self):
         self.inside = [False]
@@ -38,9 +49,15 @@ class ForController:
 
 class InlineStack:
     NAME = 'PyJs_%s_%d_'
-    def __init__(self):
+    # inline caches (see PropertyCache in base.py) are global so the tag should be unique for every program
+    CACHE_NAME = 'PyJsIC_%s_%d_'
+    def __init__(self, cache_tag='0', name_tag=''):
         self.reps = {}
         self.names = []
+        self.cache_tag = cache_tag
+        # prefix of the inline names, parts translated separately need different ones (see Translator.translate_part)
+        self.name_tag = name_tag
+        self.caches = []
 
     def inject_inlines(self, source):
         for lval in self.names: # first in first out! Its important by the way
@@ -48,16 +65,25 @@ class InlineStack:
         return source
 
     def require(self, typ):
-        name = self.NAME % (typ, len(self.names))
+        name = self.NAME % (self.name_tag + typ, len(self.names))
         self.names.append(name)
         return name
 
     def define(self, name, val):
         self.reps[name] = val
 
+    def require_cache(self):
+        name = self.CACHE_NAME % (self.cache_tag, len(self.caches))
+        self.caches.append(name)
+        return name
+
+    def get_caches_code(self):
+        return ''.join('%s = PropertyCache()\n' % name for name in self.caches)
+
     def reset(self):
         self.rel = {}
         self.names = []
+        self.caches = []
 
 
 class ContextStack:
@@ -77,17 +103,78 @@ class ContextStack:
         self.register(name)
 
     def get_code(self):
-        code = 'var.registers([%s])\n' % ', '.join(repr(e) for e in self.to_register)
+        code = 'var.registers([%s])\n' % ', '.join(repr(e) for e in self.to_register) if self.to_register else ''
         for name, func_code in six.iteritems(self.to_define):
             code += func_code
         return code
 
 
 
-def clean_stacks():
-    global Context, inline_stack
-    Context = ContextStack()
-    inline_stack = InlineStack()
+class Translator:
+    '''State of one translation. Every translation uses its own Translator so many threads
+    can translate at the same time, the nodes below get it with current().'''
+    def __init__(self, cache_tag='0', name_tag=''):
+        self.context = ContextStack()
+        self.inline_stack = InlineStack(cache_tag, name_tag)
+        # (declared names, python locals, unboxed numbers) of the functions (and catch clauses) being
+        # translated, see scopes.py
+        self.scopes = []
+
+    def resolve(self, name):
+        '''Returns python name of the variable if it is a python local, None if it is in a Scope'''
+        for declared, locals, numbers in reversed(self.scopes):
+            if name in locals:
+                return locals[name]
+            if name in declared:
+                return None
+        return None
+
+    def is_number_variable(self, name):
+        '''Whether the variable is a python local holding an unboxed number (python float)'''
+        for declared, locals, numbers in reversed(self.scopes):
+            if name in locals:
+                return name in numbers
+            if name in declared:
+                return False
+        return False
+
+    def translate(self, tree):
+        previous = getattr(_local, 'translator', None)
+        _local.translator = self
+        try:
+            return trans(tree)
+        finally:
+            _local.translator = previous
+
+    def translate_part(self, statements):
+        '''Translates top level statements like Program does, but returns (names to register, hoisted
+        definitions, code) separately so that parts translated on their own can be joined later (see
+        incremental.py). Definitions also create the inline caches. Parts must use unique name_tag.'''
+        code = ''.join(self.translate(e) for e in statements)
+        definitions = ''.join(six.itervalues(self.context.to_define))
+        inline_stack = self.inline_stack
+        for lval in inline_stack.names:  # same order as in inject_inlines
+            if lval in definitions:
+                definitions = inject_before_lval(definitions, lval, inline_stack.reps[lval])
+            else:
+                code = inject_before_lval(code, lval, inline_stack.reps[lval])
+        return list(self.context.to_register), inline_stack.get_caches_code() + definitions, code
+
+
+_local = threading.local()
+
+
+def current():
+    '''Returns the Translator of the translation running in this thread'''
+    translator = getattr(_local, 'translator', None)
+    if translator is None:
+        translator = _local.translator = Translator()
+    return translator
+
+
+def clean_stacks(cache_tag='0'):
+    '''Starts a new translation in this thread, only needed when calling trans directly'''
+    _local.translator = Translator(cache_tag)
 
 
 
@@ -128,6 +215,7 @@ def limited(func):
       If expression longer than LINE_LEN_LIMIT characters then it will be moved to upper line
      USE ONLY ON EXPRESSIONS!!! '''
     def f(standard=False, **args):
+        inline_stack = current().inline_stack
         insert_pos = len(inline_stack.names)  # in case line is longer than limit we will have to insert the lval at current position
                                               # this is because calling func will change inline_stack.
                                               # we cant use inline_stack.require here because we dont know whether line overflows yet
@@ -165,23 +253,28 @@ def Literal(type, value, raw, regex=None):
     return 'Js(%s)' % repr(value) if value!=inf else 'Js(float("inf"))'
 
 def Identifier(type, name):
+    translator = current()
+    local = translator.resolve(name)
+    if local is not None:
+        if translator.is_number_variable(name):
+            return 'PyJsFloat(%s)' % local
+        return local
     return 'var.get(%s)' % repr(name)
 
 @limited
 def MemberExpression(type, computed, object, property):
     far_left = trans(object)
-    if computed:  # obj[prop] type accessor
-        # may be literal which is the same in every case so we can save some time on conversion
-        if property['type'] == 'Literal':
-            prop = repr(to_key(property))
-        else: # worst case
-            prop = trans(property)
-    else: # always the same since not computed (obj.prop accessor)
-        prop = repr(to_key(property))
-    return far_left + '.get(%s)' % prop
+    if computed and property['type'] != 'Literal': # obj[prop] type accessor, worst case
+        return far_left + '.get(%s)' % trans(property)
+    # the key is always the same (obj.prop or obj['prop']) so the lookup can be cached
+    prop = repr(to_key(property))
+    return current().inline_stack.require_cache() + '.get(%s, %s)' % (far_left, prop)
 
 
 def ThisExpression(type):
+    # inside of functions this is always the python argument
+    if current().scopes:
+        return 'this'
     return 'var.get(u"this")'
 
 @limited
@@ -189,16 +282,13 @@ def CallExpression(type, callee, arguments):
     arguments = [trans(e) for e in arguments]
     if callee['type']=='MemberExpression':
         far_left = trans(callee['object'])
-        if callee['computed']:  # obj[prop] type accessor
-            # may be literal which is the same in every case so we can save some time on conversion
-            if callee['property']['type'] == 'Literal':
-                prop = repr(to_key(callee['property']))
-            else: # worst case
-                prop = trans(callee['property'])  # its not a string literal! so no repr
-        else: # always the same since not computed (obj.prop accessor)
-            prop = repr(to_key(callee['property']))
-        arguments.insert(0, prop)
-        return far_left + '.callprop(%s)' % ', '.join(arguments)
+        if callee['computed'] and callee['property']['type'] != 'Literal':  # obj[prop] type accessor, worst case
+            prop = trans(callee['property'])  # its not a string literal! so no repr
+            arguments.insert(0, prop)
+            return far_left + '.callprop(%s)' % ', '.join(arguments)
+        # always the same key (obj.prop or obj['prop']) so the lookup can be cached
+        arguments[0:0] = [far_left, repr(to_key(callee['property']))]
+        return current().inline_stack.require_cache() + '.callprop(%s)' % ', '.join(arguments)
     else: # standard call
         return trans(callee) + '(%s)' % ', '.join(arguments)
 
@@ -215,6 +305,7 @@ def ArrayExpression(type, elements):  # todo fix null inside problem
 # ========== OBJECTS =============
 
 def ObjectExpression(type, properties):
+    inline_stack = current().inline_stack
     name = inline_stack.require('Object')
     elems = []
     after = ''
@@ -250,6 +341,8 @@ def Property(type, kind, key, computed, value, method, shorthand):
 
 @limited
 def UnaryExpression(type, operator, argument, prefix):
+    if NUMBER_FAST_PATHS and operator in ('-', '+') and is_number(argument, current().is_number_variable):
+        return 'PyJsFloat(%s)' % float_code({'type': type, 'operator': operator, 'argument': argument})
     a = trans(argument, standard=True) # unary involve some complex operations so we cant use line shorteners here
     if operator=='delete':
         if argument['type'] in ('Identifier', 'MemberExpression'):
@@ -262,6 +355,15 @@ def UnaryExpression(type, operator, argument, prefix):
 
 @limited
 def BinaryExpression(type, operator, left, right):
+    node = {'type': type, 'operator': operator, 'left': left, 'right': right}
+    if operator in COMPARISONS:
+        code = compare_code(node)
+        if code is not None:
+            return 'Js(%s)' % code
+    else:
+        code = arithmetic_code(node)
+        if code is not None:
+            return 'PyJsFloat(%s)' % code
     a = trans(left)
     b = trans(right)
     # delegate to our friends
@@ -307,7 +409,96 @@ def NewExpression(type, callee, arguments):
 
 @limited
 def ConditionalExpression(type, test, consequent, alternate): # caused plenty of problems in my home-made translator :)
-    return '(%s if %s else %s)' % (trans(consequent), trans(test), trans(alternate))
+    return '(%s if %s else %s)' % (trans(consequent), test_code(test), trans(alternate))
+
+
+
+# ========== UNBOXED NUMBERS ============
+# Expressions that are numbers (see scopes.py) are evaluated on python floats when at least one
+# of the operands is known to be a number, values that are not numbers are converted with to_number.
+# PyJsFloat boxes the result when a JS value is needed.
+
+ARITHMETIC = ('+', '-', '*', '/', '%')
+COMPARISONS = {'<': '<', '<=': '<=', '>': '>', '>=': '>=', '==': '==', '!=': '!=', '===': '==', '!==': '!='}
+
+
+def float_code(node):
+    '''Python code evaluating node to python float (ToNumber of its value)'''
+    translator = current()
+    typ = node['type']
+    if is_number_literal(node):
+        value = float(node['value'])
+        return repr(value) if value != inf else 'float("inf")'
+    elif typ == 'Identifier' and translator.is_number_variable(node['name']):
+        return translator.resolve(node['name'])
+    elif typ == 'UnaryExpression' and node['operator'] in ('-', '+'):
+        code = float_code(node['argument'])
+        return '(-%s)' % code if node['operator'] == '-' else code
+    elif typ == 'BinaryExpression':
+        code = arithmetic_code(node)
+        if code is not None:
+            return code
+    elif typ == 'ConditionalExpression' and is_number(node, translator.is_number_variable):
+        return '(%s if %s else %s)' % (float_code(node['consequent']), test_code(node['test']),
+                                       float_code(node['alternate']))
+    # bitwise operators and Js() of integers give python ints
+    if is_number(node, translator.is_number_variable):
+        return 'float(%s.value)' % trans(node)
+    return 'float(%s.to_number().value)' % trans(node)
+
+
+def float_operands(left, right, both):
+    '''Returns float_code of both operands if one of them (or both) is a number, None otherwise'''
+    if not NUMBER_FAST_PATHS:
+        return None
+    typed = current().is_number_variable
+    left_number, right_number = is_number(left, typed), is_number(right, typed)
+    if not (left_number and right_number if both else left_number or right_number):
+        return None
+    # JS converts the operands after evaluating both of them, left one is converted first here
+    if not left_number and not is_pure(right, typed):
+        return None
+    return float_code(left), float_code(right)
+
+
+def arithmetic_code(node):
+    '''Unboxed + - * / % or None if it can't be done (+ must have two numbers, it could concatenate strings)'''
+    operator = node['operator']
+    if operator not in ARITHMETIC:
+        return None
+    operands = float_operands(node['left'], node['right'], operator == '+')
+    if operands is None:
+        return None
+    if operator == '/':
+        return 'PyJsDiv(%s, %s)' % operands
+    elif operator == '%':
+        return 'PyJsMod(%s, %s)' % operands
+    return '(%s%s%s)' % (operands[0], operator, operands[1])
+
+
+def compare_code(node):
+    '''Unboxed comparison (python bool) or None. Equality needs two numbers, relational comparison with a number
+    is always numeric'''
+    operator = node['operator']
+    operands = float_operands(node['left'], node['right'], operator not in ('<', '<=', '>', '>='))
+    if operands is None:
+        return None
+    return '(%s%s%s)' % (operands[0], COMPARISONS[operator], operands[1])
+
+
+def test_code(node):
+    '''Translates node evaluated as a condition, result can be python bool or JS value'''
+    typ = node['type']
+    if typ == 'BinaryExpression' and node['operator'] in COMPARISONS:
+        code = compare_code(node)
+        if code is not None:
+            return code
+    elif typ == 'LogicalExpression':
+        return '(%s %s %s)' % (test_code(node['left']), 'and' if node['operator'] == '&&' else 'or',
+                               test_code(node['right']))
+    elif typ == 'UnaryExpression' and node['operator'] == '!':
+        return '(not %s)' % test_code(node['argument'])
+    return trans(node)
 
 
 
@@ -319,6 +510,35 @@ def BlockStatement(type, body):
 
 
 def ExpressionStatement(type, expression):
+    return statement_expression(expression)
+
+
+def statement_expression(expression):
+    '''Translates expression evaluated as a statement, top level assignments to python locals
+    are translated to python assignments (the value of the expression is not needed)'''
+    if expression['type'] == 'SequenceExpression':
+        return ''.join(statement_expression(e) for e in expression['expressions'])
+    translator = current()
+    if expression['type'] == 'AssignmentExpression' and expression['left']['type'] == 'Identifier':
+        name = expression['left']['name']
+        local = translator.resolve(name)
+        if local is not None:
+            operator = expression['operator'][:-1]
+            if translator.is_number_variable(name):
+                value = expression['right']
+                if operator:
+                    value = {'type': 'BinaryExpression', 'operator': operator, 'left': expression['left'], 'right': value}
+                return '%s = %s\n' % (local, float_code(value))
+            value = trans(expression['right'])
+            return '%s = %s\n' % (local, BINARY[operator](local, value) if operator else value)
+    elif expression['type'] == 'UpdateExpression' and expression['argument']['type'] == 'Identifier':
+        name = expression['argument']['name']
+        local = translator.resolve(name)
+        if local is not None:
+            sign = '+' if expression['operator'] == '++' else '-'
+            if translator.is_number_variable(name):
+                return '%s = (%s%s1.0)\n' % (local, local, sign)
+            return '%s = Js(%s.to_number())%sJs(1)\n' % (local, local, sign)
     return trans(expression) + '\n'  # end expression space with new line
 
 
@@ -348,29 +568,33 @@ def DebuggerStatement(type):
 
 
 def DoWhileStatement(type, body, test):
-    inside = trans(body) + 'if not %s:\n' % trans(test) + indent('break\n')
-    result = 'while 1:\n' + indent(inside)
+    inside = LOOP_CHECK + trans(body) + 'if not %s:\n' % test_code(test) + indent('break\n')
+    result = LOOP_START + 'while 1:\n' + indent(inside)
     return result
 
 
 
 def ForStatement(type, init, test, update, body):
-    update = indent(trans(update)) if update else ''
-    init = trans(init)  if init else ''
+    update = statement_expression(update) if update else ''
+    if init:
+        init = trans(init) if init['type'] == 'VariableDeclaration' else statement_expression(init)
+    else:
+        init = ''
     if not init.endswith('\n'):
         init += '\n'
-    test = trans(test) if test else '1'
+    init += LOOP_START
+    test = test_code(test) if test else '1'
     if not update:
-        result = '#for JS loop\n%swhile %s:\n%s%s\n' % (init, test, indent(trans(body)), update)
+        result = '#for JS loop\n%swhile %s:\n%s\n' % (init, test, indent(LOOP_CHECK + trans(body)))
     else:
         result = '#for JS loop\n%swhile %s:\n' % (init, test)
-        body = 'try:\n%sfinally:\n    %s\n' % (indent(trans(body)), update)
+        body = LOOP_CHECK + 'try:\n%sfinally:\n%s\n' % (indent(trans(body)), indent(update))
         result += indent(body)
     return result
 
 
 def ForInStatement(type, left, right, body, each):
-    res =  'for PyJsTemp in %s:\n' % trans(right)
+    res = LOOP_START + 'for PyJsTemp in %s:\n' % trans(right)
     if left['type']=="VariableDeclaration":
         addon = trans(left) # make sure variable is registered
         if addon != 'pass\n':
@@ -384,13 +608,15 @@ def ForInStatement(type, left, right, body, each):
         name = left['name']
     else:
         raise RuntimeError('Unusual ForIn loop')
-    res += indent('var.put(%s, PyJsTemp)\n' % repr(name) + trans(body))
+    local = current().resolve(name)
+    put = '%s = PyJsTemp\n' % local if local is not None else 'var.put(%s, PyJsTemp)\n' % repr(name)
+    res += indent(LOOP_CHECK + put + trans(body))
     return res
 
 
 def IfStatement(type, test, consequent, alternate):
     # NOTE we cannot do elif because function definition inside elif statement would not be possible!
-    IF = 'if %s:\n' % trans(test)
+    IF = 'if %s:\n' % test_code(test)
     IF += indent(trans(consequent))
     if not alternate:
         return IF
@@ -402,16 +628,20 @@ def LabeledStatement(type, label, body):
     # todo consider using smarter approach!
     inside = trans(body)
     defs = ''
+    start = ''
+    if inside.startswith(LOOP_START):
+        start, inside = LOOP_START, inside[len(LOOP_START):]
     if inside.startswith('while ') or inside.startswith('for ') or inside.startswith('#for'):
         # we have to add contine label as well...
-        # 3 or 1 since #for loop type has more lines before real for.
-        sep = 1 if not inside.startswith('#for') else 3
+        # #for loop type has more lines (the comment and init) before real for.
         cont_label = get_continue_label(label['name'])
         temp = inside.split('\n')
+        sep = 1 if not inside.startswith('#for') else [n for n, line in enumerate(temp) if line.startswith('while ')][0] + 1
         injected = 'try:\n'+'\n'.join(temp[sep:])
         injected += 'except %s:\n    pass\n'%cont_label
         inside = '\n'.join(temp[:sep])+'\n'+indent(injected)
         defs += 'class %s(Exception): pass\n'%cont_label
+    inside = start + inside
     break_label = get_break_label(label['name'])
     inside = 'try:\n%sexcept %s:\n    pass\n'% (indent(inside), break_label)
     defs += 'class %s(Exception): pass\n'%break_label
@@ -468,9 +698,19 @@ def TryStatement(type, block, handler, handlers, guardedHandlers, finalizer):
         identifier = handler['param']['name']
         holder = 'PyJsHolder_%s_%d'%(to_hex(identifier), random.randrange(1e8))
         identifier = repr(identifier)
+        # exceeded execution limits can't be caught
+        result += 'except PyJsLimitExceeded:\n    raise\n'
         result += 'except PyJsException as PyJsTempException:\n'
         # fill in except ( catch ) block and remember to recover holder variable to its previous state
-        result += indent(TRY_CATCH.replace('HOLDER', holder).replace('NAME', identifier).replace('BLOCK', indent(trans(handler['body']))))
+        scopes = current().scopes
+        # inside of the catch block the name refers to the exception stored in the Scope of the function
+        # (outside of functions it is in the global scope anyway)
+        if scopes:
+            scopes.append((set([handler['param']['name']]), {}, ()))
+        block = trans(handler['body'])
+        if scopes:
+            scopes.pop()
+        result += indent(TRY_CATCH.replace('HOLDER', holder).replace('NAME', identifier).replace('BLOCK', indent(block)))
     # translate finally statement if present
     if finalizer:
         result += 'finally:\n%s' % indent(trans(finalizer))
@@ -483,8 +723,15 @@ def LexicalDeclaration(type, declarations, kind):
 
 def VariableDeclarator(type, id, init):
     name = id['name']
+    translator = current()
+    local = translator.resolve(name)
+    if local is not None:
+        # python locals are initialised at the beginning of the function
+        if not init:
+            return ''
+        return '%s = %s\n' % (local, float_code(init) if translator.is_number_variable(name) else trans(init))
     # register the name if not already registered
-    Context.register(name)
+    translator.context.register(name)
     if init:
         return 'var.put(%s, %s)\n' % (repr(name), trans(init))
     return ''
@@ -496,7 +743,7 @@ def VariableDeclaration(type, declarations, kind):
 
 
 def WhileStatement(type, test, body):
-    result = 'while %s:\n'%trans(test) + indent(trans(body))
+    result = LOOP_START + 'while %s:\n'%test_code(test) + indent(LOOP_CHECK + trans(body))
     return result
 
 
@@ -505,18 +752,55 @@ def WithStatement(type, object, body):
 
 
 def Program(type, body):
+    translator = current()
+    inline_stack = translator.inline_stack
     inline_stack.reset()
     code = ''.join(trans(e) for e in body)
     # here add hoisted elements (register variables and define functions)
-    code = Context.get_code() + code
+    code = translator.context.get_code() + code
     # replace all inline variables
     code = inline_stack.inject_inlines(code)
-    return code
+    # and create the inline caches used by the code
+    return inline_stack.get_caches_code() + code
 
 
 
 # ======== FUNCTIONS ============
 
+def arg_names(vars, locals):
+    '''Python names of the arguments'''
+    used_vars = []
+    for v in vars:
+        if v in locals:
+            used_vars.append(locals[v])
+        elif is_valid_py_name(v):
+            used_vars.append(v)
+        else: # invalid arg in python, for example $, replace with alternatice arg
+            used_vars.append('PyJsArg_%s_' % to_hex(v))
+    return used_vars
+
+
+def function_scope(vars, locals, numbers, context, needs_scope, uses_arguments, self_name={}):
+    '''Returns code at the beginning of the function which initialises python locals and creates
+    the Scope for the other variables. The Scope is not created when there are none. Unboxed numbers
+    are always assigned before they are used so they are not initialised.'''
+    # args are automaticaly registered variables, except of python locals
+    context.to_register.update(vars)
+    context.to_register.difference_update(locals)
+    initialised = sorted(locals[name] for name in locals if name not in vars and name != 'arguments'
+                         and name not in numbers)
+    code = '%s = Js(None)\n' % ' = '.join(initialised) if initialised else ''
+    # transfer names from Py scope to Js scope
+    arg_map = dict((v, py_name) for v, py_name in zip(vars, arg_names(vars, locals)) if v not in locals)
+    arg_map.update(self_name)
+    if 'arguments' not in locals or arg_map or context.to_register or needs_scope:
+        arg_map['this'] = 'this'
+        if uses_arguments:
+            arg_map['arguments'] = 'arguments'
+        code = 'var = Scope({%s}, var)\n' % ', '.join(repr(k)+':'+v for k,v in six.iteritems(arg_map)) + code
+    return code
+
+
 def FunctionDeclaration(type, id, params, defaults, body, generator, expression):
     if generator:
         raise NotImplementedError('Generators not supported')
@@ -528,39 +812,33 @@ def FunctionDeclaration(type, id, params, defaults, body, generator, expression)
     PyName = 'PyJsHoisted_%s_' % JsName
     PyName = PyName if is_valid_py_name(PyName) else 'PyJsHoistedNonPyName'
     # this is quite complicated
-    global Context
-    previous_context = Context
+    translator = current()
+    previous_context = translator.context
     # change context to the context of this function
-    Context = ContextStack()
-    # translate body within current context
+    context = translator.context = ContextStack()
+    # find variables that can be python locals and translate body within current context
+    info = FunctionInfo(params, body)
+    locals = info.locals()
+    numbers = info.numbers(locals) if NUMBER_FAST_PATHS else ()
+    translator.scopes.append((info.declared(), locals, numbers))
     code = trans(body)
+    translator.scopes.pop()
     # get arg names
     vars = [v['name'] for v in params]
-    # args are automaticaly registered variables
-    Context.to_register.update(vars)
-    # add all hoisted elements inside function
-    code = Context.get_code() + code
-    # check whether args are valid python names:
-    used_vars = []
-    for v in vars:
-        if is_valid_py_name(v):
-            used_vars.append(v)
-        else: # invalid arg in python, for example $, replace with alternatice arg
-            used_vars.append('PyJsArg_%s_' % to_hex(v))
     header = '@Js\n'
-    header+= 'def %s(%sthis, arguments, var=var):\n' % (PyName, ', '.join(used_vars) +(', ' if vars else ''))
-    # transfer names from Py scope to Js scope
-    arg_map = dict(zip(vars, used_vars))
-    arg_map.update({'this':'this', 'arguments':'arguments'})
-    arg_conv = 'var = Scope({%s}, var)\n' % ', '.join(repr(k)+':'+v for k,v in six.iteritems(arg_map))
+    header+= 'def %s(%sthis, %s, var=var):\n' % (PyName, ', '.join(arg_names(vars, locals)) +(', ' if vars else ''),
+                                                  'arguments' if info.uses_arguments() else UNUSED_ARGUMENTS)
+    arg_conv = function_scope(vars, locals, numbers, context, info.needs_scope, info.uses_arguments())
+    # add all hoisted elements inside function
+    code = context.get_code() + code
     # and finally set the name of the function to its real name:
     footer = '%s.func_name = %s\n' % (PyName, repr(JsName))
     footer+= 'var.put(%s, %s)\n' % (repr(JsName), PyName)
     whole_code = header + indent(arg_conv+code) + footer
     # restore context
-    Context = previous_context
+    translator.context = previous_context
     # define in upper context
-    Context.define(JsName, whole_code)
+    previous_context.define(JsName, whole_code)
     return 'pass\n'
 
 
@@ -574,52 +852,43 @@ def FunctionExpression(type, id, params, defaults, body, generator, expression):
         ScriptName = 'InlineNonPyName'
     else:
         ScriptName = JsName
-    PyName = inline_stack.require(ScriptName)  # this is unique
+    translator = current()
+    PyName = translator.inline_stack.require(ScriptName)  # this is unique
 
     # again quite complicated
-    global Context
-    previous_context = Context
+    previous_context = translator.context
     # change context to the context of this function
-    Context = ContextStack()
-    # translate body within current context
+    context = translator.context = ContextStack()
+    # find variables that can be python locals and translate body within current context
+    info = FunctionInfo(params, body, id['name'] if id else None)
+    locals = info.locals()
+    numbers = info.numbers(locals) if NUMBER_FAST_PATHS else ()
+    translator.scopes.append((info.declared(), locals, numbers))
     code = trans(body)
+    translator.scopes.pop()
     # get arg names
     vars = [v['name'] for v in params]
-    # args are automaticaly registered variables
-    Context.to_register.update(vars)
-    # add all hoisted elements inside function
-    code = Context.get_code() + code
-    # check whether args are valid python names:
-    used_vars = []
-    for v in vars:
-        if is_valid_py_name(v):
-            used_vars.append(v)
-        else: # invalid arg in python, for example $, replace with alternatice arg
-            used_vars.append('PyJsArg_%s_' % to_hex(v))
     header = '@Js\n'
-    header+= 'def %s(%sthis, arguments, var=var):\n' % (PyName, ', '.join(used_vars) +(', ' if vars else ''))
-    # transfer names from Py scope to Js scope
-    arg_map = dict(zip(vars, used_vars))
-    arg_map.update({'this':'this', 'arguments':'arguments'})
-    if id: # make self available from inside...
-        if id['name'] not in arg_map:
-            arg_map[id['name']] = PyName
-    arg_conv = 'var = Scope({%s}, var)\n' % ', '.join(repr(k)+':'+v for k,v in six.iteritems(arg_map))
+    header+= 'def %s(%sthis, %s, var=var):\n' % (PyName, ', '.join(arg_names(vars, locals)) +(', ' if vars else ''),
+                                                  'arguments' if info.uses_arguments() else UNUSED_ARGUMENTS)
+    # make self available from inside...
+    self_name = {id['name']: PyName} if id and id['name'] not in vars else {}
+    arg_conv = function_scope(vars, locals, numbers, context, info.needs_scope, info.uses_arguments(), self_name)
+    # add all hoisted elements inside function
+    code = context.get_code() + code
     # and finally set the name of the function to its real name:
     footer = '%s._set_name(%s)\n' % (PyName, repr(JsName))
     whole_code = header + indent(arg_conv+code) + footer
     # restore context
-    Context = previous_context
+    translator.context = previous_context
     # define in upper context
-    inline_stack.define(PyName, whole_code)
+    translator.inline_stack.define(PyName, whole_code)
     return PyName
 
 
 LogicalExpression = BinaryExpression
 PostfixExpression = UpdateExpression
 
-clean_stacks()
-
 if __name__=='__main__':
     import codecs
     import time
@@ -1,7 +1,10 @@
 import pyjsparser
 import pyjsparser.parser
 from . import translating_nodes
+from ..utils.disk_cache import DiskCache
+from ..utils.cache import BoundedCache
 
+import binascii
 import hashlib
 import re
 
@@ -33,7 +36,11 @@ CP_STRING_PLACEHOLDER_REVERSE_RE = re.compile(
     CP_STRING_PLACEHOLDER.replace('%i', '([0-9\.]+)')
     )
 
-cache = {}
+# compilation plan hash -> python code, the lock of BoundedCache makes it safe to share between threads
+cache = BoundedCache(max_size=1024)
+
+# persistent translation cache shared between processes, disabled by default. See enable_disk_cache.
+disk_cache = None
 
 # This crap is still needed but I removed it for speed reasons. Have to think ofa  better idea
 # import js2py.pyjs, sys
@@ -57,17 +64,47 @@ def dbg(x):
     """does nothing, legacy dummy function"""
     return ''
 
+def enable_disk_cache(directory):
+    """Stores translated code in the directory so that other processes (and future runs)
+       can skip the translation of the same source. Entries are keyed by the source hash,
+       js2py version and whether pyimport is enabled, so upgrading js2py never serves stale code.
+       Many processes can safely share the same directory. The entries are kept in a js2py-cache-*
+       subdirectory, subdirectories of other js2py versions are removed."""
+    global disk_cache
+    import js2py
+    from . import __version__ as translator_version
+    disk_cache = DiskCache(directory, 'js2py-%s-translator-%s' % (js2py.__version__, translator_version))
+    disk_cache.remove_other_namespaces()
+
+
+def disable_disk_cache():
+    global disk_cache
+    disk_cache = None
+
+
+def cache_key(js):
+    """Key of the translation of js in the caches, it also depends on whether pyimport is enabled"""
+    return (u'pyimport:' if pyjsparser.parser.ENABLE_PYIMPORT else u'nopyimport:') + js
+
+
 def translate_js(js, HEADER=DEFAULT_HEADER, use_compilation_plan=False):
     """js has to be a javascript source code.
        returns equivalent python code."""
     if use_compilation_plan and not '//' in js and not '/*' in js:
         return translate_js_with_compilation_plan(js, HEADER=HEADER)
+    if disk_cache is not None:
+        cached = disk_cache.get(u'py:' + cache_key(js))
+        if cached is not None:
+            return HEADER + cached.decode('utf-8')
     parser = pyjsparser.PyJsParser()
     parsed = parser.parse(js) # js to esprima syntax tree
     # Another way of doing that would be with my auto esprima translation but its much slower and causes import problems:
     # parsed = esprima.parse(js).to_dict()
-    translating_nodes.clean_stacks()
-    return HEADER + translating_nodes.trans(parsed)  # syntax tree to python code
+    translator = translating_nodes.Translator(hashlib.md5(js.encode('utf-8')).hexdigest()[:12])
+    python_code = translator.translate(parsed)  # syntax tree to python code
+    if disk_cache is not None:
+        disk_cache.set(u'py:' + cache_key(js), python_code.encode('utf-8'))
+    return HEADER + python_code
 
 class match_unumerator(object):
     """This class ise used """
@@ -129,20 +166,16 @@ def translate_js_with_compilation_plan(js, HEADER=DEFAULT_HEADER):
 
     match_increaser_str, match_increaser_num, compilation_plan = get_compilation_plan(js)
 
-    cp_hash = hashlib.md5(compilation_plan.encode('utf-8')).digest()
-    try:
-        python_code = cache[cp_hash]['proto_python_code']
-    except:
+    cp_hash = hashlib.md5(cache_key(compilation_plan).encode('utf-8')).digest()
+    python_code = cache.get(cp_hash)
+    if python_code is None:
         parser = pyjsparser.PyJsParser()
         parsed = parser.parse(compilation_plan) # js to esprima syntax tree
         # Another way of doing that would be with my auto esprima translation but its much slower and causes import problems:
         # parsed = esprima.parse(js).to_dict()
-        translating_nodes.clean_stacks()
-        python_code = translating_nodes.trans(parsed)  # syntax tree to python code
-        cache[cp_hash] = {
-            'compilation_plan': compilation_plan,
-            'proto_python_code': python_code,
-        }
+        translator = translating_nodes.Translator(binascii.hexlify(cp_hash[:6]).decode('ascii'))
+        python_code = translator.translate(parsed)  # syntax tree to python code
+        cache.put(cp_hash, python_code)
 
     python_code = match_increaser_str.wrap_up(python_code)
     python_code = match_increaser_num.wrap_up(python_code)
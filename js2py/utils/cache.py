@@ -0,0 +1,147 @@
+'''Bounded in-memory cache with LRU or LFU eviction and hit/miss statistics.'''
+import threading
+from collections import OrderedDict, namedtuple
+
+__all__ = ['BoundedCache', 'CacheInfo']
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'size', 'bytes', 'max_size', 'max_bytes'])
+
+MISSING = object()
+
+
+class BoundedCache(object):
+    '''Dict-like cache limited by the number of entries and (optionally) their total byte size.
+
+    policy is either 'lru' (evicts least recently used entry) or 'lfu' (evicts least frequently used
+    entry, ties are broken by age). sizeof is a function returning the byte size of a value,
+    it is only used when max_bytes is set. max_size=None means no limit on the number of entries,
+    max_size=0 disables the cache.
+
+    All operations are guarded by a lock so one cache can be shared by many EvalJs instances and threads.
+
+    >>> c = BoundedCache(max_size=2)
+    >>> c.put('a', 1); c.put('b', 2); c.get('a'); c.put('c', 3)
+    1
+    >>> c.get('b') is None
+    True
+    '''
+    POLICIES = ('lru', 'lfu')
+
+    def __init__(self, max_size=1024, max_bytes=None, policy='lru', sizeof=None):
+        if policy not in self.POLICIES:
+            raise ValueError('policy must be one of %s' % ', '.join(self.POLICIES))
+        if max_bytes is not None and sizeof is None:
+            raise ValueError('sizeof function is required when max_bytes is set')
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.sizeof = sizeof
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._data = OrderedDict()  # key -> value, ordered from the oldest use (lru)
+            self._sizes = {}
+            self._freqs = {}  # lfu only, key -> number of uses
+            self._buckets = {}  # lfu only, number of uses -> OrderedDict of keys
+            self._min_freq = 0
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def info(self):
+        '''Returns CacheInfo(hits, misses, evictions, size, bytes, max_size, max_bytes)'''
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, len(self._data), self.bytes,
+                             self.max_size, self.max_bytes)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, MISSING)
+            if value is MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._touch(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_size == 0:
+                return  # caching is disabled
+            size = self.sizeof(value) if self.max_bytes is not None else 0
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # would not fit even in the empty cache
+            # make space for the new entry first so that it is never evicted itself
+            while self._data and self._over_limit(size):
+                self._remove(self._victim())
+                self.evictions += 1
+            self._data[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            if self.policy == 'lfu':
+                self._freqs[key] = 1
+                self._buckets.setdefault(1, OrderedDict())[key] = None
+                self._min_freq = 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key]
+            self._remove(key)
+            return value
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    __setitem__ = put
+
+    # ---- internals, call with the lock held ----
+
+    def _touch(self, key):
+        if self.policy == 'lru':
+            value = self._data.pop(key)
+            self._data[key] = value
+        else:
+            freq = self._freqs[key]
+            bucket = self._buckets[freq]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[freq]
+                if self._min_freq == freq:
+                    self._min_freq = freq + 1
+            self._freqs[key] = freq + 1
+            self._buckets.setdefault(freq + 1, OrderedDict())[key] = None
+
+    def _remove(self, key):
+        del self._data[key]
+        self.bytes -= self._sizes.pop(key)
+        if self.policy == 'lfu':
+            freq = self._freqs.pop(key)
+            bucket = self._buckets[freq]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[freq]
+                if self._min_freq == freq:
+                    self._min_freq = min(self._buckets) if self._buckets else 0
+
+    def _victim(self):
+        if self.policy == 'lru':
+            return next(iter(self._data))
+        return next(iter(self._buckets[self._min_freq]))
+
+    def _over_limit(self, extra_size):
+        return ((self.max_size is not None and len(self._data) >= self.max_size) or
+                (self.max_bytes is not None and self.bytes + extra_size > self.max_bytes))
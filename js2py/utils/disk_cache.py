@@ -0,0 +1,88 @@
+'''Persistent key -> bytes store used to keep translation results between processes.'''
+import os
+import errno
+import hashlib
+import re
+import shutil
+
+__all__ = ['DiskCache']
+
+try:
+    _replace = os.replace  # atomic, overwrites the destination on every platform
+except AttributeError:  # python 2
+    _replace = os.rename
+
+
+# entries of a namespace are kept in the subdirectory PREFIX + namespace of the cache directory
+PREFIX = 'js2py-cache-'
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:  # other process may have created it in the meantime
+            raise
+
+
+class DiskCache(object):
+    '''Stores byte strings in files named after the sha1 of their key.
+
+    Entries are first written to a temporary file and then renamed into place, so
+    readers (other threads or processes sharing the directory) always see either a
+    complete entry or no entry at all. Entries are stored in a subdirectory named after the namespace,
+    use it to separate incompatible entries (for example created by a different js2py version).
+    Other files in the directory are never touched.'''
+
+    def __init__(self, directory, namespace=''):
+        self.root = os.path.abspath(directory)
+        self.directory = os.path.join(self.root, PREFIX + re.sub(r'[^\w.-]', '_', namespace))
+        self.namespace = namespace.encode('utf-8')
+        _makedirs(self.directory)
+
+    def _path(self, key):
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        digest = hashlib.sha1(self.namespace + b'\0' + key).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def get(self, key):
+        '''Returns stored bytes or None if key is not present'''
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def set(self, key, data):
+        import tempfile  # slow to import, not needed when the cache is disabled
+        path = self._path(key)
+        folder = os.path.dirname(path)
+        _makedirs(folder)
+        fd, temp = tempfile.mkstemp(dir=folder, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            _replace(temp, path)
+        except (IOError, OSError):
+            # python 2 on Windows can't rename over an existing file - some other
+            # process has already written this entry so just drop ours.
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def clear(self):
+        '''Removes all entries of the namespace'''
+        shutil.rmtree(self.directory, ignore_errors=True)
+        _makedirs(self.directory)
+
+    def remove_other_namespaces(self):
+        '''Removes entries of the other namespaces from the directory, for example left by older js2py versions'''
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(PREFIX) and path != self.directory and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,30 @@
+'''Pausing of the garbage collector while JSON text is decoded.
+
+Decoding creates many objects and no garbage, so the collections triggered by the allocations
+would take most of the time. The collector is disabled while a decode runs in any thread and
+enabled again when the last one finishes (if it was enabled before the first one started).'''
+import gc
+import threading
+
+__all__ = ['without_gc']
+
+_lock = threading.Lock()
+_running = 0
+_was_enabled = False
+
+
+def without_gc(func, *args):
+    '''Returns func(*args) called with the garbage collector disabled, func must not run JS code.'''
+    global _running, _was_enabled
+    with _lock:
+        if not _running:
+            _was_enabled = gc.isenabled()
+            gc.disable()
+        _running += 1
+    try:
+        return func(*args)
+    finally:
+        with _lock:
+            _running -= 1
+            if not _running and _was_enabled:
+                gc.enable()
@@ -0,0 +1,134 @@
+'''Limits of the time, the number of steps and the memory used by a JS execution.
+
+>>> js2py.EvalJs().execute('while (true) {}', timeout=1)
+Traceback (most recent call last):
+  ...
+JsLimitExceeded: RangeError: Execution time limit of 1s exceeded
+
+A step is a loop iteration or a function call in the translator and one instruction in the VM.
+When a limit is exceeded JsLimitExceeded is raised. JS code can't catch it and it is raised again
+at every following step, so it can't be suppressed by catch or finally blocks either.
+Long running native operations (for example sorting a huge array) are not interrupted, the limits
+are checked after they finish.
+'''
+import os
+import sys
+import threading
+import time
+from ..internals.simplex import JsLimitExceeded
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+__all__ = ['ExecutionLimits', 'JsLimitExceeded', 'check_limits', 'current_memory']
+
+# time and memory are checked every CHECK_INTERVAL steps
+CHECK_INTERVAL = 1000
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+# limits of the executions running in the current thread
+_active = threading.local()
+
+# number of the executions with limits running in all threads, the translated code calls check_limits
+# only when it is not 0 so that executions without limits do not pay for the checks
+enabled = 0
+_enabled_lock = threading.Lock()
+
+
+def check_limits():
+    '''Counts a step of the execution running in the current thread, used by the translated code
+    when enabled is not 0.'''
+    limits = getattr(_active, 'limits', None)
+    if limits is not None:
+        limits.step()
+
+
+def current_memory():
+    '''Returns resident memory of the process in bytes or None if it can't be measured'''
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # peak memory is the best approximation available (kilobytes, bytes on mac)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+    return None
+
+
+def _set_enabled(delta):
+    global enabled
+    with _enabled_lock:
+        enabled += delta
+
+
+class ExecutionLimits(object):
+    '''Limits of one execution, use it as a context manager around the execution:
+
+    timeout - seconds of wall clock time
+    max_steps - number of steps
+    max_memory - bytes by which the resident memory of the process can grow (approximate, python
+        does not always return freed memory to the system)
+
+    None means no limit. Time and memory are measured from entering the context.'''
+    def __init__(self, timeout=None, max_steps=None, max_memory=None):
+        if max_memory is not None and current_memory() is None:
+            raise ValueError('max_memory is not supported on this platform')
+        self.timeout = timeout
+        self.max_steps = max_steps
+        self.max_memory = max_memory
+        self.steps = 0
+        self.next_check = 0
+        self.deadline = self.memory_ceiling = None
+        self.error = None
+        self.previous = None
+
+    def __enter__(self):
+        if self.timeout is not None:
+            self.deadline = time.time() + self.timeout
+        if self.max_memory is not None:
+            self.memory_ceiling = current_memory() + self.max_memory
+        self.steps = 0
+        self.error = None
+        self._schedule_check()
+        self.previous = getattr(_active, 'limits', None)
+        _active.limits = self
+        _set_enabled(1)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.limits = self.previous
+        self.previous = None
+        _set_enabled(-1)
+
+    def _schedule_check(self):
+        self.next_check = self.steps + CHECK_INTERVAL
+        if self.max_steps is not None:
+            self.next_check = min(self.next_check, self.max_steps + 1)
+
+    def step(self):
+        self.steps += 1
+        if self.steps >= self.next_check:
+            self.check()
+
+    def check(self):
+        '''Raises JsLimitExceeded if any of the limits is exceeded'''
+        if self.error is None:
+            if self.max_steps is not None and self.steps > self.max_steps:
+                self.error = 'Step limit of %d exceeded' % self.max_steps
+            elif self.deadline is not None and time.time() > self.deadline:
+                self.error = 'Execution time limit of %gs exceeded' % self.timeout
+            elif self.memory_ceiling is not None and current_memory() > self.memory_ceiling:
+                self.error = 'Memory limit of %d bytes exceeded' % self.max_memory
+            else:
+                self._schedule_check()
+                return
+        # from now on checked at every step
+        self.next_check = self.steps
+        raise JsLimitExceeded('RangeError', self.error)
@@ -0,0 +1,51 @@
+'''Cache of JS regular expressions converted to compiled python patterns, shared by the translator and the VM.
+
+Converting a JS pattern (with pyjsparser) and compiling it with re is expensive and scripts often create
+the same RegExp many times, for example new RegExp(str) inside a loop. Statistics of the cache:
+
+>>> from js2py.utils.regexp_cache import regexp_cache
+>>> regexp_cache.info()
+CacheInfo(hits=0, misses=0, evictions=0, size=0, bytes=0, max_size=512, max_bytes=None)
+'''
+import re
+from pyjsparser import PyJsParser
+from .cache import BoundedCache
+
+__all__ = ['regexp_cache', 'compile_regexp']
+
+# least recently used patterns are dropped when there are more than max_size of them
+regexp_cache = BoundedCache(max_size=512)
+
+# ugly hacks porting js reg exp to py reg exp works in 99% of cases ;)
+# the fixes are applied one by one until python accepts the pattern
+POSSIBLE_FIXES = [
+    (u'[]', u'[\0]'),
+    (u'[^]', u'[^\0]'),
+]
+
+
+def compile_regexp(source, flags):
+    '''Returns python pattern equivalent to JS /source/flags (only i and m flags matter).
+
+    Raises ValueError if the pattern is invalid.'''
+    key = (source, 'i' in flags, 'm' in flags)
+    pat = regexp_cache.get(key)
+    if pat is None:
+        pat = _compile(*key)
+        regexp_cache.put(key, pat)
+    return pat
+
+
+def _compile(source, ignore_case, multiline):
+    py_flags = (re.IGNORECASE if ignore_case else 0) | (re.MULTILINE if multiline else 0)
+    reg = source
+    comp = None
+    for fix in [None] + POSSIBLE_FIXES:
+        try:
+            if fix is not None:
+                reg = reg.replace(*fix)
+            comp = PyJsParser()._interpret_regexp(reg, '')
+            return re.compile(comp, py_flags)
+        except Exception:
+            pass
+    raise ValueError('Invalid RegExp pattern: %s -> %s' % (repr(source), repr(comp)))
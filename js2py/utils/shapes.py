@@ -0,0 +1,90 @@
+'''Hidden classes (shapes) used by PyJsObject of both runtimes to store properties compactly.
+
+Most object properties are plain: writable, enumerable and configurable data properties. Objects
+keep the values of these in a list of slots and a Shape maps property names to the slot indices.
+Objects that got the same plain properties in the same order (same literal, same constructor...)
+share the Shape, so the names and the attributes are stored once and not in a dict per property.
+Other properties (accessors, read-only...) stay in the object's own dict.
+
+Objects with too many properties and objects that had a property deleted or reconfigured switch to
+DICT_SHAPE, which keeps all the properties in the own dict, just like before.'''
+
+__all__ = ['Shape', 'ROOT_SHAPE', 'DICT_SHAPE', 'is_plain_property']
+
+# objects with more plain properties than this keep the rest in their dict
+MAX_PROPERTIES = 64
+# limits the number of shapes created by objects used as maps (every one with different keys)
+MAX_TRANSITIONS = 1024
+# shapes are never freed, so their total number is limited too, new objects fall back to the dict afterwards
+MAX_SHAPES = 100000
+
+
+def is_plain_property(desc, new):
+    '''Whether desc describes (or, if new is False, keeps) a writable, enumerable and configurable data property'''
+    if 'get' in desc or 'set' in desc:
+        return False
+    if new:
+        return bool(desc.get('writable') and desc.get('enumerable') and desc.get('configurable'))
+    return bool(desc.get('writable', True) and desc.get('enumerable', True) and desc.get('configurable', True))
+
+
+class Shape(object):
+    '''The first child of a shape extends the names and the index of its parent instead of copying them,
+    so a chain of shapes shares them and only the first size names belong to the shape.'''
+    __slots__ = ('name', 'size', 'names', 'index', 'parent', 'transitions')
+    count = 0
+
+    def __init__(self, parent=None, name=None):
+        self.name = name
+        self.parent = parent
+        self.transitions = {}
+        if parent is None:
+            self.size = 0
+            self.names = []
+            self.index = {}
+            return
+        self.size = parent.size + 1
+        if len(parent.names) == parent.size:
+            self.names, self.index = parent.names, parent.index
+        else:
+            self.names = parent.names[:parent.size]
+            self.index = dict((k, i) for i, k in enumerate(self.names))
+        self.index[name] = parent.size
+        self.names.append(name)
+
+    @property
+    def keys(self):
+        return tuple(self.names[:self.size])
+
+    def lookup(self, name):
+        '''Returns the slot index of name or None'''
+        index = self.index.get(name)
+        if index is not None and index < self.size:
+            return index
+        return None
+
+    def add(self, name):
+        '''Returns the shape with name added at the end or None if it can't be stored in a slot'''
+        child = self.transitions.get(name)
+        if child is None:
+            if self.size >= MAX_PROPERTIES or len(self.transitions) >= MAX_TRANSITIONS or \
+                    Shape.count >= MAX_SHAPES:
+                return None
+            Shape.count += 1
+            child = self.transitions[name] = Shape(self, name)
+        return child
+
+    def __repr__(self):
+        return 'Shape(%r)' % (self.keys,)
+
+
+class DictShape(Shape):
+    '''Shape without slots, all the properties are in the dict'''
+    __slots__ = ()
+
+    def add(self, name):
+        return None
+
+
+ROOT_SHAPE = Shape()
+DICT_SHAPE = DictShape()
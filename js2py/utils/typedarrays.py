@@ -0,0 +1,140 @@
+'''Views of raw memory used by the JS typed arrays.
+
+The memory of an ArrayBuffer is any object supporting the buffer protocol (bytearray, array.array,
+numpy.ndarray...) so typed arrays can share memory with python code without copying. A view of
+the memory supports view[i], view[i] = value and len(view), where the values are python numbers
+already converted to the element type (see the converters below). Bulk operations use slices:
+view[start:end].tolist() and view[start:end] = array.array(fmt, values).
+'''
+import array
+import struct
+import six
+
+__all__ = ['byte_length', 'copy_bytes', 'make_view', 'element_format', 'integer_converter',
+           'to_uint8_clamped', 'to_float32']
+
+INF = float('inf')
+
+
+def byte_length(buff):
+    '''Returns the size of the memory of buff in bytes'''
+    if six.PY2:
+        return len(buffer(buff))
+    return memoryview(buff).nbytes
+
+
+def copy_bytes(buff, start, end):
+    '''Returns a bytearray with a copy of bytes start:end of the memory of buff'''
+    if six.PY2:
+        return bytearray(buffer(buff)[start:end])
+    return bytearray(memoryview(buff).cast('B')[start:end])
+
+
+def make_view(buff, fmt, byte_offset, length):
+    '''Returns a view of length elements with struct format fmt starting at byte_offset of buff'''
+    if isinstance(buff, array.array) and buff.typecode == fmt and not byte_offset and len(buff) == length:
+        return buff  # the fastest one
+    if six.PY2:
+        return StructView(buff, fmt, byte_offset, length)
+    size = struct.calcsize(fmt)
+    return memoryview(buff).cast('B')[byte_offset:byte_offset + length * size].cast(fmt)
+
+
+class StructView(object):
+    '''View of the memory with struct, python 2 memoryview can't be cast to other formats.'''
+    def __init__(self, buff, fmt, byte_offset, length):
+        self.buff = buff
+        self.fmt = fmt
+        self.struct = struct.Struct('=' + fmt)
+        self.byte_offset = byte_offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(self.length)
+            return StructView(self.buff, self.fmt, self.byte_offset + start * self.struct.size, max(stop - start, 0))
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        return self.struct.unpack_from(self.buff, self.byte_offset + index * self.struct.size)[0]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(self.length)
+            values = list(value)
+            if len(values) != max(stop - start, 0):
+                raise ValueError('can not resize the view')
+            struct.pack_into('=%d%s' % (len(values), self.fmt), self.buff,
+                             self.byte_offset + start * self.struct.size, *values)
+            return
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        self.struct.pack_into(self.buff, self.byte_offset + index * self.struct.size, value)
+
+    def tolist(self):
+        return list(struct.unpack_from('=%d%s' % (self.length, self.fmt), self.buff, self.byte_offset))
+
+
+# (kind, itemsize) -> struct format of the element of the typed array
+FORMATS = {
+    ('i', 1): 'b', ('u', 1): 'B',
+    ('i', 2): 'h', ('u', 2): 'H',
+    ('i', 4): 'i', ('u', 4): 'I',
+    ('f', 4): 'f', ('f', 8): 'd',
+}
+
+
+def element_format(typecode, itemsize):
+    '''Returns the struct format of the typed array that can view elements of array.array typecode
+    (or numpy dtype.char, memoryview.format) with itemsize bytes, None if there is no such typed array.'''
+    typecode = typecode.lstrip('@=')
+    if len(typecode) != 1:
+        return None
+    if typecode in 'bhilq':
+        kind = 'i'
+    elif typecode in 'BHILQ':
+        kind = 'u'
+    elif typecode in 'fd':
+        kind = 'f'
+    else:
+        return None
+    return FORMATS.get((kind, itemsize))
+
+
+def integer_converter(bits, signed):
+    '''Returns function converting a number (python float) to an integer element (ToInt8, ToUint16...)'''
+    modulo = 2 ** bits
+    top = 2 ** (bits - 1) if signed else modulo
+
+    def convert(num):
+        if 0 <= num < top and not num % 1:
+            return int(num)
+        if num != num or num in (INF, -INF):
+            return 0
+        num = int(num) % modulo
+        return num - modulo if num >= top else num
+    return convert
+
+
+def to_uint8_clamped(num):
+    if not num > 0:  # also NaN
+        return 0
+    if num >= 255:
+        return 255
+    res = int(num)
+    diff = num - res
+    if diff > 0.5 or (diff == 0.5 and res % 2):  # round half to even
+        res += 1
+    return res
+
+
+FLOAT32 = struct.Struct('=f')
+
+
+def to_float32(num):
+    try:
+        return FLOAT32.unpack(FLOAT32.pack(num))[0]
+    except OverflowError:
+        return INF if num > 0 else -INF
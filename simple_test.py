@@ -1,4 +1,7 @@
 import js2py
+import os
+import shutil
+import tempfile
 import time
 
 print("Testing ECMA 5...")
@@ -20,12 +23,196 @@ except js2py.PyJsException as err:
 
 assert js2py.eval_js('pyimport time; time.time()') <= time.time()
 
+# disk cache
+cache_dir = tempfile.mkdtemp()
+js2py.enable_disk_cache(cache_dir)
+assert js2py.EvalJs(cache=js2py.SnippetCache()).eval('[1, 2].map(function (x) {return 3 * x})').to_list() == [3, 6]
+assert os.listdir(cache_dir)
+translate_js = js2py.evaljs.translate_js
+js2py.evaljs.translate_js = None  # fails if the code is translated again
+try:
+    # new snippet cache is empty, so the code comes from the disk
+    assert js2py.EvalJs(cache=js2py.SnippetCache()).eval('[1, 2].map(function (x) {return 3 * x})').to_list() == [3, 6]
+finally:
+    js2py.evaljs.translate_js = translate_js
+js2py.EvalJs(cache=js2py.SnippetCache()).execute('pyimport os; var cwd = os.getcwd()')
+js2py.EvalJs().execute('pyimport time; var now = time.time()')
+
 js2py.disable_pyimport()
 try:
     assert js2py.eval_js('pyimport time') and 0
 except js2py.PyJsException as err:
     assert str(err).startswith('SyntaxError: ')
 
+# code translated while pyimport was enabled is not taken from the disk cache
+try:
+    assert js2py.EvalJs(cache=js2py.SnippetCache()).execute('pyimport os; var cwd = os.getcwd()') and 0
+except js2py.PyJsException as err:
+    assert str(err).startswith('SyntaxError: ')
+# neither from the snippet cache shared by EvalJs instances
+try:
+    assert js2py.EvalJs().execute('pyimport time; var now = time.time()') and 0
+except js2py.PyJsException as err:
+    assert str(err).startswith('SyntaxError: ')
+# clearing only removes the cache entries, other files in the directory are kept
+open(os.path.join(cache_dir, 'keep.txt'), 'w').close()
+js2py.translators.translator.disk_cache.clear()
+assert sorted(os.listdir(cache_dir))[1:] == ['keep.txt']
+assert not os.listdir(js2py.translators.translator.disk_cache.directory)
+js2py.disable_disk_cache()
+shutil.rmtree(cache_dir)
+
+# snippet caches are bounded, max_size=0 disables the cache
+cache = js2py.SnippetCache(max_size=2)
+context = js2py.EvalJs(cache=cache)
+for n in range(3):
+    context.execute('var n = %d' % n)
+assert len(cache) == 2 and cache.info().evictions == 1
+cache = js2py.SnippetCache(max_size=0)
+js2py.EvalJs(cache=cache).execute('var n = 0')
+assert len(cache) == 0
+
+# forks of a snapshot don't share globals or closures
+base = js2py.EvalJs()
+base.execute('var config = {calls: 0}; var next = (function () {var n = 0; return function () {return ++n}})()')
+snapshot = base.snapshot()
+a, b = snapshot.fork(), snapshot.fork()
+assert (a.next(), a.next(), b.next()) == (1, 2, 1)
+a.execute('config.calls = 10; var created = true')
+assert b.eval('config.calls') == 0 and b.eval('typeof created') == 'undefined'
+assert base.eval('next()') == 1 and base.eval('config.calls') == 0
+assert snapshot.fork().eval('next()') == 1
+# typed arrays of a fork view its own copy of the memory, views of the same buffer still share it
+base.execute('var buf = new ArrayBuffer(8); var bytes = new Uint8Array(buf); var floats = new Float32Array(buf, 4, 1)')
+snapshot = base.snapshot()
+a, b = snapshot.fork(), snapshot.fork()
+a.execute('bytes[0] = 7; floats[0] = 1.5')
+assert a.eval('[bytes[0], bytes[7], floats[0]]').to_list() == [7, 63, 1.5]
+assert b.eval('[bytes[0], bytes[7], floats[0]]').to_list() == [0, 0, 0]
+assert base.eval('[bytes[0], bytes[7], floats[0]]').to_list() == [0, 0, 0]
+
+# execution limits, JS code can't catch the error
+context = js2py.EvalJs()
+context.execute('function spin() {while (true) {}}')
+for js, limits, message in [('spin()', {'max_steps': 10000}, 'RangeError: Step limit of 10000 exceeded'),
+                            ('for (;;) {try {spin()} catch (e) {}}', {'timeout': 0.2},
+                             'RangeError: Execution time limit of 0.2s exceeded'),
+                            ('function f() {return f()} f()', {'max_steps': 100}, 'RangeError: Step limit of 100 exceeded')]:
+    try:
+        assert context.execute(js, **limits) and 0
+    except js2py.JsLimitExceeded as err:
+        assert str(err) == message
+assert context.eval('var s = 0; for (var i = 0; i < 20000; i++) {s += i}; s', max_steps=30000) == 199990000
+
+# worker pool, jobs that time out don't stop the batch and workers are replaced after max_jobs_per_worker jobs
+with js2py.JsPool(processes=2, libraries=['function double(x) {return 2 * x}']) as pool:
+    results = pool.map([('double(input)', n) for n in range(4)] + ['while (true) {}', '[double(1), {a: 1}]'], timeout=0.5)
+    assert [r.value for r in results] == [0, 2, 4, 6, None, [2, {'a': 1}]]
+    assert results[4].error == u'RangeError: Execution time limit of 0.5s exceeded'
+with js2py.JsPool(processes=1, isolated=False, max_jobs_per_worker=2) as pool:
+    # not isolated jobs see globals of the previous jobs run by the same worker
+    assert [r.value for r in pool.map(['this.runs = (this.runs || 0) + 1'] * 5)] == [1, 2, 1, 2, 1]
+
+# incremental translation of an edited script gives the same code as translating it from scratch
+translator = js2py.translators.IncrementalTranslator()
+script = 'function a() {return 1}\nfunction b() {return 2}\nvar c = a() + b();\n'
+edited = script.replace('return 2', 'return 20')
+context = js2py.EvalJs()
+context.execute_incremental(script, translator)
+assert context.c == 3 and translator.translated == 3
+context.execute_incremental(edited, translator)
+assert context.c == 21 and translator.translated == 1
+assert translator.translate(edited) == js2py.translators.IncrementalTranslator().translate(edited)
+
+# conversion of JS values to python data and back
+obj = js2py.eval_js('var o = {a: [1, 2.5, {b: null}], u: undefined, f: function () {}, n: NaN, d: new Date(0)}; o')
+assert obj.to_dict(json=True) == {'a': [1, 2.5, {'b': None}], 'n': None, 'd': '1970-01-01T00:00:00.00Z'}
+cyclic = js2py.eval_js('var o = {items: [1]}; o.items.push(o); o').to_dict()
+assert cyclic['items'][1] is cyclic
+nested = js2py.eval_js('[[[1]], 2, 3]')
+assert nested.to_list(max_depth=2) == [[[1]], 2, 3]
+for limits in ({'max_depth': 1}, {'max_size': 3}):
+    try:
+        assert nested.to_list(**limits) and 0
+    except ValueError:
+        pass
+try:  # holes count too, the list is not allocated
+    assert js2py.eval_js('var h = [1]; h.length = 5e7; h').to_list(max_size=10) and 0
+except ValueError:
+    pass
+data = {'name': u'\u0105', 'values': [1, 2, {'x': None}], 1: True}
+data['self'] = data
+check = js2py.eval_js('(function (d) {return d.self === d && d[1] && d.values[2].x === undefined && d.name})')
+assert check(data) == u'\u0105'
+
+# own properties of functions and strings are created lazily, lookups of other names don't create them
+context = js2py.EvalJs()
+context.execute('var lazy = {f: function g(a) {}, s: "ab"}; lazy.f.hasOwnProperty("call"); lazy.s.charAt(1)')
+assert 'own' not in context.lazy.f._obj.__dict__ and 'own' not in context.lazy._obj.get('s').__dict__
+assert context.eval('Object.getOwnPropertyNames(lazy.f).sort().join()') == 'length,name,prototype'
+assert context.eval('lazy.f.hasOwnProperty("prototype") && lazy.s.hasOwnProperty("length")')
+
+# variables of functions compiled to python locals behave like the ones in scopes
+# hoisting, the variable exists before its declaration is reached
+assert js2py.eval_js('(function () {var before = typeof x + ":" + x; var x = 1; return before + ":" + x})()') == \
+    'undefined:undefined:1'
+# the catch parameter shadows the var only in the catch block
+assert js2py.eval_js('(function () {var e = 1; try {throw 2} catch (e) {e = 3; var r = e} return e + ":" + r})()') == '1:3'
+assert js2py.eval_js('(function () {try {throw 2} catch (e) {var e = 5} return e})()') is None
+# closures read the values assigned after they were created
+assert js2py.eval_js('(function () {var get = function () {return v}; var v = 1; var a = get(); v = 2; '
+                     'return a + ":" + get()})()') == '1:2'
+assert js2py.eval_js('(function () {var fs = []; for (var i = 0; i < 3; i++) fs.push(function () {return i}); '
+                     'return fs[0]() + fs[2]()})()') == 6
+# eval can read and change the variables, also from a nested function
+assert js2py.eval_js('(function () {var a = 1; eval("a = a + 1; var b = 10"); return a + b})()') == 12
+assert js2py.eval_js('(function () {var a = 1; (function () {eval("a = 5")})(); return a})()') == 5
+# declared variables can't be deleted, function declarations replace each other and are replaced by assignments
+assert js2py.eval_js('(function () {var d = 1; var ok = delete d; return ok + ":" + d})()') == 'false:1'
+assert js2py.eval_js('(function () {function g() {return 1} var r = g(); function g() {return 2} return r})()') == 2
+assert js2py.eval_js('(function () {var h = 1; function h() {} return typeof h})()') == 'number'
+# labeled continue of a loop which init takes more lines
+assert js2py.eval_js('''(function () {
+    var s = 0;
+    outer: for (var i = 0,
+                    j = 10; i < 3; i++) {
+        for (var k = 0; k < 3; k++) {
+            if (k == 1) continue outer;
+            s += j + k;
+        }
+    }
+    return s + ":" + i})()''') == '30:3'
+
+# typed arrays, views of the same buffer share the memory
+assert js2py.eval_js('''var buf = new ArrayBuffer(8);
+var whole = new Uint8Array(buf), tail = new Uint8Array(buf, 4, 2), words = new Uint16Array(buf, 2, 2);
+tail[0] = 7; words[0] = 0x0102;
+[whole.join(), tail.length, tail.byteOffset, words.byteLength].join("|")''') == '0,0,2,1,7,0,0,0|2|4|4'
+# rounding half to even
+assert js2py.eval_js('Array.prototype.join.call(new Uint8ClampedArray([0.5, 1.5, 2.5, 3.5, -1, 300, 254.5, NaN]))') == \
+    '0,2,2,4,0,255,254,0'
+assert js2py.eval_js('''var a = new Int16Array([1, 2, 3, 4, 5]), s = a.subarray(1, 4); s[0] = 20; a[3] = 40;
+[a.join(), s.join(), s.byteOffset, s.buffer === a.buffer, a.subarray(-2).join()].join("|")''') == \
+    '1,20,3,40,5|20,3,40|2|true|40,5'
+# numeric order, -0 before +0 and NaN last
+assert js2py.eval_js('''var f = new Float64Array([3, NaN, 0, -0, -1, Infinity]); f.sort();
+[Array.prototype.join.call(f), 1 / f[1], 1 / f[2]].join("|")''') == '-1,0,0,3,Infinity,NaN|-Infinity|Infinity'
+
+# translate_package rejects names that become the same module
+source_dir, package_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+for name in ('a-b', 'a_b'):
+    os.makedirs(os.path.join(source_dir, name))
+    with open(os.path.join(source_dir, name, 'x.js'), 'w') as f:
+        f.write('var x = 1;')
+try:
+    assert js2py.translate_package(source_dir, package_dir) and 0
+except ValueError as err:
+    assert 'clashes' in str(err)
+shutil.rmtree(os.path.join(source_dir, 'a_b'))
+assert js2py.translate_package(source_dir, package_dir) == (['a-b/x.js'], [])
+shutil.rmtree(source_dir)
+shutil.rmtree(package_dir)
+
 
 print("Passed ECMA 5 simple tests!\n"+30*'-')
 